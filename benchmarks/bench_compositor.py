@@ -0,0 +1,132 @@
+# 分割表示の描画コスト比較: カメラ毎のウィジェット（従来） vs GridCompositor（1ウィジェットでまとめて描画）
+# オフスクリーンのQtで、毎回一部のタイルに新しいフレームを公開 → 表示更新 → イベント処理までの時間と
+# 発生したPaintイベント数を計測する
+#   python benchmarks/bench_compositor.py --cameras 9,25,49 --changed 0.5 --cycles 300
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5 import QtWidgets, QtCore
+from camera_viewer.compositor import GridCompositor
+from camera_viewer.frame_buffer import LatestFrameSlot
+from camera_viewer.utils import parse_size
+from main import CameraWidget
+
+# CameraWidgetのframe_sourceとして使う（キャプチャスレッドを持たず、ベンチマークから直接公開する）
+class BenchSource(LatestFrameSlot):
+    def set_paused(self, paused, standby=None):
+        pass
+
+    def set_stream(self, stream):
+        pass
+
+    def set_target_size(self, size):
+        pass
+
+    def read_metrics(self, metrics):
+        pass
+
+class PaintCounter(QtCore.QObject):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            self.count += 1
+        return False
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else None
+
+def run(app, mode, n, args, frames):
+    window = QtWidgets.QWidget()
+    layout = QtWidgets.QGridLayout(window)
+    layout.setSpacing(4)
+    sources = [BenchSource() for _ in range(n)]
+    widgets = [CameraWidget(f"cam{i:02d}", name=f"cam{i:02d}", frame_source=src) for i, src in enumerate(sources)]
+    cols = math.ceil(math.sqrt(n))
+    rows = math.ceil(n / cols)
+    compositor = None
+    if mode == 'compositor':
+        compositor = GridCompositor(spacing=4)
+        layout.addWidget(compositor, 0, 0)
+        compositor.set_cameras(widgets, cols, rows)
+        refresh = compositor.refresh
+    else:
+        for idx, w in enumerate(widgets):
+            layout.addWidget(w, idx // cols, idx % cols)
+        def refresh():
+            for w in widgets:
+                w.refresh_display()
+    window.resize(*args.window)
+    window.show()
+    # 最初のフレームを全タイルに表示してから計測
+    for src in sources:
+        src.publish(frames[0])
+    refresh()
+    app.processEvents()
+    counter = PaintCounter()
+    app.installEventFilter(counter)
+    changed = max(1, int(round(n * args.changed)))
+    times = []
+    offset = 0
+    for cycle in range(args.cycles):
+        for k in range(changed):
+            sources[(offset + k) % n].publish(frames[cycle % len(frames)])
+        offset = (offset + changed) % n
+        start = time.perf_counter()
+        refresh()
+        app.processEvents()
+        times.append(time.perf_counter() - start)
+    app.removeEventFilter(counter)
+    window.close()
+    for w in widgets:
+        w.close()
+    window.deleteLater()
+    app.processEvents()
+    return {
+        'mode': mode,
+        'cameras': n,
+        'changed_per_cycle': changed,
+        'cycle_ms_mean': round(sum(times) / len(times) * 1000, 3),
+        'cycle_ms_p50': round(percentile(times, 0.5) * 1000, 3),
+        'cycle_ms_p99': round(percentile(times, 0.99) * 1000, 3),
+        'paint_events_per_cycle': round(counter.count / args.cycles, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='分割表示の描画コスト比較（ウィジェット毎 vs コンポジタ）')
+    parser.add_argument('--cameras', default='9,25,49', help='タイル数（カンマ区切り）')
+    parser.add_argument('--changed', type=float, default=0.5, help='1回の表示更新で新しいフレームが届くタイルの割合')
+    parser.add_argument('--cycles', type=int, default=300)
+    parser.add_argument('--frame', default='640x360', help='フレームサイズ（縮小後の表示用フレーム）')
+    parser.add_argument('--window', default='1920x1080', help='ウィンドウサイズ')
+    parser.add_argument('--out', help='結果のJSON保存先')
+    args = parser.parse_args()
+    args.window = parse_size(args.window, (1920, 1080))
+    fw, fh = parse_size(args.frame, (640, 360))
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (fh, fw, 3), dtype=np.uint8) for _ in range(3)]
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    results = []
+    for n in [int(c) for c in args.cameras.split(',') if c.strip()]:
+        for mode in ('widgets', 'compositor'):
+            r = run(app, mode, n, args, frames)
+            results.append(r)
+            print(f"{n:3d}台 {mode:10s}  1回あたり 平均 {r['cycle_ms_mean']:7.2f}ms  p50 {r['cycle_ms_p50']:7.2f}ms  "
+                  f"p99 {r['cycle_ms_p99']:7.2f}ms  Paintイベント {r['paint_events_per_cycle']:.1f}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'compositor', 'config': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# フレーム変換パイプラインのマイクロベンチマーク
+# 従来の処理（flip最大2回・毎回新規配列）と FramePipeline（flip 1回・出力バッファ使い回し）を比較する
+#   python benchmarks/bench_pipeline.py --width 1920 --height 1080 --target 640x360
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from camera_viewer.overlay import LabelOverlay
+from camera_viewer.pipeline import FramePipeline
+from camera_viewer.utils import fit_size, parse_size
+
+def legacy_path(frame, flip_h, flip_v, name, overlay, target):
+    # 変更前のCameraWidget.update_frameと同じ処理順
+    if target is not None:
+        size = fit_size(frame.shape[1], frame.shape[0], target[0], target[1])
+        if size is not None:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if flip_h:
+        frame = cv2.flip(frame, 1)
+    if flip_v:
+        frame = cv2.flip(frame, 0)
+    if name:
+        overlay.apply(frame, name)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+def measure(fn, frames, repeat):
+    # 1フレームあたりの時間と、処理中に新規確保されたバイト数（tracemallocのピーク）を測る
+    for f in frames[:5]:
+        fn(f)
+    times = []
+    peaks = []
+    tracemalloc.start()
+    for i in range(repeat):
+        f = frames[i % len(frames)]
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        fn(f)
+        times.append(time.perf_counter() - t0)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+    times.sort()
+    return {
+        'mean_ms': sum(times) / len(times) * 1000,
+        'p50_ms': times[len(times) // 2] * 1000,
+        'p95_ms': times[int(len(times) * 0.95)] * 1000,
+        'alloc_kib': sum(peaks) / len(peaks) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='フレーム変換パイプラインの比較')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--target', default='640x360', help="縮小先（'none'で縮小なし）")
+    parser.add_argument('--repeat', type=int, default=300)
+    parser.add_argument('--name', default='カメラ1')
+    args = parser.parse_args()
+    target = None if args.target == 'none' else parse_size(args.target)
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    print(f"入力 {args.width}x{args.height} / 縮小先 {args.target} / {args.repeat}フレーム")
+    print(f"{'flip':<10}{'方式':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'alloc KiB':>12}")
+    for flip_h, flip_v in [(False, False), (True, False), (True, True)]:
+        overlay = LabelOverlay()
+        pipeline = FramePipeline(flip_h, flip_v, args.name)
+        results = [
+            ('従来', measure(lambda f: legacy_path(f, flip_h, flip_v, args.name, overlay, target), frames, args.repeat)),
+            ('pipeline', measure(lambda f: pipeline.run(f, target), frames, args.repeat)),
+        ]
+        label = f"h={int(flip_h)} v={int(flip_v)}"
+        for kind, r in results:
+            print(f"{label:<10}{kind:<10}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['alloc_kib']:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# 録画エンジンのスループット計測
+# 動画ファイル（またはランダム画像）をキャプチャ元として Recorder.feed() へ流し込み、
+# 書き込み速度・キューあふれによる欠落・セグメント分割を確認する
+#   python benchmarks/bench_recorder.py --source sample.mp4 --seconds 10 --segment 2
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from camera_viewer.recorder import Recorder, MODE_ENCODE
+
+def file_frames(path):
+    # 動画ファイルを末尾まで読んだら先頭に戻ってループ
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"開けません: {path}")
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read()
+            if not ret:
+                return
+        yield frame
+
+def synthetic_frames(width, height):
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    i = 0
+    while True:
+        frame = np.roll(base, i * 4, axis=1)
+        i += 1
+        yield frame
+
+def main():
+    parser = argparse.ArgumentParser(description='録画エンジンのスループット計測')
+    parser.add_argument('--source', help='キャプチャ元の動画ファイル（省略時はランダム画像）')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=float, default=0, help='供給レート（0で最大速度）')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--segment', type=float, default=2.0, help='セグメント長（秒）')
+    parser.add_argument('--pre-event', type=float, default=2.0, help='事前バッファ（秒）')
+    parser.add_argument('--queue', type=int, default=60)
+    parser.add_argument('--out', help='出力先（省略時は一時フォルダ）')
+    args = parser.parse_args()
+    frames = file_frames(args.source) if args.source else synthetic_frames(args.width, args.height)
+    out = args.out or tempfile.mkdtemp(prefix='bench_recorder_')
+    rec = Recorder('bench', out, fps=args.fps or 20.0, segment_seconds=args.segment,
+                   pre_event_seconds=args.pre_event, queue_size=args.queue, mode=MODE_ENCODE)
+    interval = 1.0 / args.fps if args.fps else 0.0
+    # 事前バッファを満たしてから録画開始
+    t_end = time.time() + args.pre_event
+    while time.time() < t_end:
+        rec.feed(next(frames))
+        if interval:
+            time.sleep(interval)
+    rec.start()
+    fed_start = rec.fed
+    feed_times = []
+    t0 = time.perf_counter()
+    t_end = t0 + args.seconds
+    while time.perf_counter() < t_end:
+        frame = next(frames)
+        s = time.perf_counter()
+        rec.feed(frame)
+        feed_times.append(time.perf_counter() - s)
+        if interval:
+            time.sleep(interval)
+    elapsed = time.perf_counter() - t0
+    s = time.perf_counter()
+    rec.stop()
+    flush = time.perf_counter() - s
+    fed = rec.fed - fed_start
+    total_bytes = sum(os.path.getsize(p) for p in rec.segments if os.path.exists(p))
+    feed_times.sort()
+    print(f"出力先: {out}")
+    print(f"供給 {fed}フレーム / {elapsed:.2f}秒 = {fed / elapsed:.1f} fps")
+    print(f"書き込み {rec.written}フレーム（事前バッファ分を含む） / 欠落 {rec.dropped} / "
+          f"fps合わせの繰り返し {rec.repeated}・間引き {rec.skipped}")
+    print(f"feed() p50 {feed_times[len(feed_times) // 2] * 1000:.3f}ms / p99 {feed_times[int(len(feed_times) * 0.99)] * 1000:.3f}ms")
+    print(f"停止時の書き出し待ち {flush:.2f}秒 / セグメント {len(rec.segments)}個 / {total_bytes / 1024 / 1024:.1f}MiB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# インスタントリプレイのメモリ上限の確認
+# 仮想カメラN台分のフレームを時刻を進めながらReplayBufferへ流し込み（実時間もエンコード完了も待たない）、
+# 全カメラ合計の使用量（保存済み+エンコード待ち）が上限を一度も超えないこと・カメラ間の配分・RSSの増加・
+# エンコード時間を確認する。上限を超えた場合は終了コード1（RSSの増加が上限を大きく超えた場合は警告）
+#   python benchmarks/bench_replay.py --cameras 16 --seconds 60 --memory-mb 128
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from camera_viewer.replay import ReplayPool, FORMAT_JPEG
+from camera_viewer.utils import parse_size
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+def make_frames(width, height, count, seed):
+    # 圧縮率が実映像に近くなるよう、なめらかな背景に動く物体とノイズを重ねる
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = np.dstack([(xx * 255 // width), (yy * 255 // height), ((xx + yy) * 127 // (width + height))]).astype(np.uint8)
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        x = (i * 17 + seed * 31) % max(1, width - 80)
+        y = (i * 7 + seed * 13) % max(1, height - 60)
+        frame[y:y + 60, x:x + 80] = rng.integers(0, 255, 3, dtype=np.uint8)
+        frame += rng.integers(0, 8, frame.shape, dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+def main():
+    parser = argparse.ArgumentParser(description='インスタントリプレイのメモリ上限の確認')
+    parser.add_argument('--cameras', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=60.0, help='保持する秒数（replay_seconds）')
+    parser.add_argument('--duration', type=float, default=0, help='流し込む映像の秒数（0で保持秒数の2倍）')
+    parser.add_argument('--memory-mb', type=float, default=128.0, help='全カメラ合計のメモリ上限（replay_memory_mb）')
+    parser.add_argument('--fps', type=float, default=20.0, help='カメラのfps')
+    parser.add_argument('--replay-fps', type=float, default=10.0)
+    parser.add_argument('--format', default=FORMAT_JPEG, help='jpeg / raw')
+    parser.add_argument('--quality', type=int, default=70)
+    parser.add_argument('--frame', default='1280x720', help='カメラのフレームサイズ')
+    parser.add_argument('--max-width', type=int, default=640, help='保存時の最大幅（replay_max_width）')
+    parser.add_argument('--out', help='結果のJSON保存先')
+    args = parser.parse_args()
+    width, height = parse_size(args.frame, (1280, 720))
+    duration = args.duration or args.seconds * 2
+    max_bytes = int(args.memory_mb * 1024 * 1024)
+    frames = [make_frames(width, height, 8, seed) for seed in range(args.cameras)]
+    rss_start = rss_bytes()
+    pool = ReplayPool(max_bytes=max_bytes, seconds=args.seconds, fps=args.replay_fps, fmt=args.format,
+                      quality=args.quality, max_width=args.max_width, queue_size=max(64, args.cameras * 2))
+    buffers = [pool.buffer(f"cam{i:02d}") for i in range(args.cameras)]
+    violations = 0
+    max_accounted = 0
+    tap_times = []
+    start = time.perf_counter()
+    t0 = time.time()
+    ticks = int(duration * args.fps)
+    for tick in range(ticks):
+        timestamp = t0 + tick / args.fps
+        for i, buf in enumerate(buffers):
+            s = time.perf_counter()
+            buf(frames[i][tick % len(frames[i])], timestamp)
+            tap_times.append(time.perf_counter() - s)
+        # エンコード待ちのフレームも含めて数える（キューが溜まっている状態での上限を確認する）
+        accounted = pool.total_bytes + pool.pending_bytes
+        max_accounted = max(max_accounted, accounted)
+        if accounted > max_bytes:
+            violations += 1
+    pool.wait_idle()
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    per_camera = [b.bytes for b in buffers]
+    held = [(lambda r: r[1] - r[0] if r else 0.0)(b.time_range()) for b in buffers]
+    rss_end = rss_bytes()
+    tap_times.sort()
+    result = {
+        'benchmark': 'replay',
+        'config': vars(args),
+        'frames_fed': ticks * args.cameras,
+        'elapsed_s': round(elapsed, 2),
+        'tap_ms_p50': round(tap_times[len(tap_times) // 2] * 1000, 3),
+        'tap_ms_p99': round(tap_times[int(len(tap_times) * 0.99)] * 1000, 3),
+        'bytes': stats['bytes'],
+        'peak_bytes': stats['peak_bytes'],
+        'max_accounted_bytes': max_accounted,
+        'max_bytes': max_bytes,
+        'frames_held': stats['frames'],
+        'evicted': stats['evicted'],
+        'dropped': stats['dropped'],
+        'camera_mb_min': round(min(per_camera) / 1024 / 1024, 2),
+        'camera_mb_max': round(max(per_camera) / 1024 / 1024, 2),
+        'held_seconds_min': round(min(held), 1),
+        'held_seconds_max': round(max(held), 1),
+        'rss_growth_mb': round((rss_end - rss_start) / 1024 / 1024, 1) if rss_start is not None else None,
+        'violations': violations,
+    }
+    pool.close()
+    print(f"{args.cameras}台 × {args.seconds:.0f}秒（{args.format}）: 上限 {max_bytes / 1024 / 1024:.0f}MB  "
+          f"最大使用量 {result['peak_bytes'] / 1024 / 1024:.1f}MB  保持 {result['frames_held']}枚 "
+          f"（カメラ毎 {result['camera_mb_min']}～{result['camera_mb_max']}MB、{result['held_seconds_min']}～{result['held_seconds_max']}秒）")
+    print(f"  キャプチャスレッド側の処理 p50 {result['tap_ms_p50']:.2f}ms  p99 {result['tap_ms_p99']:.2f}ms  "
+          f"上限による破棄 {result['evicted']}枚  欠落 {result['dropped']}枚  RSS増加 {result['rss_growth_mb']}MB")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if rss_end is not None and rss_end - rss_start > max_bytes * 1.5 + 32 * 1024 * 1024:
+        print(f"  警告: RSSの増加（{result['rss_growth_mb']}MB）が上限を大きく超えています")
+    if violations or result['peak_bytes'] > max_bytes:
+        print(f"  上限超過: {violations}回")
+        sys.exit(1)
+    print('  上限内: OK')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# 起動時間の計測
+# オフスクリーンのQtで、仮想カメラN台（接続に --open-ms かかる合成画像）を設定したMainWindowを起動し、
+# mainモジュールのimport時間・ウィンドウの最初の描画までの時間・カメラ毎の最初のフレームまでの時間（並び順付き）を計測する
+#   python benchmarks/bench_startup.py --cameras 16 --open-ms 800 --concurrency 4
+#   python benchmarks/bench_startup.py --cameras 36 --page-size 9 --out startup.json
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+start = time.perf_counter()
+from PyQt5 import QtWidgets, QtCore
+import main as viewer
+from camera_viewer.settings import Settings
+from camera_viewer.sources import synthetic_url
+from camera_viewer.utils import parse_size
+import_s = time.perf_counter() - start
+
+# 最初のPaintイベントの時刻を記録する
+class FirstPaint(QtCore.QObject):
+    def __init__(self):
+        super().__init__()
+        self.at = None
+
+    def eventFilter(self, obj, event):
+        if self.at is None and event.type() == QtCore.QEvent.Paint:
+            self.at = time.perf_counter()
+        return False
+
+def build_settings(path, args):
+    settings = Settings(path)
+    width, height = parse_size(args.frame, (640, 360))
+    for i in range(args.cameras):
+        # IP欄がカメラの識別に使われるため、無視されるクエリで一意にする
+        url = synthetic_url(width, height, args.fps, open_ms=args.open_ms)
+        url += ('&' if '?' in url else '?') + f"cam={i}"
+        settings.set_camera(url, f"cam{i:02d}")
+    general = settings.get_general()
+    general['max_reconnects'] = str(args.concurrency)
+    general['fps'] = str(int(args.fps))
+    if args.page_size:
+        general['page_size'] = str(args.page_size)
+    return settings
+
+def main():
+    parser = argparse.ArgumentParser(description='起動時間の計測')
+    parser.add_argument('--cameras', type=int, default=16)
+    parser.add_argument('--open-ms', type=int, default=800, help='1台の接続にかかる時間（ミリ秒）')
+    parser.add_argument('--concurrency', type=int, default=4, help='同時に接続するカメラ数（max_reconnects）')
+    parser.add_argument('--page-size', type=int, default=0, help='1ページのカメラ数（0でページ分けなし）')
+    parser.add_argument('--frame', default='640x360')
+    parser.add_argument('--fps', type=float, default=20.0)
+    parser.add_argument('--timeout', type=float, default=60.0, help='全カメラの最初のフレームを待つ最大秒数')
+    parser.add_argument('--out', help='結果のJSON保存先')
+    args = parser.parse_args()
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = build_settings(os.path.join(tmp, 'camera_viewer.ini'), args)
+        painter = FirstPaint()
+        app.installEventFilter(painter)
+        t0 = time.perf_counter()
+        win = viewer.MainWindow(settings)
+        win.show()
+        # ページ外のカメラは一時停止のままなので、表示中のページのカメラが揃うまで待つ
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+            if painter.at is not None and all(w.first_frame_at is not None for w in win.visible_widgets):
+                break
+        widgets = list(win.cam_widgets)
+        first_frames = [None if w.first_frame_at is None else w.first_frame_at - t0 for w in widgets]
+        visible = set(win.visible_widgets)
+        win.close()
+        app.processEvents()
+    ms = lambda v: None if v is None else round(v * 1000, 1)
+    seen = sorted(v for v in first_frames if v is not None)
+    result = {
+        'benchmark': 'startup',
+        'config': vars(args),
+        'import_ms': ms(import_s),
+        'window_ms': ms(win.shown_at - t0 if win.shown_at else None),
+        'first_paint_ms': ms(painter.at - t0 if painter.at else None),
+        'first_frame_ms': ms(seen[0] if seen else None),
+        'visible_frames_ms': ms(max((v for w, v in zip(widgets, first_frames) if w in visible and v is not None), default=None)),
+        'all_frames_ms': ms(seen[-1] if len(seen) == len(widgets) else None),
+        'missing': len(widgets) - len(seen),
+        'cameras': [{'index': i, 'visible': w in visible, 'first_frame_ms': ms(v)}
+                    for i, (w, v) in enumerate(zip(widgets, first_frames))],
+    }
+    print(f"{args.cameras}台（接続 {args.open_ms}ms、同時 {args.concurrency}台）: import {result['import_ms']}ms  "
+          f"ウィンドウ表示 {result['window_ms']}ms  最初の描画 {result['first_paint_ms']}ms")
+    print(f"  最初のフレーム {result['first_frame_ms']}ms  表示中のページ {result['visible_frames_ms']}ms  "
+          f"全カメラ {result['all_frames_ms']}ms  未表示 {result['missing']}台")
+    for cam in result['cameras']:
+        print(f"  #{cam['index']:02d}{'' if cam['visible'] else '（ページ外）'}: {cam['first_frame_ms']}ms")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
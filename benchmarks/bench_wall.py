@@ -0,0 +1,417 @@
+# 多台数ウォールのヘッドレス・ベンチマーク
+# 実カメラの代わりに合成画像（または動画ファイル）を仮想カメラとして CaptureLoop（取得→変換→公開）を動かし、
+# GUIの代わりに表示スレッドが表示fpsで各カメラの最新フレームを受け取り、モザイクへ描き込む。
+# ステージ毎のスループット・処理時間のパーセンタイル・欠落・CPU・RSSを計測し、JSON/JSONLで保存する
+#   python benchmarks/bench_wall.py --cameras 1,4,16,64 --width 1280 --height 720 --fps 20 --out wall.jsonl
+#   python benchmarks/bench_wall.py --source sample.mp4 --cameras 9 --qt --baseline wall_prev.json
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from camera_viewer.capture import open_capture
+from camera_viewer.connection import ConnectionSupervisor, ReconnectGate
+from camera_viewer.frame_buffer import LatestFrameSlot
+from camera_viewer.pacing import PacingScheduler
+from camera_viewer.pipeline import FramePipeline
+from camera_viewer.sources import synthetic_url, FILE_SCHEME
+from camera_viewer.utils import parse_size
+from camera_viewer.worker import CaptureLoop, SlotSink
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MAX_CAMERAS = 64
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = math.floor(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+# 1ステージ分の処理時間（秒）の記録。list.appendはスレッド間で安全
+class StageStats:
+    def __init__(self):
+        self.samples = []
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def reset(self):
+        self.samples = []
+
+    def summary(self, elapsed):
+        values = sorted(self.samples)
+        ms = lambda v: None if v is None else round(v * 1000, 3)
+        return {
+            'count': len(values),
+            'per_sec': round(len(values) / elapsed, 2) if elapsed else None,
+            'mean_ms': ms(sum(values) / len(values)) if values else None,
+            'p50_ms': ms(percentile(values, 0.50)),
+            'p90_ms': ms(percentile(values, 0.90)),
+            'p99_ms': ms(percentile(values, 0.99)),
+            'max_ms': ms(values[-1] if values else None),
+        }
+
+def rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# 読み取り時間を計測するキャプチャのラッパー（CaptureLoopのopenerで差し込む）
+class TimedCapture:
+    def __init__(self, cap, stats):
+        self._cap = cap
+        self._stats = stats
+        self.last_read_done = None
+
+    def read(self):
+        start = time.perf_counter()
+        ret, frame = self._cap.read()
+        self.last_read_done = time.monotonic()
+        if ret:
+            self._stats.add(time.perf_counter() - start)
+        return ret, frame
+
+    def __getattr__(self, name):
+        return getattr(self._cap, name)
+
+# 変換（パイプライン）と公開の時間を計測するシンク。公開時刻は読み取り完了時刻にして表示までの遅延を測る
+class TimedSink(SlotSink):
+    def __init__(self, cam, stages):
+        super().__init__(cam.slot, cam.name)
+        self.cam = cam
+        self.stages = stages
+
+    def frame(self, frame, pipeline, target):
+        start = time.perf_counter()
+        rgb = pipeline.run(frame, target, exclude=self.slot.in_use())
+        mid = time.perf_counter()
+        self.slot.set_status(None)
+        cap = self.cam.cap
+        self.slot.publish(rgb, cap.last_read_done if cap is not None else None)
+        self.stages['transform'].add(mid - start)
+        self.stages['publish'].add(time.perf_counter() - mid)
+
+class VirtualCamera:
+    def __init__(self, index, url, target, pacing, stages, low_latency, gate):
+        self.name = f"cam{index:02d}"
+        self.url = url
+        self.target = target
+        self.slot = LatestFrameSlot()
+        self.cap = None
+        self.displayed = 0
+        self._stop = threading.Event()
+        self._stages = stages
+        self.connection = ConnectionSupervisor(gate=gate)
+        self.loop = CaptureLoop(url, '', '', '', self, TimedSink(self, stages), FramePipeline(name=self.name),
+                                pacing, self.connection, low_latency, opener=self._open)
+        self.thread = threading.Thread(target=self.loop.run, daemon=True)
+
+    def _open(self, url, low_latency, params, profile=None, should_stop=None):
+        self.cap = TimedCapture(open_capture(url, low_latency, params, profile, should_stop), self._stages['read'])
+        return self.cap
+
+    # CaptureLoopのcontrol
+    def is_stopped(self):
+        return self._stop.is_set()
+
+    def is_paused(self):
+        return False
+
+    def standby_mode(self):
+        return None
+
+    def needs_taps(self):
+        return False
+
+    def get_current_stream(self):
+        return 'stream2'
+
+    def target_size(self):
+        return self.target
+
+    def source_dropped(self):
+        cap = self.cap
+        return getattr(cap, 'source_dropped', 0) if cap is not None else 0
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join(timeout=5.0)
+
+# GUIの代わりの表示側: 表示fpsで全カメラの最新フレームを取り出し、モザイク（1枚の画像）へ描き込む
+class Display:
+    def __init__(self, cameras, cols, tile, fps, use_qt=False):
+        self.cameras = cameras
+        self.cols = cols
+        self.tile = tile
+        self.interval = 1.0 / fps
+        rows = math.ceil(len(cameras) / cols)
+        self.size = (cols * tile[0], rows * tile[1])
+        self.paint = StageStats()
+        self.latency = StageStats()
+        self.rss = []
+        self._stop = threading.Event()
+        self._painter = QtPainter(self.size) if use_qt else None
+        self._canvas = np.zeros((self.size[1], self.size[0], 3), dtype=np.uint8)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def reset(self):
+        self.paint.reset()
+        self.latency.reset()
+        self.rss = []
+        for cam in self.cameras:
+            cam.displayed = 0
+
+    def _draw(self, idx, frame):
+        x = (idx % self.cols) * self.tile[0]
+        y = (idx // self.cols) * self.tile[1]
+        if self._painter is not None:
+            self._painter.draw(x, y, self.tile, frame)
+            return
+        h = min(frame.shape[0], self.tile[1])
+        w = min(frame.shape[1], self.tile[0])
+        self._canvas[y:y + h, x:x + w] = frame[:h, :w]
+
+    def _run(self):
+        deadline = time.monotonic()
+        next_sample = deadline
+        while not self._stop.is_set():
+            for idx, cam in enumerate(self.cameras):
+                item = cam.slot.take()
+                if item is None:
+                    continue
+                frame, ts, _ = item
+                start = time.perf_counter()
+                self._draw(idx, frame)
+                self.paint.add(time.perf_counter() - start)
+                self.latency.add(time.monotonic() - ts)
+                cam.displayed += 1
+            now = time.monotonic()
+            if now >= next_sample:
+                self.rss.append(rss_bytes())
+                next_sample = now + 0.5
+            deadline = max(deadline + self.interval, now)
+            time.sleep(max(0.0, deadline - time.monotonic()))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join(timeout=5.0)
+
+# --qt: GUIと同じくQImage（コピーなし）を作りQPainterで拡大縮小描画する（オフスクリーン）
+class QtPainter:
+    def __init__(self, size):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5 import QtCore, QtGui
+        self.QtCore = QtCore
+        self.QtGui = QtGui
+        self.app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+        self.canvas = QtGui.QImage(size[0], size[1], QtGui.QImage.Format_RGB32)
+
+    def draw(self, x, y, tile, frame):
+        QtGui = self.QtGui
+        h, w = frame.shape[:2]
+        image = QtGui.QImage(frame.data, w, h, frame.strides[0], QtGui.QImage.Format_RGB888)
+        painter = QtGui.QPainter(self.canvas)
+        painter.drawImage(self.QtCore.QRect(x, y, tile[0], tile[1]), image)
+        painter.end()
+
+def source_url(args, index):
+    # URLはカメラの識別子（ペース制御のキー等）も兼ねるため、#番号で台毎に一意にする
+    if args.source:
+        path = os.path.abspath(args.source)
+        url = f"{FILE_SCHEME}{path}" + (f"?fps={args.source_fps:g}" if args.source_fps else '')
+    else:
+        url = synthetic_url(args.width, args.height, args.source_fps or args.fps, static=args.static)
+    return f"{url}#{index}"
+
+def run(args, n):
+    cols = math.ceil(math.sqrt(n))
+    tile = args.tile
+    pacing = PacingScheduler(args.fps)
+    stages = {'read': StageStats(), 'transform': StageStats(), 'publish': StageStats()}
+    gate = ReconnectGate(n)
+    cameras = [VirtualCamera(i, source_url(args, i), tile, pacing, stages, args.low_latency, gate) for i in range(n)]
+    display = Display(cameras, cols, tile, args.display_fps, args.qt)
+    rss_start = rss_bytes()
+    for cam in cameras:
+        cam.thread.start()
+    display.start()
+    # ウォームアップ（接続・バッファ確保）後にカウンタをリセットして計測
+    time.sleep(args.warmup)
+    for s in stages.values():
+        s.reset()
+    display.reset()
+    base = {cam.name: (cam.slot.published, cam.slot.dropped, cam.source_dropped()) for cam in cameras}
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    time.sleep(args.seconds)
+    elapsed = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    per_camera = []
+    for cam in cameras:
+        published, dropped, src_dropped = base[cam.name]
+        per_camera.append({
+            'camera': cam.name,
+            'decoded_fps': round((cam.slot.published - published) / elapsed, 2),
+            'displayed_fps': round(cam.displayed / elapsed, 2),
+            'display_dropped': cam.slot.dropped - dropped,
+            'source_dropped': cam.source_dropped() - src_dropped,
+            'reconnects': cam.connection.reconnects,
+            'latency_drift_ms': None if cam.loop.latency_drift_ms is None else round(cam.loop.latency_drift_ms, 1),
+        })
+    display.stop()
+    for cam in cameras:
+        cam._stop.set()
+    for cam in cameras:
+        cam.stop()
+    rss = [r for r in display.rss if r is not None]
+    mib = lambda v: None if v is None else round(v / 1024 / 1024, 1)
+    stage_summary = {name: s.summary(elapsed) for name, s in stages.items()}
+    stage_summary['paint'] = display.paint.summary(elapsed)
+    stage_summary['latency'] = display.latency.summary(elapsed)
+    return {
+        'cameras': n,
+        'elapsed': round(elapsed, 3),
+        'totals': {
+            'decoded_fps': round(sum(c['decoded_fps'] for c in per_camera), 2),
+            'displayed_fps': round(sum(c['displayed_fps'] for c in per_camera), 2),
+            'display_dropped': sum(c['display_dropped'] for c in per_camera),
+            'source_dropped': sum(c['source_dropped'] for c in per_camera),
+            'reconnects': sum(c['reconnects'] for c in per_camera),
+        },
+        'stages': stage_summary,
+        'cpu': {
+            'seconds': round(cpu, 3),
+            'cores': round(cpu / elapsed, 3),
+            'percent_of_machine': round(cpu / elapsed / (os.cpu_count() or 1) * 100, 1),
+        },
+        'rss_mib': {'start': mib(rss_start), 'peak': mib(max(rss) if rss else None), 'end': mib(rss_bytes())},
+        'per_camera': per_camera,
+    }
+
+# 前回の結果との比較（カメラ台数が同じ実行同士）
+COMPARE_KEYS = [
+    ('totals', 'displayed_fps', True),
+    ('totals', 'display_dropped', False),
+    ('cpu', 'cores', False),
+    ('rss_mib', 'peak', False),
+] + [(('stages', stage), 'p99_ms', False) for stage in ('read', 'transform', 'publish', 'paint', 'latency')]
+
+def load_runs(path):
+    with open(path, encoding='utf-8') as f:
+        text = f.read().strip()
+    if path.endswith('.jsonl'):
+        results = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        results = [json.loads(text)]
+    return {run['cameras']: run for result in results for run in result['runs']}
+
+def lookup(run, section, key):
+    node = run
+    for part in (section if isinstance(section, tuple) else (section,)):
+        node = node.get(part, {})
+    return node.get(key)
+
+def compare(baseline, runs):
+    for run in runs:
+        old = baseline.get(run['cameras'])
+        if old is None:
+            continue
+        print(f"--- 前回比（{run['cameras']}台） ---")
+        for section, key, higher_is_better in COMPARE_KEYS:
+            a = lookup(old, section, key)
+            b = lookup(run, section, key)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a * 100 if a else 0.0
+            worse = change < 0 if higher_is_better else change > 0
+            name = '.'.join(section if isinstance(section, tuple) else (section,)) + '.' + key
+            print(f"  {name:24s} {a:>10} → {b:<10} ({change:+.1f}%){'  ※悪化' if worse and abs(change) > 10 else ''}")
+
+def print_run(run):
+    t = run['totals']
+    print(f"=== {run['cameras']}台 / {run['elapsed']:.1f}秒 ===")
+    print(f"デコード {t['decoded_fps']:.1f} fps / 表示 {t['displayed_fps']:.1f} fps / "
+          f"表示前に上書き {t['display_dropped']} / 取得遅れで欠落 {t['source_dropped']} / 再接続 {t['reconnects']}")
+    for name, s in run['stages'].items():
+        if s['count']:
+            print(f"  {name:9s} {s['per_sec']:8.1f}/s  p50 {s['p50_ms']:7.2f}ms  p90 {s['p90_ms']:7.2f}ms  "
+                  f"p99 {s['p99_ms']:7.2f}ms  max {s['max_ms']:7.2f}ms")
+    print(f"  CPU {run['cpu']['cores']:.2f}コア（{run['cpu']['percent_of_machine']:.1f}%） / "
+          f"RSS {run['rss_mib']['start']} → 最大 {run['rss_mib']['peak']} MiB")
+
+def main():
+    parser = argparse.ArgumentParser(description='多台数ウォールのヘッドレス・ベンチマーク')
+    parser.add_argument('--cameras', default='4', help=f'仮想カメラ台数（1～{MAX_CAMERAS}）。カンマ区切りで複数回実行')
+    parser.add_argument('--source', help='キャプチャ元の動画ファイル（省略時は合成画像）')
+    parser.add_argument('--width', type=int, default=1280, help='合成画像の幅')
+    parser.add_argument('--height', type=int, default=720, help='合成画像の高さ')
+    parser.add_argument('--static', action='store_true', help='合成画像を静止画にする')
+    parser.add_argument('--fps', type=float, default=20.0, help='取得fps（[General] fps相当）')
+    parser.add_argument('--source-fps', type=float, default=0, help='カメラ側の送出fps（0で--fpsと同じ／動画はファイルのfps）')
+    parser.add_argument('--display-fps', type=float, default=60.0, help='表示側の更新レート')
+    parser.add_argument('--tile', default='480x270', help='タイルの表示サイズ')
+    parser.add_argument('--low-latency', action='store_true', help='低遅延モード（grab専用スレッド）')
+    parser.add_argument('--qt', action='store_true', help='QImage/QPainterで描画（PyQt5・オフスクリーン）')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--label', default='', help='結果に記録する識別名（バージョン等）')
+    parser.add_argument('--out', help='結果の保存先（.jsonは上書き、.jsonlは1行追記）')
+    parser.add_argument('--baseline', help='比較する前回の結果（.json / .jsonl）')
+    args = parser.parse_args()
+    args.tile = parse_size(args.tile, (480, 270))
+    counts = [max(1, min(MAX_CAMERAS, int(c))) for c in args.cameras.split(',') if c.strip()]
+    runs = []
+    for n in counts:
+        run_result = run(args, n)
+        print_run(run_result)
+        runs.append(run_result)
+    result = {
+        'benchmark': 'wall',
+        'label': args.label,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'platform': {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'baseline')},
+        'runs': runs,
+    }
+    if args.out:
+        if args.out.endswith('.jsonl'):
+            with open(args.out, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+        else:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"結果: {args.out}")
+    if args.baseline:
+        compare(load_runs(args.baseline), runs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import threading
+import time
+import cv2
+from camera_viewer.capture_profile import BUILTIN_PROFILES, DEFAULT_PROFILE
+from camera_viewer.sources import open_source
+
+# ストリームのPTSと受信時刻の差から遅延の変動を推定する
+# 最もPTSとの差が小さかったフレームを基準(0ms)とした増加分で、絶対的な遅延ではない
+# （基準時点の遅延はカメラ・ネットワーク側の遅延を含めて不明。バッファの溜まり具合の目安）
+class LagEstimator:
+    def __init__(self):
+        self._baseline = None
+        self.drift_ms = None
+
+    def reset(self):
+        self._baseline = None
+        self.drift_ms = None
+
+    def update(self, pts_ms, wall=None):
+        if pts_ms is None or pts_ms <= 0:
+            return self.drift_ms
+        wall = time.monotonic() if wall is None else wall
+        offset = wall * 1000.0 - pts_ms
+        if self._baseline is None or offset < self._baseline:
+            self._baseline = offset
+        self.drift_ms = offset - self._baseline
+        return self.drift_ms
+
+def create_capture(url, params=None, profile=None, should_stop=None):
+    # paramsはcv2.VideoCaptureのオープンパラメータ（タイムアウト等）
+    # profile（CaptureProfile）の転送方式・バッファリング・APIバックエンドを適用する
+    # should_stop: 他のプロファイルのオープン待ちを中断する条件
+    # synthetic:// と file:// はベンチマーク用のフレーム源（camera_viewer.sources）
+    source = open_source(url)
+    if source is not None:
+        return source
+    profile = profile if profile is not None else BUILTIN_PROFILES[DEFAULT_PROFILE]
+    return profile.open(url, params, should_stop)
+
+def open_capture(url, low_latency=False, params=None, profile=None, should_stop=None):
+    if low_latency:
+        return LowLatencyCapture(url, params, profile, should_stop)
+    return create_capture(url, params, profile, should_stop)
+
+# 低遅延キャプチャ: 専用スレッドでgrab()し続けてOpenCV内部バッファを空にし、
+# 表示するフレームだけretrieve()（デコード）する。cv2.VideoCaptureと同じread()/release()を持つ
+class LowLatencyCapture:
+    def __init__(self, url, params=None, profile=None, should_stop=None):
+        self.url = url
+        self._cap = create_capture(url, params, profile, should_stop)
+        self._cond = threading.Condition()
+        self._want = False
+        self._result = None
+        self._stop = False
+        self._failed = False
+        self.grabbed = 0
+        self.retrieved = 0
+        self.lag = LagEstimator()
+        self._thread = None
+        if self._cap.isOpened():
+            self._thread = threading.Thread(target=self._reader, daemon=True)
+            self._thread.start()
+
+    def isOpened(self):
+        return self._cap.isOpened() and not self._failed
+
+    def get(self, prop):
+        return self._cap.get(prop)
+
+    @property
+    def drift_ms(self):
+        return self.lag.drift_ms
+
+    def _reader(self):
+        try:
+            self._grab_loop()
+        finally:
+            # VideoCaptureの解放は読み取りスレッド自身で行う（grab中の解放を避ける）
+            self._cap.release()
+
+    def _grab_loop(self):
+        while not self._stop:
+            ok = self._cap.grab()
+            if not ok:
+                with self._cond:
+                    self._failed = True
+                    self._result = (False, None)
+                    self._cond.notify_all()
+                return
+            self.grabbed += 1
+            with self._cond:
+                want = self._want
+            if not want:
+                continue
+            ret, frame = self._cap.retrieve()
+            if ret:
+                self.retrieved += 1
+                self.lag.update(self._cap.get(cv2.CAP_PROP_POS_MSEC))
+            with self._cond:
+                self._want = False
+                self._result = (ret, frame)
+                self._cond.notify_all()
+
+    def read(self, timeout=5.0):
+        # 次にgrabされたフレームをデコードして返す
+        with self._cond:
+            if self._failed or self._thread is None:
+                return False, None
+            self._result = None
+            self._want = True
+            self._cond.wait_for(lambda: self._result is not None or self._stop, timeout)
+            result = self._result
+            self._want = False
+        if result is None:
+            return False, None
+        return result
+
+    def release(self):
+        self._stop = True
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is None:
+            self._cap.release()
+        elif self._thread is not threading.current_thread():
+            # grab()はブロックし得るため、タイムアウト付きで待つ（解放は読み取りスレッド側）
+            self._thread.join(timeout=2.0)
@@ -0,0 +1,100 @@
+import math
+from PyQt5 import QtWidgets, QtCore, QtGui
+
+# 分割表示の全タイルを1つのウィジェットで描画するコンポジタ
+# CameraWidgetはカメラ毎の制御（キャプチャ・フレーム受け取り・状態）として残し、自身は表示しない。
+# 表示レートのrefresh()で新しいフレームが届いたタイルの範囲だけupdate()し、
+# Qtがまとめた1回のpaintEventで変化したタイルだけを描き直す
+class GridCompositor(QtWidgets.QWidget):
+    # タイルのダブルクリック（CameraWidgetを渡す）
+    tile_double_clicked = QtCore.pyqtSignal(object)
+
+    def __init__(self, spacing=4, parent=None):
+        super().__init__(parent)
+        self.spacing = spacing
+        self.cameras = []
+        self.cols = 1
+        self.rows = 1
+        self._rects = []
+        self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+
+    def set_cameras(self, cameras, cols=None, rows=None):
+        # 分割数はload_camerasと同じ規則（例: 2→1x2, 4→2x2, 5→2x3, 9→3x3）
+        self.cameras = list(cameras)
+        n = len(self.cameras)
+        self.cols = cols or max(1, math.ceil(math.sqrt(n)))
+        self.rows = rows or max(1, math.ceil(n / self.cols))
+        for cam in self.cameras:
+            cam.setParent(self)
+            cam.hide()
+        self._layout_tiles()
+        self.update()
+
+    def clear(self):
+        self.cameras = []
+        self._rects = []
+        self.update()
+
+    def _layout_tiles(self):
+        s = self.spacing
+        tile_w = max(1, (self.width() - s * (self.cols - 1)) // self.cols)
+        tile_h = max(1, (self.height() - s * (self.rows - 1)) // self.rows)
+        ratio = self.devicePixelRatioF()
+        self._rects = []
+        for idx, cam in enumerate(self.cameras):
+            row, col = divmod(idx, self.cols)
+            rect = QtCore.QRect(col * (tile_w + s), row * (tile_h + s), tile_w, tile_h)
+            self._rects.append(rect)
+            cam.set_tile_size(int(tile_w * ratio), int(tile_h * ratio))
+
+    def tile_rect(self, cam):
+        return self._rects[self.cameras.index(cam)]
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._layout_tiles()
+
+    def refresh(self):
+        # GUIスレッドから表示レートで呼ばれる。変化したタイルだけ再描画を要求する
+        for cam, rect in zip(self.cameras, self._rects):
+            if cam.refresh_display():
+                self.update(rect)
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        region = event.region()
+        for cam, rect in zip(self.cameras, self._rects):
+            if not region.intersects(rect):
+                continue
+            painter.fillRect(rect, QtCore.Qt.black)
+            if cam.current_image() is None:
+                painter.setPen(QtCore.Qt.white)
+                painter.drawText(rect, QtCore.Qt.AlignCenter, cam.text())
+                continue
+            painter.save()
+            painter.setClipRect(rect)
+            cam.paint_tile(painter, rect)
+            painter.restore()
+        # タイル間の隙間・余白（背景）
+        background = QtGui.QRegion(self.rect())
+        for rect in self._rects:
+            background = background.subtracted(QtGui.QRegion(rect))
+        background = background.intersected(region)
+        if not background.isEmpty():
+            painter.setClipRegion(background)
+            painter.fillRect(self.rect(), self.palette().window())
+        painter.end()
+
+    def camera_at(self, pos):
+        for cam, rect in zip(self.cameras, self._rects):
+            if rect.contains(pos):
+                return cam
+        return None
+
+    def mouseDoubleClickEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            cam = self.camera_at(event.pos())
+            if cam is not None:
+                self.tile_double_clicked.emit(cam)
+        super().mouseDoubleClickEvent(event)
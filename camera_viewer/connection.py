@@ -0,0 +1,189 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# カメラ毎の接続状態
+CONNECTING = 'connecting'
+LIVE = 'live'
+STALLED = 'stalled'
+BACKOFF = 'backoff'
+OFFLINE = 'offline'
+
+STATE_TEXT = {
+    CONNECTING: '接続中...',
+    LIVE: None,
+    STALLED: '受信停止',
+    BACKOFF: '再接続待ち',
+    OFFLINE: 'オフライン',
+}
+
+# 同時に接続・再接続処理を行うカメラ数の上限（起動時やネットワーク瞬断時の接続の集中を防ぐ）
+# 待っているカメラはpriorityの小さい順（表示位置順）に通す
+class ReconnectGate:
+    def __init__(self, limit=4):
+        self.limit = max(1, int(limit))
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []
+        self._order = itertools.count()
+
+    @classmethod
+    def from_settings(cls, settings):
+        # [General] max_reconnects（数値でなければ既定の4）
+        try:
+            return cls(float(settings.get_general().get('max_reconnects', 4)))
+        except (ValueError, OverflowError):
+            return cls()
+
+    def acquire(self, should_stop=None, priority=0):
+        ticket = (priority, next(self._order))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                # 待っている間に停止・一時停止・ページ外になったカメラには枠を渡さない
+                if should_stop is not None and should_stop():
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    return False
+                if self._active < self.limit and self._waiting[0] == ticket:
+                    heapq.heappop(self._waiting)
+                    self._active += 1
+                    # 上限に空きがあれば次の順番のカメラも通す
+                    self._cond.notify_all()
+                    return True
+                self._cond.wait(0.2)
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+_default_gate = None
+_default_gate_lock = threading.Lock()
+
+def default_gate():
+    global _default_gate
+    with _default_gate_lock:
+        if _default_gate is None:
+            _default_gate = ReconnectGate()
+        return _default_gate
+
+# 1台分の接続状態マシン
+#   CONNECTING → LIVE → (読み取り停止) STALLED → BACKOFF → CONNECTING ...
+#   連続失敗が offline_after 回を超えると OFFLINE（最大間隔で再試行を続ける）
+class ConnectionSupervisor:
+    def __init__(self, gate=None, backoff_base=1.0, backoff_max=60.0, offline_after=5,
+                 open_timeout_ms=5000, read_timeout_ms=5000, stall_timeout=5.0):
+        self.gate = gate if gate is not None else default_gate()
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.offline_after = offline_after
+        self.open_timeout_ms = open_timeout_ms
+        self.read_timeout_ms = read_timeout_ms
+        self.stall_timeout = stall_timeout
+        # 接続待ちの順番（小さいほど先、表示位置順）
+        self.priority = 0
+        self.state = CONNECTING
+        self.failures = 0
+        self.reconnects = 0
+        self.next_attempt = 0.0
+        self.retry_delay = 0.0
+        self._last_frame = None
+        self._has_connected = False
+
+    @classmethod
+    def from_settings(cls, settings, gate=None):
+        return cls(gate=gate, **cls.options_from_settings(settings))
+
+    @staticmethod
+    def options_from_settings(settings):
+        general = settings.get_general()
+        def num(key, default):
+            try:
+                return float(general.get(key, default))
+            except ValueError:
+                return default
+        return dict(
+            backoff_max=num('backoff_max', 60.0),
+            open_timeout_ms=int(num('open_timeout_ms', 5000)),
+            read_timeout_ms=int(num('read_timeout_ms', 5000)),
+            stall_timeout=num('stall_timeout', 5.0),
+        )
+
+    def status_text(self):
+        if self.state in (BACKOFF, OFFLINE, STALLED):
+            return f"{STATE_TEXT[self.state]}（{self.retry_delay:.0f}秒後に再試行）"
+        return STATE_TEXT[self.state]
+
+    def wait_backoff(self, should_stop=None):
+        # 次の接続試行時刻まで待つ。中断されたらFalse
+        while True:
+            remaining = self.next_attempt - time.monotonic()
+            if remaining <= 0:
+                return True
+            if should_stop is not None and should_stop():
+                return False
+            time.sleep(min(remaining, 0.2))
+
+    def begin_open(self, should_stop=None, resume=False):
+        # 同時再接続数の上限を取得してから接続を開始する
+        # resume: 静止中に意図的に切断したセッションの再開（再接続数に数えない）
+        if not self.gate.acquire(should_stop, self.priority):
+            return False
+        if self._has_connected and not resume:
+            self.reconnects += 1
+        self.state = CONNECTING
+        return True
+
+    def end_open(self, ok):
+        self.gate.release()
+        if ok:
+            self._has_connected = True
+            self._last_frame = time.monotonic()
+            self.state = LIVE
+        else:
+            self._schedule_retry()
+
+    def on_frame(self):
+        self._last_frame = time.monotonic()
+        self.failures = 0
+        self.state = LIVE
+
+    def on_read_failure(self, fatal=False):
+        # 読み取り失敗。stall_timeout秒フレームが来なければ停止と判断しTrue（再接続へ）
+        if fatal or self._last_frame is None or time.monotonic() - self._last_frame >= self.stall_timeout:
+            self.state = STALLED
+            self._schedule_retry()
+            return True
+        return False
+
+    def reset(self):
+        # 一時停止・ストリーム切替など意図的な切断後は即時再接続（バックオフ中のカメラはそのまま）
+        if self.state == LIVE:
+            self.state = CONNECTING
+            self.next_attempt = 0.0
+
+    def _schedule_retry(self):
+        self.failures += 1
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (self.failures - 1)))
+        # ジッタ（0.5〜1.0倍）で複数カメラの再接続時刻をばらけさせる
+        delay *= random.uniform(0.5, 1.0)
+        self.retry_delay = delay
+        self.next_attempt = time.monotonic() + delay
+        if self.failures >= self.offline_after:
+            self.state = OFFLINE
+        elif self.state != STALLED:
+            self.state = BACKOFF
+
+def capture_params(open_timeout_ms, read_timeout_ms):
+    # cv2.VideoCaptureへ渡すタイムアウト設定（古いOpenCVでは空）
+    import cv2
+    params = []
+    if hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC') and open_timeout_ms:
+        params += [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout_ms)]
+    if hasattr(cv2, 'CAP_PROP_READ_TIMEOUT_MSEC') and read_timeout_ms:
+        params += [cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout_ms)]
+    return params
@@ -0,0 +1,69 @@
+import threading
+import time
+
+# キャプチャスレッド→GUIスレッドへの最新フレーム受け渡し（1枠のみ・上書き式）
+# 表示されずに上書きされたフレームはdroppedとして数える
+class LatestFrameSlot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._timestamp = 0.0
+        self._seq = 0
+        self._taken_seq = 0
+        self._taken_frame = None
+        self._status = None
+        self._status_seq = 0
+        self._status_taken = 0
+        self.published = 0
+        self.dropped = 0
+        # 動き検出の結果（検出無効時はFalseのまま）
+        self.motion_active = False
+
+    def publish(self, frame, timestamp=None):
+        # frameは公開後に書き換えないこと（GUI側でコピーせず参照する）
+        with self._lock:
+            if self._seq != self._taken_seq:
+                self.dropped += 1
+            self._frame = frame
+            self._timestamp = time.monotonic() if timestamp is None else timestamp
+            self._seq += 1
+            self.published += 1
+
+    def take(self):
+        # 前回以降に新しいフレームがあれば (frame, timestamp, seq) を返す
+        with self._lock:
+            if self._seq == self._taken_seq:
+                return None
+            self._taken_seq = self._seq
+            self._taken_frame = self._frame
+            return self._frame, self._timestamp, self._seq
+
+    def peek(self):
+        # 最新フレームを消費せずに参照（スナップショット等用）
+        with self._lock:
+            return self._frame, self._timestamp, self._seq
+
+    def pending(self):
+        # 表示待ちのフレーム数（0か1）
+        with self._lock:
+            return int(self._seq != self._taken_seq)
+
+    def in_use(self):
+        # GUI側が参照し得るフレーム（未取得の最新・表示中）。出力バッファの使い回し時に避ける
+        with self._lock:
+            return (self._frame, self._taken_frame)
+
+    def set_status(self, text):
+        # 接続中/取得失敗などの表示文字列（GUIスレッドで反映）
+        with self._lock:
+            if text == self._status:
+                return
+            self._status = text
+            self._status_seq += 1
+
+    def take_status(self):
+        with self._lock:
+            if self._status_seq == self._status_taken:
+                return False, None
+            self._status_taken = self._status_seq
+            return True, self._status
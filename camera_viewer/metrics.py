@@ -0,0 +1,236 @@
+import csv
+import http.server
+import json
+import os
+import threading
+import time
+
+# 計測するステージ（readはキャプチャ、resize～convertはパイプライン、paintはGUI）
+STAGES = ('read', 'resize', 'flip', 'overlay', 'convert', 'paint')
+# キャプチャ側のステージ（プロセス方式ではワーカーからリング経由で受け取る）
+CAPTURE_STAGES = STAGES[:-1]
+# 処理時間の指数移動平均の係数
+EWMA_ALPHA = 0.1
+# fpsを計算し直す最小間隔（秒）
+RATE_INTERVAL = 1.0
+
+FIELDS = ['camera', 'decode_fps', 'display_fps'] + [f'{s}_ms' for s in STAGES] + \
+         ['queue_depth', 'dropped', 'reconnects', 'latency_drift_ms', 'decoded', 'displayed']
+
+# 1台分の実行時メトリクス
+# キャプチャスレッドとGUIスレッドが属性を直接更新する（値の読み書きのみで、ロックは取らない）
+class CameraMetrics:
+    def __init__(self, key, name=''):
+        self.key = key
+        self.name = name or key
+        self.stage_ms = {}
+        self.decoded = 0
+        self.displayed = 0
+        self.decode_fps = 0.0
+        self.display_fps = 0.0
+        self.queue_depth = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.latency_drift_ms = None
+        # collect(metrics): スナップショット前にキュー深さ・欠落数などを最新にする関数
+        self.collect = None
+        self._lock = threading.Lock()
+        self._rate_at = time.monotonic()
+        self._rate_counts = (0, 0)
+
+    def record(self, stage, seconds):
+        ms = seconds * 1000.0
+        prev = self.stage_ms.get(stage)
+        self.stage_ms[stage] = ms if prev is None else prev + (ms - prev) * EWMA_ALPHA
+
+    def frame_decoded(self):
+        self.decoded += 1
+
+    def frame_displayed(self):
+        self.displayed += 1
+
+    def update_rates(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = now - self._rate_at
+            if elapsed < RATE_INTERVAL:
+                return
+            decoded, displayed = self._rate_counts
+            self.decode_fps = (self.decoded - decoded) / elapsed
+            self.display_fps = (self.displayed - displayed) / elapsed
+            self._rate_at = now
+            self._rate_counts = (self.decoded, self.displayed)
+
+    def snapshot(self):
+        if self.collect is not None:
+            self.collect(self)
+        self.update_rates()
+        row = {
+            'camera': self.name,
+            'decode_fps': round(self.decode_fps, 2),
+            'display_fps': round(self.display_fps, 2),
+        }
+        for stage in STAGES:
+            ms = self.stage_ms.get(stage)
+            row[f'{stage}_ms'] = None if ms is None else round(ms, 3)
+        row.update(
+            queue_depth=self.queue_depth,
+            dropped=self.dropped,
+            reconnects=self.reconnects,
+            latency_drift_ms=None if self.latency_drift_ms is None else round(self.latency_drift_ms, 1),
+            decoded=self.decoded,
+            displayed=self.displayed,
+        )
+        return row
+
+    def overlay_lines(self):
+        # タイル上のデバッグ表示用
+        row = self.snapshot()
+        stages = ' '.join(f"{s} {row[f'{s}_ms']:.1f}" for s in STAGES if row[f'{s}_ms'] is not None)
+        drift = '-' if row['latency_drift_ms'] is None else f"+{row['latency_drift_ms']:.0f}ms"
+        return [
+            f"デコード {row['decode_fps']:.1f}fps / 表示 {row['display_fps']:.1f}fps",
+            f"{stages} (ms)",
+            f"キュー {row['queue_depth']} / 欠落 {row['dropped']} / 再接続 {row['reconnects']} / 遅延変動 {drift}",
+        ]
+
+# 全カメラのメトリクス（GUIスレッドで登録、エクスポータのスレッドから参照）
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cameras = {}
+
+    def add(self, metrics):
+        with self._lock:
+            self._cameras[metrics.key] = metrics
+        return metrics
+
+    def remove(self, key):
+        with self._lock:
+            self._cameras.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cameras.clear()
+
+    def cameras(self):
+        with self._lock:
+            return list(self._cameras.values())
+
+    def snapshot(self):
+        return [m.snapshot() for m in self.cameras()]
+
+    def prometheus_text(self):
+        rows = self.snapshot()
+        lines = []
+        def metric(name, kind, help_text, values):
+            lines.append(f"# HELP camera_viewer_{name} {help_text}")
+            lines.append(f"# TYPE camera_viewer_{name} {kind}")
+            for labels, value in values:
+                if value is None:
+                    continue
+                label_text = ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+                lines.append(f"camera_viewer_{name}{{{label_text}}} {value}")
+        cam = lambda row: [('camera', row['camera'])]
+        metric('decode_fps', 'gauge', 'Frames decoded per second', [(cam(r), r['decode_fps']) for r in rows])
+        metric('display_fps', 'gauge', 'Frames displayed per second', [(cam(r), r['display_fps']) for r in rows])
+        metric('stage_ms', 'gauge', 'Average processing time per stage in milliseconds',
+               [(cam(r) + [('stage', s)], r[f'{s}_ms']) for r in rows for s in STAGES])
+        metric('queue_depth', 'gauge', 'Frames waiting to be displayed or written', [(cam(r), r['queue_depth']) for r in rows])
+        metric('latency_drift_ms', 'gauge', 'Stream latency increase over the lowest observed PTS offset in milliseconds', [(cam(r), r['latency_drift_ms']) for r in rows])
+        metric('dropped_frames_total', 'counter', 'Frames dropped before display or recording', [(cam(r), r['dropped']) for r in rows])
+        metric('reconnects_total', 'counter', 'Reconnections', [(cam(r), r['reconnects']) for r in rows])
+        metric('frames_decoded_total', 'counter', 'Frames decoded', [(cam(r), r['decoded']) for r in rows])
+        metric('frames_displayed_total', 'counter', 'Frames displayed', [(cam(r), r['displayed']) for r in rows])
+        return '\n'.join(lines) + '\n'
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# 定期的にCSV（1行1カメラ）またはJSONL（1行1回分）へ追記する
+class MetricsLogger:
+    def __init__(self, registry, path, interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.interval = max(1.0, float(interval))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write(self.registry.snapshot())
+            except OSError as e:
+                print(f"メトリクスの書き込み失敗: {e}")
+
+    def write(self, rows):
+        now = time.time()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.path.lower().endswith('.csv'):
+            new_file = not os.path.exists(self.path)
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=['timestamp'] + FIELDS)
+                if new_file:
+                    writer.writeheader()
+                for row in rows:
+                    writer.writerow(dict(row, timestamp=round(now, 3)))
+        else:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'timestamp': round(now, 3), 'cameras': rows}, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+
+# Prometheus形式のテキストを返すローカルHTTPエンドポイント（GET /metrics）
+class MetricsServer:
+    def __init__(self, registry, port, host='127.0.0.1'):
+        self.registry = registry
+        server = self
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = server.registry.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+        self._httpd = http.server.ThreadingHTTPServer((host, int(port)), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def start_exporters(registry, settings):
+    # [General] metrics_log / metrics_log_interval / metrics_port から出力先を起動（close()を持つオブジェクトのリスト）
+    general = settings.get_general()
+    exporters = []
+    path = general.get('metrics_log', '').strip()
+    if path:
+        try:
+            interval = float(general.get('metrics_log_interval', '10'))
+        except ValueError:
+            interval = 10.0
+        exporters.append(MetricsLogger(registry, path, interval))
+    try:
+        port = int(general.get('metrics_port', '0') or 0)
+    except ValueError:
+        port = 0
+    if port:
+        try:
+            exporters.append(MetricsServer(registry, port))
+        except OSError as e:
+            print(f"メトリクスのHTTPエンドポイントを開始できません（ポート{port}）: {e}")
+    return exporters
@@ -0,0 +1,55 @@
+import time
+import cv2
+
+# 動き検出用の縮小サイズ（グレースケール）
+MOTION_SIZE = (64, 36)
+# 画素の輝度差がこれを超えたら「変化あり」
+PIXEL_THRESHOLD = 25
+
+# 縮小グレースケール画像のフレーム差分による簡易動き検出
+# sensitivity(0～1): 大きいほど小さな動きにも反応する
+# sample_seconds: 静止中は切断し、この秒数毎に再接続して動きを確認する（0で接続を維持しidle_fpsで表示）
+class MotionDetector:
+    def __init__(self, sensitivity=0.5, hold_seconds=3.0, size=MOTION_SIZE, sample_seconds=0.0):
+        self.sensitivity = sensitivity
+        self.hold_seconds = hold_seconds
+        self.sample_seconds = sample_seconds
+        self.size = size
+        self.score = 0.0
+        self.active = True  # 起動直後はフルレートで表示
+        self._prev = None
+        self._small = None
+        self._gray = None
+        self._diff = None
+        self._last_motion = time.monotonic()
+
+    def threshold(self):
+        # 変化画素の割合の閾値（sensitivity=0.5で約2.6%）
+        s = max(0.0, min(1.0, self.sensitivity))
+        return 0.001 + (1.0 - s) * 0.05
+
+    def update(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        w, h = self.size
+        if self._small is None:
+            self._small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+            self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY)
+            self._prev = self._gray.copy()
+            self._diff = self._gray.copy()
+            return self.active
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        cv2.absdiff(self._gray, self._prev, dst=self._diff)
+        self._prev, self._gray = self._gray, self._prev
+        changed = cv2.countNonZero(cv2.threshold(self._diff, PIXEL_THRESHOLD, 255, cv2.THRESH_BINARY, dst=self._diff)[1])
+        self.score = changed / float(w * h)
+        if self.score >= self.threshold():
+            self._last_motion = now
+        # 動きが止まってもhold_seconds秒はアクティブのまま（ちらつき防止）
+        self.active = now - self._last_motion < self.hold_seconds
+        return self.active
+
+    def reset(self):
+        self._small = None
+        self.active = True
+        self._last_motion = time.monotonic()
@@ -0,0 +1,432 @@
+import multiprocessing
+import os
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from camera_viewer.metrics import CAPTURE_STAGES
+
+# プロセスプール方式のデコードバックエンド
+# ワーカープロセスが1台以上のRTSPを受信・デコードし、共有メモリのリングバッファへ書き込む。
+# GUIプロセスはリングをnumpy配列としてマップし、コピーせずにQImage化する。
+
+# 制御ヘッダ（int64）のインデックス
+CTRL_LATEST = 0     # 最新フレームのseq（ワーカーが書く）
+CTRL_STATUS = 1     # 状態（ワーカー/スーパーバイザが書く）
+CTRL_PAUSED = 2     # 一時停止要求（GUIが書く）。PAUSED_RELEASEは切断を伴う一時停止、PAUSED_PREWARMは接続のみ
+CTRL_STREAM = 3     # 1: stream1 / 2: stream2（GUIが書く）
+CTRL_HEARTBEAT = 4  # キャプチャスレッドの最終生存時刻(ms)。ループ・待機のたびに更新し、デコード・I/Oで止まると古くなる
+CTRL_TARGET_W = 5   # 縮小先の幅（0で縮小なし、GUIが書く）
+CTRL_TARGET_H = 6   # 縮小先の高さ
+CTRL_MOTION = 7     # 動き検出の結果（ワーカーが書く）
+CTRL_STAGE_US = 8   # 8～12: キャプチャ側ステージの平均処理時間(us)、-1で未計測（ワーカーが書く）
+CTRL_DECODED = 13   # デコードしたフレーム数
+CTRL_RECONNECTS = 14
+CTRL_LATENCY_DRIFT_US = 15  # 遅延変動(us)、-1で不明
+CTRL_HELD = 16      # GUIが表示に使っているフレームのseq（GUIが書く）。ワーカーはこのスロットに書き込まない
+CTRL_SIZE = 17
+PAUSED_RELEASE = 2
+PAUSED_PREWARM = 3
+# スロットメタ（int64）: seq, 高さ, 幅, タイムスタンプ(us)。書き込み中のスロットのseqは0
+META_FIELDS = 4
+
+# ハートビートが止まったとみなすまでの余裕（秒）。オープン・読み取りのタイムアウトに足す（spawnの起動時間を含む）
+HEARTBEAT_MARGIN = 10.0
+
+STATUS_CONNECTING = 0
+STATUS_LIVE = 1
+STATUS_FAILED = 2
+STATUS_RESTARTING = 3
+STATUS_BACKOFF = 4
+STATUS_OFFLINE = 5
+STATUS_STALLED = 6
+
+STATUS_TEXT = {
+    STATUS_CONNECTING: '接続中...',
+    STATUS_LIVE: None,
+    STATUS_FAILED: '取得失敗',
+    STATUS_RESTARTING: 'ワーカー再起動中...',
+    STATUS_BACKOFF: '再接続待ち',
+    STATUS_OFFLINE: 'オフライン',
+    STATUS_STALLED: '受信停止',
+}
+
+# 1台分の共有メモリリング。GUI側(create=True)とワーカー側(名前で接続)の両方で使う
+class FrameRing:
+    def __init__(self, name=None, max_width=1920, max_height=1080, slots=4, create=False):
+        self.max_width = max_width
+        self.max_height = max_height
+        self.slots = slots
+        self.frame_bytes = max_width * max_height * 3
+        size = 8 * CTRL_SIZE + 8 * META_FIELDS * slots + self.frame_bytes * slots
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        offset = 0
+        self.ctrl = np.ndarray((CTRL_SIZE,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * CTRL_SIZE
+        self.meta = np.ndarray((slots, META_FIELDS), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * META_FIELDS * slots
+        self.data = np.ndarray((slots, self.frame_bytes), dtype=np.uint8, buffer=buf, offset=offset)
+        if create:
+            self.ctrl[:] = 0
+            self.meta[:] = 0
+            self.ctrl[CTRL_STREAM] = 2
+            self.ctrl[CTRL_STAGE_US:CTRL_STAGE_US + len(CAPTURE_STAGES)] = -1
+            self.ctrl[CTRL_LATENCY_DRIFT_US] = -1
+        self._last_seq = 0
+        self._last_status = None
+        self._write_idx = None
+        self.dropped = 0
+
+    def spec(self):
+        return (self.name, self.max_width, self.max_height, self.slots)
+
+    def _slot_of(self, seq):
+        if seq <= 0:
+            return None
+        for idx in range(self.slots):
+            if int(self.meta[idx, 0]) == seq:
+                return idx
+        return None
+
+    # --- ワーカー側 ---
+    def begin_write(self, width, height):
+        # 次に書き込むスロットを選び (スロット番号, (height, width, 3) のビュー) を返す
+        # 公開中の最新フレームとGUIが表示に使っているフレーム（CTRL_HELD）のスロットは避ける
+        avoid = {self._slot_of(int(self.ctrl[CTRL_LATEST])), self._slot_of(int(self.ctrl[CTRL_HELD]))}
+        start = 0 if self._write_idx is None else self._write_idx + 1
+        for i in range(self.slots):
+            idx = (start + i) % self.slots
+            if idx not in avoid:
+                break
+        self._write_idx = idx
+        # 書き込み中はseqを0にして、GUI側で読みかけのフレームを無効にする
+        self.meta[idx, 0] = 0
+        return idx, self.data[idx, :width * height * 3].reshape(height, width, 3)
+
+    def commit(self, idx, seq, width, height, timestamp):
+        self.meta[idx, 1] = height
+        self.meta[idx, 2] = width
+        self.meta[idx, 3] = int(timestamp * 1e6)
+        self.meta[idx, 0] = seq
+        self.ctrl[CTRL_LATEST] = seq
+
+    def set_status_code(self, code):
+        self.ctrl[CTRL_STATUS] = code
+
+    def heartbeat(self):
+        self.ctrl[CTRL_HEARTBEAT] = int(time.monotonic() * 1000)
+
+    # --- GUI側（LatestFrameSlotと同じtake/take_statusを持つ） ---
+    def take(self):
+        # 返すビューは次のtake()まで書き換えられない（CTRL_HELDで予約する）
+        for _ in range(self.slots):
+            seq = int(self.ctrl[CTRL_LATEST])
+            if seq == self._last_seq or seq == 0:
+                return None
+            self.ctrl[CTRL_HELD] = seq
+            # 予約の前に新しいフレームが公開されていたら、ワーカーが予約に気付かず書き込み得るので読み直す
+            if int(self.ctrl[CTRL_LATEST]) != seq:
+                continue
+            idx = self._slot_of(seq)
+            if idx is None:
+                continue
+            h = int(self.meta[idx, 1])
+            w = int(self.meta[idx, 2])
+            ts = self.meta[idx, 3] / 1e6
+            if self._last_seq and seq > self._last_seq + 1:
+                self.dropped += seq - self._last_seq - 1
+            self._last_seq = seq
+            return self.data[idx, :w * h * 3].reshape(h, w, 3), ts, seq
+        return None
+
+    def pending(self):
+        seq = int(self.ctrl[CTRL_LATEST])
+        return int(seq != 0 and seq != self._last_seq)
+
+    def peek(self):
+        # スクショ等の別スレッド用にコピーを返す。コピー中にワーカーが書き換え始めたら読み直す
+        for _ in range(self.slots):
+            seq = int(self.ctrl[CTRL_LATEST])
+            if seq == 0:
+                break
+            idx = self._slot_of(seq)
+            if idx is None:
+                continue
+            h = int(self.meta[idx, 1])
+            w = int(self.meta[idx, 2])
+            ts = self.meta[idx, 3] / 1e6
+            frame = self.data[idx, :w * h * 3].reshape(h, w, 3).copy()
+            if int(self.meta[idx, 0]) == seq:
+                return frame, ts, seq
+        return None, 0.0, 0
+
+    def take_status(self):
+        code = int(self.ctrl[CTRL_STATUS])
+        if code == self._last_status:
+            return False, None
+        self._last_status = code
+        return True, STATUS_TEXT.get(code)
+
+    @property
+    def motion_active(self):
+        return bool(self.ctrl[CTRL_MOTION])
+
+    def write_metrics(self, metrics):
+        # ワーカー側: CameraMetricsの値を制御ヘッダへ書く
+        for i, stage in enumerate(CAPTURE_STAGES):
+            ms = metrics.stage_ms.get(stage)
+            self.ctrl[CTRL_STAGE_US + i] = -1 if ms is None else int(ms * 1000)
+        self.ctrl[CTRL_DECODED] = metrics.decoded
+        self.ctrl[CTRL_RECONNECTS] = metrics.reconnects
+        self.ctrl[CTRL_LATENCY_DRIFT_US] = -1 if metrics.latency_drift_ms is None else int(metrics.latency_drift_ms * 1000)
+
+    def read_metrics(self, metrics):
+        # GUI側: ワーカーの計測値をCameraMetricsへ反映
+        if self.ctrl is None:
+            return
+        for i, stage in enumerate(CAPTURE_STAGES):
+            us = int(self.ctrl[CTRL_STAGE_US + i])
+            if us >= 0:
+                metrics.stage_ms[stage] = us / 1000.0
+        metrics.decoded = int(self.ctrl[CTRL_DECODED])
+        metrics.reconnects = int(self.ctrl[CTRL_RECONNECTS])
+        drift = int(self.ctrl[CTRL_LATENCY_DRIFT_US])
+        metrics.latency_drift_ms = None if drift < 0 else drift / 1000.0
+
+    def set_paused(self, paused, standby=None):
+        # standby: 一時停止中の扱いの上書き（'release'で切断、Noneでカメラの既定）
+        if paused and standby == 'release':
+            self.ctrl[CTRL_PAUSED] = PAUSED_RELEASE
+        elif paused and standby == 'prewarm':
+            self.ctrl[CTRL_PAUSED] = PAUSED_PREWARM
+        else:
+            self.ctrl[CTRL_PAUSED] = int(bool(paused))
+
+    def set_stream(self, stream):
+        self.ctrl[CTRL_STREAM] = 1 if stream == 'stream1' else 2
+
+    def set_target_size(self, size):
+        w, h = size if size else (0, 0)
+        self.ctrl[CTRL_TARGET_H] = h
+        self.ctrl[CTRL_TARGET_W] = w
+
+    def target_size(self):
+        w = int(self.ctrl[CTRL_TARGET_W])
+        h = int(self.ctrl[CTRL_TARGET_H])
+        return (w, h) if w and h else None
+
+    def close(self, unlink=False):
+        # numpyビューを先に解放しないとSharedMemory.close()がBufferErrorになる
+        self.ctrl = self.meta = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+# ワーカー側のCaptureLoop用アダプタ（制御はリングの制御ヘッダ、出力はリングのスロット）
+class RingControl:
+    def __init__(self, ring, stop_event):
+        self.ring = ring
+        self.stop_event = stop_event
+
+    def is_stopped(self):
+        # CaptureLoopはループ毎・待機中に必ず呼ぶので、ここでハートビートを更新する
+        self.ring.heartbeat()
+        return self.stop_event.is_set()
+
+    def is_paused(self):
+        return bool(self.ring.ctrl[CTRL_PAUSED])
+
+    def standby_mode(self):
+        return {PAUSED_RELEASE: 'release', PAUSED_PREWARM: 'prewarm'}.get(int(self.ring.ctrl[CTRL_PAUSED]))
+
+    def needs_taps(self):
+        return False
+
+    def get_current_stream(self):
+        return 'stream1' if int(self.ring.ctrl[CTRL_STREAM]) == 1 else 'stream2'
+
+    def target_size(self):
+        # タイルサイズ（なければリング上限）
+        ring = self.ring
+        target = ring.target_size() or (ring.max_width, ring.max_height)
+        return (min(target[0], ring.max_width), min(target[1], ring.max_height))
+
+class RingSink:
+    def __init__(self, ring, metrics=None):
+        from camera_viewer import connection
+        self.ring = ring
+        self.metrics = metrics
+        self.seq = int(ring.ctrl[CTRL_LATEST])
+        self.state_codes = {
+            connection.CONNECTING: STATUS_CONNECTING,
+            connection.LIVE: STATUS_LIVE,
+            connection.BACKOFF: STATUS_BACKOFF,
+            connection.OFFLINE: STATUS_OFFLINE,
+            connection.STALLED: STATUS_STALLED,
+        }
+
+    def status(self, state, text):
+        self.ring.set_status_code(self.state_codes.get(state, STATUS_FAILED))
+
+    def activity(self, active):
+        self.ring.ctrl[CTRL_MOTION] = int(bool(active))
+
+    def frame(self, frame, pipeline, target):
+        # 最後のRGB変換は共有メモリのスロットへ直接書き込む
+        w, h = pipeline.prepare(frame.shape, target)
+        self.seq += 1
+        idx, dst = self.ring.begin_write(w, h)
+        pipeline.run(frame, target, dst=dst)
+        self.ring.commit(idx, self.seq, w, h, time.time())
+        self.ring.set_status_code(STATUS_LIVE)
+        if self.metrics is not None:
+            self.ring.write_metrics(self.metrics)
+
+def _capture_loop(cam, ring, stop_event, gate):
+    from camera_viewer.connection import ConnectionSupervisor
+    from camera_viewer.metrics import CameraMetrics
+    from camera_viewer.motion import MotionDetector
+    from camera_viewer.pacing import PacingScheduler
+    from camera_viewer.pipeline import FramePipeline
+    from camera_viewer.worker import CaptureLoop, STANDBY_WARM
+    pipeline = FramePipeline(cam['flip_h'], cam['flip_v'], cam['name'], cam.get('crop'))
+    motion = MotionDetector(**cam['motion']) if cam.get('motion') else None
+    metrics = CameraMetrics(cam['ip'], cam['name'])
+    connection = ConnectionSupervisor(gate=gate, **cam.get('connection', {}))
+    # 接続の順番（分割表示の並び順）
+    connection.priority = cam.get('priority', 0)
+    loop = CaptureLoop(cam['ip'], cam['user'], cam['password'], cam['port'],
+                       RingControl(ring, stop_event), RingSink(ring, metrics), pipeline,
+                       PacingScheduler(cam.get('fps') or 20, idle_fps=cam.get('idle_fps', 2.0)),
+                       connection,
+                       standby=cam.get('standby', STANDBY_WARM), motion=motion, metrics=metrics,
+                       profile=cam.get('profile'), url=cam.get('source_url'))
+    loop.run()
+
+def _worker_main(cams, ring_specs, stop_event, max_reconnects=4):
+    # ワーカープロセス本体。担当カメラ毎に1スレッド（cv2のデコード中はGILが解放される）
+    from camera_viewer.connection import ReconnectGate
+    rings = [FrameRing(name, w, h, slots) for name, w, h, slots in ring_specs]
+    gate = ReconnectGate(max_reconnects)
+    threads = []
+    for cam, ring in zip(cams, rings):
+        t = threading.Thread(target=_capture_loop, args=(cam, ring, stop_event, gate), daemon=True)
+        t.start()
+        threads.append(t)
+    stop_event.wait()
+    for t in threads:
+        t.join(timeout=2.0)
+    for ring in rings:
+        ring.close()
+
+def _stall_seconds(cam):
+    # オープン・読み取りはタイムアウトまで戻らないことがあるので、その分は待つ
+    options = cam.get('connection', {})
+    timeout_ms = max(options.get('open_timeout_ms', 5000), options.get('read_timeout_ms', 5000))
+    return timeout_ms / 1000.0 + HEARTBEAT_MARGIN
+
+# GUIプロセス側: リング作成・ワーカー起動・監視（クラッシュ時はバックオフ付きで再起動）
+class ProcessDecodeBackend:
+    def __init__(self, cameras, workers=None, max_width=1920, max_height=1080, slots=4, max_reconnects=4):
+        # cameras: dict(ip, user, password, port, flip_h, flip_v, name, fps, priority) のリスト
+        self._ctx = multiprocessing.get_context('spawn')
+        self.cameras = list(cameras)
+        self.rings = {}
+        for cam in self.cameras:
+            self.rings[cam['ip']] = FrameRing(max_width=max_width, max_height=max_height, slots=slots, create=True)
+        if not workers:
+            workers = max(1, (os.cpu_count() or 2) - 1)
+        workers = max(1, min(workers, len(self.cameras) or 1))
+        # カメラをワーカーへ順番に割り当て
+        self._groups = [self.cameras[i::workers] for i in range(workers)]
+        self._groups = [g for g in self._groups if g]
+        self._procs = [None] * len(self._groups)
+        self._stop_events = [None] * len(self._groups)
+        self.restarts = [0] * len(self._groups)
+        self._next_start = [0.0] * len(self._groups)
+        # ハートビートがこの秒数止まったワーカーは固まったとみなして再起動する
+        self._stall_seconds = [max(_stall_seconds(c) for c in g) for g in self._groups]
+        self._closing = False
+        # 同時再接続数の上限はワーカー数で分け合う
+        self._max_reconnects = max(1, int(max_reconnects) // len(self._groups or [0]))
+        for i in range(len(self._groups)):
+            self._start_worker(i)
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+    def ring(self, ip):
+        return self.rings.get(ip)
+
+    def _start_worker(self, i):
+        cams = self._groups[i]
+        specs = [self.rings[c['ip']].spec() for c in cams]
+        # 前のワーカーの古いハートビートで再起動直後に止まったと判定しない
+        for c in cams:
+            self.rings[c['ip']].heartbeat()
+        stop_event = self._ctx.Event()
+        proc = self._ctx.Process(target=_worker_main, args=(cams, specs, stop_event, self._max_reconnects), daemon=True)
+        proc.start()
+        self._procs[i] = proc
+        self._stop_events[i] = stop_event
+
+    def _supervise(self):
+        while not self._closing:
+            now = time.monotonic()
+            for i, proc in enumerate(self._procs):
+                if self._closing or proc is None:
+                    continue
+                if proc.is_alive():
+                    stalled = self._stalled_camera(i, now)
+                    if stalled is not None:
+                        # デコード・I/Oで固まったキャプチャスレッドは止められないので、ワーカーごと終了させる
+                        print(f"デコードワーカー{i}の{stalled}が{self._stall_seconds[i]:.0f}秒応答しません。終了させます")
+                        proc.terminate()
+                        proc.join(timeout=1.0)
+                    continue
+                if self._next_start[i] == 0.0:
+                    # 異常終了を検知: 指数バックオフ後に再起動
+                    delay = min(30.0, 2.0 ** self.restarts[i])
+                    self._next_start[i] = now + delay
+                    for cam in self._groups[i]:
+                        self.rings[cam['ip']].set_status_code(STATUS_RESTARTING)
+                    print(f"デコードワーカー{i}が終了しました(exitcode={proc.exitcode})。{delay:.0f}秒後に再起動します")
+                elif now >= self._next_start[i]:
+                    self._next_start[i] = 0.0
+                    self.restarts[i] += 1
+                    self._start_worker(i)
+            time.sleep(0.5)
+
+    def _stalled_camera(self, i, now):
+        # ハートビートが止まっているカメラ（無ければNone）
+        for cam in self._groups[i]:
+            ring = self.rings.get(cam['ip'])
+            if ring is not None and now * 1000 - int(ring.ctrl[CTRL_HEARTBEAT]) > self._stall_seconds[i] * 1000:
+                return cam['ip']
+        return None
+
+    def close(self):
+        self._closing = True
+        for ev in self._stop_events:
+            if ev is not None:
+                ev.set()
+        for proc in self._procs:
+            if proc is None:
+                continue
+            proc.join(timeout=3.0)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout=1.0)
+        for ring in self.rings.values():
+            ring.close(unlink=True)
+        self.rings.clear()
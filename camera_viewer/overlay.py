@@ -0,0 +1,148 @@
+import glob
+import os
+import threading
+import cv2
+import numpy as np
+
+# 日本語フォント候補（Windows / Linux / macOS）
+FONT_CANDIDATES = [
+    'C:/Windows/Fonts/msgothic.ttc',
+    'C:/Windows/Fonts/meiryo.ttc',
+    'C:/Windows/Fonts/YuGothM.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/fonts-japanese-gothic.ttf',
+    '/usr/share/fonts/truetype/takao-gothic/TakaoGothic.ttf',
+    '/usr/share/fonts/opentype/ipafont-gothic/ipag.ttf',
+    '/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc',
+    '/System/Library/Fonts/Hiragino Sans GB.ttc',
+]
+FONT_GLOBS = [
+    '/usr/share/fonts/**/*CJK*.tt[cf]',
+    '/usr/share/fonts/**/*Gothic*.tt[cf]',
+    os.path.join(os.path.expanduser('~'), '.fonts', '**', '*.tt[cf]'),
+]
+
+_font_path = None
+_font_path_searched = False
+_font_cache = {}
+_font_lock = threading.Lock()
+_pil_modules = None
+
+def _pil():
+    # PILは最初のフォント読み込みで一度だけimportする（起動時のimportで待たないように）
+    # PILが無い環境ではNone（cv2.putTextで描画、日本語は表示不可）
+    global _pil_modules
+    if _pil_modules is None:
+        try:
+            from PIL import ImageFont, ImageDraw, Image
+            _pil_modules = (ImageFont, ImageDraw, Image)
+        except ImportError:
+            _pil_modules = ()
+    return _pil_modules or None
+
+def find_font_path():
+    # 日本語フォントのパスを一度だけ探索してキャッシュ
+    global _font_path, _font_path_searched
+    if _font_path_searched:
+        return _font_path
+    path = None
+    for cand in FONT_CANDIDATES:
+        if os.path.exists(cand):
+            path = cand
+            break
+    if path is None:
+        for pattern in FONT_GLOBS:
+            found = sorted(glob.glob(pattern, recursive=True))
+            if found:
+                path = found[0]
+                break
+    _font_path = path
+    _font_path_searched = True
+    return path
+
+def get_font(size):
+    # ImageFont.truetypeはサイズ毎に一度だけ読み込む
+    with _font_lock:
+        pil = _pil()
+        if pil is None:
+            return None
+        ImageFont = pil[0]
+        font = _font_cache.get(size)
+        if font is None:
+            path = find_font_path()
+            try:
+                font = ImageFont.truetype(path, size) if path else ImageFont.load_default()
+            except Exception:
+                font = ImageFont.load_default()
+            _font_cache[size] = font
+        return font
+
+def render_label_sprite(text, font_size=28, pad=4):
+    # 白文字＋半透明黒背景のラベルをRGBAスプライトとして描画
+    font = get_font(font_size)
+    if font is not None:
+        _, ImageDraw, Image = _pil()
+        x0, y0, x1, y1 = ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox((0, 0), text, font=font)
+        w = (x1 - x0) + pad * 2
+        h = (y1 - y0) + pad * 2
+        img = Image.new('RGBA', (w, h), (0, 0, 0, 200))
+        ImageDraw.Draw(img).text((pad - x0, pad - y0), text, font=font, fill=(255, 255, 255, 255))
+        rgba = np.asarray(img)
+        # RGBA→BGRA
+        return rgba[:, :, [2, 1, 0, 3]].copy()
+    scale = font_size / 28.0
+    (tw, th), base = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+    w = tw + pad * 2
+    h = th + base + pad * 2
+    sprite = np.zeros((h, w, 4), dtype=np.uint8)
+    sprite[:, :, 3] = 200
+    cv2.putText(sprite, text, (pad, pad + th), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255, 255), 2, cv2.LINE_AA)
+    return sprite
+
+# カメラ名ラベルをキャッシュし、フレーム左上へその領域だけアルファ合成する
+# 名前・フレームサイズ・フォントサイズが変わった時だけ再描画
+class LabelOverlay:
+    def __init__(self, font_size=28, origin=(8, 3)):
+        self.font_size = font_size
+        self.origin = origin
+        self._key = None
+        self._fg = None
+        self._inv = None
+        self._tmp = None
+
+    def invalidate(self):
+        self._key = None
+
+    def _prepare(self, text, frame_w, frame_h):
+        sprite = render_label_sprite(text, self.font_size)
+        ox, oy = self.origin
+        # フレームからはみ出す部分は切り詰める
+        h = max(0, min(sprite.shape[0], frame_h - oy))
+        w = max(0, min(sprite.shape[1], frame_w - ox))
+        sprite = sprite[:h, :w]
+        # 0..256のアルファで整数演算: out = (bg * (256 - a) + fg * a) >> 8
+        alpha = sprite[:, :, 3:4].astype(np.uint16)
+        alpha = alpha + (alpha >> 7)
+        self._fg = sprite[:, :, :3].astype(np.uint16) * alpha
+        self._inv = np.broadcast_to(256 - alpha, self._fg.shape).copy()
+        self._tmp = np.empty_like(self._fg)
+        self._key = (text, frame_w, frame_h, self.font_size)
+
+    def apply(self, frame, text):
+        if not text:
+            return frame
+        h, w = frame.shape[:2]
+        if self._key != (text, w, h, self.font_size):
+            self._prepare(text, w, h)
+        sh, sw = self._fg.shape[:2]
+        if sh == 0 or sw == 0:
+            return frame
+        ox, oy = self.origin
+        roi = frame[oy:oy + sh, ox:ox + sw]
+        np.multiply(roi, self._inv, out=self._tmp)
+        self._tmp += self._fg
+        self._tmp >>= 8
+        roi[...] = self._tmp
+        return frame
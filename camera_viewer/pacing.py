@@ -0,0 +1,160 @@
+import threading
+import time
+
+# フレーム間隔の下限（fps設定の上限 120fps）
+MIN_INTERVAL = 1 / 120
+
+# カメラ毎のフレーム取得ペースを締切(deadline)ベースで管理するスケジューラ
+# - fps: 全体のfps（[General] fps）、カメラ毎の上書きは set_camera_fps
+# - frame_budget: 全カメラ合計の最大フレーム数/秒（0で無制限）。アクティブ台数で等分
+# - cpu_budget: 全カメラ合計で使ってよいCPUコア数（0で無制限）。実測の1フレーム処理時間から上限fpsを算出
+# - idle_fps: 動きの無いカメラ（set_idle）のfps
+class PacingScheduler:
+    def __init__(self, fps=20.0, frame_budget=0.0, cpu_budget=0.0, idle_fps=2.0):
+        self.fps = float(fps) if fps else 20.0
+        self.frame_budget = float(frame_budget or 0)
+        self.cpu_budget = float(cpu_budget or 0)
+        self.idle_fps = float(idle_fps or 0)
+        self._lock = threading.Lock()
+        self._camera_fps = {}
+        self._active = set()
+        self._cost = {}
+        self._idle = set()
+
+    @classmethod
+    def from_settings(cls, settings):
+        sched = cls()
+        sched.update_from_settings(settings)
+        return sched
+
+    def update_from_settings(self, settings):
+        # 設定変更時は実行中のカメラが参照しているスケジューラをそのまま更新する
+        general = settings.get_general()
+        camera_fps = {}
+        for ip in settings.get_cameras():
+            if settings.get_camera_option(ip, 'fps'):
+                camera_fps[ip] = float(settings.get_fps(ip))
+        with self._lock:
+            self.fps = float(settings.get_fps() or 20.0)
+            self.frame_budget = _to_float(general.get('fps_budget'), 0.0)
+            self.cpu_budget = _to_float(general.get('cpu_budget'), 0.0)
+            self.idle_fps = _to_float(general.get('idle_fps'), 2.0)
+            self._camera_fps = camera_fps
+
+    def set_camera_fps(self, key, fps):
+        with self._lock:
+            if fps:
+                self._camera_fps[key] = float(fps)
+            else:
+                self._camera_fps.pop(key, None)
+
+    def pacer(self, key):
+        return FramePacer(self, key)
+
+    def set_active(self, key, active):
+        with self._lock:
+            if active:
+                self._active.add(key)
+            else:
+                self._active.discard(key)
+                self._cost.pop(key, None)
+                self._idle.discard(key)
+
+    def set_idle(self, key, idle):
+        # 動き検出で静止と判定されたカメラはidle_fpsまで下げる
+        with self._lock:
+            if idle:
+                self._idle.add(key)
+            else:
+                self._idle.discard(key)
+
+    def is_idle(self, key):
+        with self._lock:
+            return key in self._idle
+
+    def active_count(self):
+        with self._lock:
+            return len(self._active)
+
+    def report_cost(self, key, seconds):
+        # 1フレームの処理時間を指数移動平均で記録
+        with self._lock:
+            prev = self._cost.get(key)
+            self._cost[key] = seconds if prev is None else prev * 0.9 + seconds * 0.1
+
+    def interval_for(self, key):
+        with self._lock:
+            fps = self._camera_fps.get(key, self.fps)
+            if key in self._idle and self.idle_fps > 0:
+                fps = min(fps, self.idle_fps)
+            interval = 1.0 / fps if fps > 0 else 1.0 / 20
+            n = max(1, len(self._active))
+            if self.frame_budget > 0:
+                interval = max(interval, n / self.frame_budget)
+            cost = self._cost.get(key)
+            if self.cpu_budget > 0 and cost:
+                # カメラ1台あたり cpu_budget / n コア使える → 上限fps = (cpu_budget / n) / cost
+                interval = max(interval, cost * n / self.cpu_budget)
+            return max(interval, MIN_INTERVAL)
+
+    def is_throttled(self, key, source_fps=0.0):
+        # カメラの送出fps（不明なら設定のfps）より遅いペースか。遅い間は受信バッファにフレームが溜まる
+        with self._lock:
+            if not 0 < source_fps <= 1 / MIN_INTERVAL:
+                source_fps = self._camera_fps.get(key, self.fps)
+        if source_fps <= 0:
+            return False
+        # 送出fpsの揺らぎで切り替わらないよう1割の余裕を持たせる
+        return self.interval_for(key) > 1.1 / source_fps
+
+# 1カメラ分のペース制御。固定sleepではなく次の締切まで待つため、処理時間によらずfpsが安定する
+class FramePacer:
+    def __init__(self, scheduler, key):
+        self.scheduler = scheduler
+        self.key = key
+        self._deadline = None
+        self._work_start = None
+
+    def start(self):
+        self.scheduler.set_active(self.key, True)
+        self._deadline = time.monotonic()
+
+    def stop(self):
+        self.scheduler.set_active(self.key, False)
+        self._deadline = None
+
+    def is_throttled(self, source_fps=0.0):
+        return self.scheduler.is_throttled(self.key, source_fps)
+
+    def begin_frame(self):
+        # 読み取り（デコード）の前に呼ぶ。cpu_budgetの1フレームの処理時間にデコードを含める
+        self._work_start = time.monotonic()
+
+    def wait(self, should_stop=None, idle_work=None):
+        # idle_work: 締切までsleepの代わりに繰り返し呼ぶ処理（受信バッファの読み捨て等）。Falseを返したら中止
+        now = time.monotonic()
+        if self._work_start is not None:
+            self.scheduler.report_cost(self.key, now - self._work_start)
+            self._work_start = None
+        interval = self.scheduler.interval_for(self.key)
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += interval
+        if self._deadline < now - interval:
+            # 大きく遅れた場合は追いつこうとせず締切を現在に合わせる
+            self._deadline = now
+        while True:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0 or (should_stop is not None and should_stop()):
+                return
+            if idle_work is not None:
+                if not idle_work():
+                    return
+                continue
+            time.sleep(min(remaining, 0.1))
+
+def _to_float(value, default):
+    try:
+        return float(value) if value not in (None, '') else default
+    except ValueError:
+        return default
@@ -0,0 +1,72 @@
+import math
+from camera_viewer.worker import STANDBY_WARM, STANDBY_RELEASE
+
+# 大量台数向けのページ切替。表示中のページのカメラだけデコードし、ページ外のカメラは一時停止する
+# - page_size: 1ページのタイル数（0で全台を1ページに表示）
+# - tour_seconds: 自動巡回の間隔（0で巡回しない）
+# - standby: ページ外のカメラの扱い（release: 切断 / warm: セッションを維持してgrab()のみ）
+#   grab()もデコードは行うため、既定はrelease（warmはページ外のカメラも全てデコードし続ける）
+# - prewarm_seconds: 巡回で切り替わる何秒前に次のページのカメラを接続し始めるか（切替までgrab()のみ）
+class WallPager:
+    def __init__(self, page_size=0, tour_seconds=0.0, standby=STANDBY_RELEASE, prewarm_seconds=2.0):
+        self.page_size = max(0, int(page_size or 0))
+        self.tour_seconds = max(0.0, float(tour_seconds or 0))
+        self.standby = standby if standby in (STANDBY_WARM, STANDBY_RELEASE) else STANDBY_RELEASE
+        self.prewarm_seconds = max(0.0, float(prewarm_seconds or 0))
+        self.count = 0
+        self.page = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        general = settings.get_general()
+        return cls(
+            _to_int(general.get('page_size'), 0),
+            _to_float(general.get('page_tour_seconds'), 0.0),
+            general.get('page_standby', STANDBY_RELEASE),
+            _to_float(general.get('page_prewarm_seconds'), 2.0),
+        )
+
+    def set_count(self, count):
+        self.count = count
+        self.page = min(self.page, self.page_count - 1)
+
+    @property
+    def page_count(self):
+        if self.page_size <= 0 or self.count == 0:
+            return 1
+        return math.ceil(self.count / self.page_size)
+
+    def tiles_per_page(self):
+        # 分割数はページによらず一定（最後のページが少なくても配置を変えない）
+        return min(self.count, self.page_size) if self.page_size > 0 else self.count
+
+    def indices(self, page=None):
+        page = self.page if page is None else page
+        if self.page_size <= 0:
+            return range(self.count)
+        start = page * self.page_size
+        return range(start, min(start + self.page_size, self.count))
+
+    def next_page(self, step=1):
+        return (self.page + step) % self.page_count
+
+    def set_page(self, page):
+        self.page = page % self.page_count
+
+    def prewarm_delay(self):
+        # 巡回開始から次のページを動かし始めるまでの秒数（Noneで事前起動しない）
+        if self.tour_seconds <= 0 or self.prewarm_seconds <= 0:
+            return None
+        return max(0.0, self.tour_seconds - min(self.prewarm_seconds, self.tour_seconds / 2))
+
+def _to_int(value, default):
+    try:
+        return int(value) if value not in (None, '') else default
+    except ValueError:
+        return default
+
+def _to_float(value, default):
+    try:
+        return float(value) if value not in (None, '') else default
+    except ValueError:
+        return default
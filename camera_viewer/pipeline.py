@@ -0,0 +1,132 @@
+import time
+import cv2
+import numpy as np
+from camera_viewer.overlay import LabelOverlay
+from camera_viewer.utils import fit_size
+
+# 反転の組み合わせ → cv2.flipのflipCode（両方向は1回のflip(-1)にまとめる）
+FLIP_CODES = {
+    (False, False): None,
+    (True, False): 1,
+    (False, True): 0,
+    (True, True): -1,
+}
+
+# カメラ毎のフレーム変換パイプライン（切り出し→縮小→反転→名前描画→RGB変換）
+# 設定と入力サイズから必要最小限の処理列を組み立て、出力先はすべて使い回しのバッファに書き込む。
+# 設定・入力サイズ・縮小先が変わった時だけ組み立て直す
+class FramePipeline:
+    def __init__(self, flip_h=False, flip_v=False, name='', crop=None, out_buffers=3):
+        self.flip_h = flip_h
+        self.flip_v = flip_v
+        self.name = name
+        self.crop = crop  # (x, y, w, h) または None
+        self.out_buffers = out_buffers
+        self.overlay = LabelOverlay()
+        self._key = None
+        self._steps = []
+        self._outputs = []
+        self._out_index = 0
+        self.output_size = None
+        # CameraMetrics（指定時のみステージ毎の処理時間を記録）
+        self.metrics = None
+
+    def configure(self, flip_h=None, flip_v=None, name=None, crop=False):
+        # 実行中の設定変更（次フレームで組み立て直し）
+        if flip_h is not None:
+            self.flip_h = flip_h
+        if flip_v is not None:
+            self.flip_v = flip_v
+        if name is not None:
+            self.name = name
+        if crop is not False:
+            self.crop = crop
+
+    def _crop_rect(self, w, h):
+        if not self.crop:
+            return None
+        x, y, cw, ch = self.crop
+        x = max(0, min(x, w - 1))
+        y = max(0, min(y, h - 1))
+        cw = max(1, min(cw, w - x))
+        ch = max(1, min(ch, h - y))
+        if (x, y, cw, ch) == (0, 0, w, h):
+            return None
+        return x, y, cw, ch
+
+    def _compile(self, shape, target):
+        h, w = shape[:2]
+        steps = []
+        rect = self._crop_rect(w, h)
+        if rect is not None:
+            x, y, cw, ch = rect
+            # 切り出しはビューのみ（コピーなし）
+            steps.append(('crop', (slice(y, y + ch), slice(x, x + cw))))
+            w, h = cw, ch
+        size = fit_size(w, h, target[0], target[1]) if target else None
+        if size is not None:
+            w, h = size
+            steps.append(('resize', (size, np.empty((h, w, 3), dtype=np.uint8))))
+        code = FLIP_CODES[(bool(self.flip_h), bool(self.flip_v))]
+        if code is not None:
+            steps.append(('flip', (code, np.empty((h, w, 3), dtype=np.uint8))))
+        if self.name:
+            # 縮小・反転が無い時は入力フレーム（またはそのビュー）のままなので、描画前に自前のバッファへ写す
+            # （入力は映像源の使い回しバッファや、録画などのtapへ渡したフレームの場合がある）
+            buf = np.empty((h, w, 3), dtype=np.uint8) if size is None and code is None else None
+            steps.append(('overlay', (self.name, buf)))
+        self._steps = steps
+        self._outputs = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(self.out_buffers)]
+        self._out_index = 0
+        self.output_size = (w, h)
+
+    def prepare(self, shape, target=None):
+        # 入力サイズと縮小先から出力サイズ(w, h)を返す（必要なら組み立て直す）
+        key = (shape[:2], target, bool(self.flip_h), bool(self.flip_v), self.name, self.crop)
+        if key != self._key:
+            self._compile(shape, target)
+            self._key = key
+        return self.output_size
+
+    def _next_output(self, exclude):
+        # GUI側で参照中のバッファ（exclude）を避けて次の出力先を選ぶ
+        for _ in range(len(self._outputs)):
+            buf = self._outputs[self._out_index]
+            self._out_index = (self._out_index + 1) % len(self._outputs)
+            if not any(buf is e for e in exclude):
+                return buf
+        buf = np.empty_like(self._outputs[0])
+        self._outputs.append(buf)
+        return buf
+
+    def run(self, frame, target=None, dst=None, exclude=()):
+        # frameはBGR。dst指定時はそこへ、なければ使い回しの出力バッファへRGBで書き込む
+        self.prepare(frame.shape, target)
+        metrics = self.metrics
+        img = frame
+        for op, arg in self._steps:
+            start = time.perf_counter() if metrics is not None else 0.0
+            if op == 'crop':
+                img = img[arg]
+            elif op == 'resize':
+                size, buf = arg
+                img = cv2.resize(img, size, dst=buf, interpolation=cv2.INTER_AREA)
+            elif op == 'flip':
+                code, buf = arg
+                img = cv2.flip(img, code, dst=buf)
+            elif op == 'overlay':
+                name, buf = arg
+                if buf is not None:
+                    np.copyto(buf, img)
+                    img = buf
+                self.overlay.apply(img, name)
+            if metrics is not None and op != 'crop':
+                metrics.record(op, time.perf_counter() - start)
+        if dst is None:
+            dst = self._next_output(exclude)
+        if metrics is None:
+            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=dst)
+        start = time.perf_counter()
+        out = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=dst)
+        metrics.record('convert', time.perf_counter() - start)
+        return out
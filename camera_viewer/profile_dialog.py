@@ -0,0 +1,231 @@
+import threading
+from PyQt5 import QtWidgets, QtCore
+from camera_viewer.capture_profile import (CaptureProfile, BUILTIN_PROFILES, DEFAULT_PROFILE,
+                                           TRANSPORTS, APIS, probe_profiles, summarize_probes)
+from camera_viewer.connection import ConnectionSupervisor, capture_params
+
+# キャプチャプロファイルの編集と、最初のフレームまでの時間の計測
+class ProfileDialog(QtWidgets.QDialog):
+    # 計測結果（ワーカースレッドから通知）
+    probe_result = QtCore.pyqtSignal(object)
+    probe_finished = QtCore.pyqtSignal(object)
+
+    def __init__(self, settings, cameras=(), parent=None):
+        # cameras: [(表示名, URL)]（計測対象の候補）
+        super().__init__(parent)
+        self.setWindowTitle('キャプチャプロファイル')
+        self.settings = settings
+        self.profiles = dict(settings.get_capture_profiles())
+        self._removed = set()
+        self._current = None
+        layout = QtWidgets.QVBoxLayout(self)
+
+        body = QtWidgets.QHBoxLayout()
+        left = QtWidgets.QVBoxLayout()
+        self.list = QtWidgets.QListWidget()
+        self.list.currentTextChanged.connect(self.select_profile)
+        left.addWidget(self.list)
+        buttons = QtWidgets.QHBoxLayout()
+        self.new_btn = QtWidgets.QPushButton('新規')
+        self.new_btn.clicked.connect(self.new_profile)
+        self.del_btn = QtWidgets.QPushButton('削除')
+        self.del_btn.clicked.connect(self.delete_profile)
+        buttons.addWidget(self.new_btn)
+        buttons.addWidget(self.del_btn)
+        left.addLayout(buttons)
+        body.addLayout(left)
+
+        form = QtWidgets.QFormLayout()
+        self.transport = QtWidgets.QComboBox()
+        self.transport.addItems(TRANSPORTS)
+        self.transport.setToolTip('RTSPの転送方式（auto: FFmpegの既定）')
+        self.probesize = QtWidgets.QSpinBox()
+        self.probesize.setRange(0, 50 * 1024 * 1024)
+        self.probesize.setToolTip('ストリーム解析に読むバイト数（0で既定値）。小さいほど接続が速い')
+        self.analyzeduration = QtWidgets.QSpinBox()
+        self.analyzeduration.setRange(-1, 30 * 1000 * 1000)
+        self.analyzeduration.setToolTip('ストリーム解析の時間（マイクロ秒、-1で既定値）')
+        self.nobuffer = QtWidgets.QCheckBox('nobuffer（入力バッファを使わない）')
+        self.low_delay = QtWidgets.QCheckBox('low_delay（デコーダの遅延を減らす）')
+        self.buffer_size = QtWidgets.QSpinBox()
+        self.buffer_size.setRange(0, 64 * 1024 * 1024)
+        self.buffer_size.setToolTip('受信バッファのバイト数（UDP時。0で既定値）')
+        self.api = QtWidgets.QComboBox()
+        self.api.addItems(list(APIS))
+        self.api.setToolTip('OpenCVのキャプチャAPIバックエンド（FFmpeg以外ではオプションは無視されます）')
+        form.addRow('転送方式', self.transport)
+        form.addRow('probesize', self.probesize)
+        form.addRow('analyzeduration', self.analyzeduration)
+        form.addRow('', self.nobuffer)
+        form.addRow('', self.low_delay)
+        form.addRow('バッファサイズ', self.buffer_size)
+        form.addRow('APIバックエンド', self.api)
+        body.addLayout(form)
+        layout.addLayout(body)
+
+        # 最初のフレームまでの時間の計測
+        probe_box = QtWidgets.QGroupBox('接続テスト（最初のフレームまでの時間）')
+        probe_layout = QtWidgets.QVBoxLayout(probe_box)
+        row = QtWidgets.QHBoxLayout()
+        self.camera = QtWidgets.QComboBox()
+        for label, url in cameras:
+            self.camera.addItem(label, url)
+        self.repeat = QtWidgets.QSpinBox()
+        self.repeat.setRange(1, 10)
+        self.repeat.setValue(3)
+        self.repeat.setPrefix('回数 ')
+        self.probe_btn = QtWidgets.QPushButton('全プロファイルを計測')
+        self.probe_btn.clicked.connect(self.start_probe)
+        self.probe_btn.setEnabled(self.camera.count() > 0)
+        row.addWidget(self.camera, 1)
+        row.addWidget(self.repeat)
+        row.addWidget(self.probe_btn)
+        probe_layout.addLayout(row)
+        self.results = QtWidgets.QTableWidget(0, 4)
+        self.results.setHorizontalHeaderLabels(['プロファイル', '最初のフレーム', 'オープン', '成功'])
+        self.results.horizontalHeader().setStretchLastSection(True)
+        probe_layout.addWidget(self.results)
+        layout.addWidget(probe_box)
+
+        box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        box.accepted.connect(self.accept)
+        box.rejected.connect(self.reject)
+        layout.addWidget(box)
+
+        self.probe_result.connect(self.on_probe_result)
+        self.probe_finished.connect(self.on_probe_finished)
+        self.refresh_list()
+
+    def refresh_list(self, select=None):
+        self.list.blockSignals(True)
+        self.list.clear()
+        self.list.addItems(sorted(self.profiles, key=lambda n: (n not in BUILTIN_PROFILES, n)))
+        self.list.blockSignals(False)
+        items = self.list.findItems(select or DEFAULT_PROFILE, QtCore.Qt.MatchExactly)
+        self._current = None
+        if items:
+            self.list.setCurrentItem(items[0])
+
+    def select_profile(self, name):
+        self.store_form()
+        profile = self.profiles.get(name)
+        self._current = name if profile is not None else None
+        if profile is None:
+            return
+        self.transport.setCurrentText(profile.transport)
+        self.probesize.setValue(profile.probesize)
+        self.analyzeduration.setValue(profile.analyzeduration)
+        self.nobuffer.setChecked(profile.nobuffer)
+        self.low_delay.setChecked(profile.low_delay)
+        self.buffer_size.setValue(profile.buffer_size)
+        self.api.setCurrentText(profile.api)
+        self.del_btn.setEnabled(name not in BUILTIN_PROFILES)
+
+    def store_form(self):
+        # 入力中の値を選択中のプロファイルへ反映
+        if self._current is None:
+            return
+        self.profiles[self._current] = CaptureProfile(
+            self._current,
+            transport=self.transport.currentText(),
+            probesize=self.probesize.value(),
+            analyzeduration=self.analyzeduration.value(),
+            nobuffer=self.nobuffer.isChecked(),
+            low_delay=self.low_delay.isChecked(),
+            buffer_size=self.buffer_size.value(),
+            api=self.api.currentText(),
+        )
+
+    def new_profile(self):
+        name, ok = QtWidgets.QInputDialog.getText(self, '新規プロファイル', '名前')
+        name = name.strip()
+        if not ok or not name:
+            return
+        if name in self.profiles:
+            QtWidgets.QMessageBox.warning(self, '新規プロファイル', f'「{name}」は既にあります')
+            return
+        self.store_form()
+        # 選択中のプロファイルを複製して作る
+        base = self.profiles.get(self._current, BUILTIN_PROFILES[DEFAULT_PROFILE])
+        self.profiles[name] = CaptureProfile.from_options(name, base.to_options())
+        self._removed.discard(name)
+        self.refresh_list(name)
+
+    def delete_profile(self):
+        if self._current is None or self._current in BUILTIN_PROFILES:
+            return
+        self._removed.add(self._current)
+        del self.profiles[self._current]
+        self._current = None
+        self.refresh_list()
+
+    def start_probe(self):
+        url = self.camera.currentData()
+        if not url:
+            return
+        self.store_form()
+        profiles = list(self.profiles.values())
+        options = ConnectionSupervisor.options_from_settings(self.settings)
+        params = capture_params(options['open_timeout_ms'], options['read_timeout_ms'])
+        self.results.setRowCount(0)
+        self.probe_btn.setEnabled(False)
+        self.probe_btn.setText('計測中...')
+        repeat = self.repeat.value()
+        def run():
+            # 途中で例外になっても、それまでの結果で必ず終了を通知する（ボタンを戻すため）
+            runs = []
+            def on_result(r):
+                runs.append(r)
+                _emit(self.probe_result, r)
+            try:
+                probe_profiles(url, profiles, params, repeat=repeat, on_result=on_result)
+            except Exception as e:
+                print(f"プロファイルの計測に失敗しました: {e}")
+            finally:
+                _emit(self.probe_finished, summarize_probes(runs))
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_probe_result(self, result):
+        first = _first_text(result)
+        self._add_result_row(result['profile'], first, f"{result['open_ms']:.0f}ms", '○' if result['ok'] else '×')
+
+    def on_probe_finished(self, summary):
+        # 中央値の一覧（速い順）で置き換える
+        self.results.setRowCount(0)
+        for row in summary:
+            first = _first_text(row)
+            self._add_result_row(row['profile'], first, f"{row['open_ms']:.0f}ms", f"{row['ok']}/{row['runs']}")
+        self.probe_btn.setEnabled(True)
+        self.probe_btn.setText('全プロファイルを計測')
+
+    def _add_result_row(self, *values):
+        row = self.results.rowCount()
+        self.results.insertRow(row)
+        for col, value in enumerate(values):
+            self.results.setItem(row, col, QtWidgets.QTableWidgetItem(value))
+
+    def accept(self):
+        # 設定はメモリ上で変更するだけ（保存は親の設定ダイアログの保存で行う）
+        self.store_form()
+        for name in self._removed:
+            self.settings.remove_capture_profile(name)
+        for name, profile in self.profiles.items():
+            # 組み込みと同じ内容のものは保存しない
+            builtin = BUILTIN_PROFILES.get(name)
+            if builtin is not None and builtin.to_options() == profile.to_options():
+                self.settings.remove_capture_profile(name)
+            else:
+                self.settings.set_capture_profile(profile)
+        super().accept()
+
+def _first_text(result):
+    if result['first_frame_ms'] is not None:
+        return f"{result['first_frame_ms']:.0f}ms"
+    return f"失敗: {result['error']}" if result.get('error') else '失敗'
+
+def _emit(signal, value):
+    try:
+        signal.emit(value)
+    except RuntimeError:
+        # 計測中にダイアログが閉じられた
+        pass
@@ -0,0 +1,184 @@
+import threading
+import time
+
+# Tapo C200のONVIFデフォルトポート
+DEFAULT_ONVIF_PORT = 2020
+# 1クリックあたりの移動量（AbsoluteMoveの座標 -1.0～1.0）
+STEP = 0.1
+# ContinuousMoveの速度
+CONTINUOUS_SPEED = 0.5
+
+# 方向 → (x, y) の向き（左右はカメラの取り付けに合わせて反転）
+DIRECTIONS = {
+    'up': (0, 1),
+    'down': (0, -1),
+    'left': (1, 0),
+    'right': (-1, 0),
+}
+
+def _clamp(v):
+    return max(-1.0, min(1.0, v))
+
+# ONVIFのサービス・プロファイルトークン・現在位置をキャッシュするセッション
+# factoryにはONVIFCamera互換のクラスを渡せる（ローカルの代替SOAPサーバやテスト用）
+class PTZSession:
+    def __init__(self, ip, port=DEFAULT_ONVIF_PORT, user='', password='', factory=None):
+        self.ip = ip
+        self.port = port
+        self.user = user
+        self.password = password
+        self.factory = factory
+        self._ptz = None
+        self._token = None
+        self.position = None
+
+    def connect(self):
+        if self._ptz is not None:
+            return
+        factory = self.factory
+        if factory is None:
+            from onvif import ONVIFCamera
+            factory = ONVIFCamera
+        camera = factory(self.ip, self.port, self.user, self.password)
+        media = camera.create_media_service()
+        ptz = camera.create_ptz_service()
+        token = media.GetProfiles()[0].token
+        # 現在位置は接続時に一度だけ取得し、以後は送信した位置で更新する
+        status = ptz.GetStatus({'ProfileToken': token})
+        pos = status.Position
+        x = pos.PanTilt.x if pos and pos.PanTilt else 0
+        y = pos.PanTilt.y if pos and pos.PanTilt else 0
+        self._ptz = ptz
+        self._token = token
+        self.position = (x, y)
+
+    def invalidate(self):
+        # 通信エラー時は次のコマンドで接続し直す
+        self._ptz = None
+        self._token = None
+        self.position = None
+
+    def move_by(self, dx, dy):
+        self.connect()
+        x = _clamp(self.position[0] + dx)
+        y = _clamp(self.position[1] + dy)
+        req = self._ptz.create_type('AbsoluteMove')
+        req.ProfileToken = self._token
+        req.Position = {'PanTilt': {'x': x, 'y': y}}
+        self._ptz.AbsoluteMove(req)
+        self.position = (x, y)
+
+    def continuous_move(self, vx, vy):
+        self.connect()
+        req = self._ptz.create_type('ContinuousMove')
+        req.ProfileToken = self._token
+        req.Velocity = {'PanTilt': {'x': vx, 'y': vy}}
+        self._ptz.ContinuousMove(req)
+
+    def stop(self):
+        self.connect()
+        self._ptz.Stop({'ProfileToken': self._token, 'PanTilt': True, 'Zoom': True})
+        # 連続移動後の位置は不明なので取り直す
+        self.invalidate()
+
+# カメラ毎のPTZコマンドキュー。GUIスレッドは積むだけで、送信はバックグラウンドスレッド。
+# 連続クリックは移動量を合算して1回のAbsoluteMoveにまとめる
+class PTZController:
+    def __init__(self, session):
+        self.session = session
+        self._cond = threading.Condition()
+        self._dx = 0.0
+        self._dy = 0.0
+        self._velocity = None  # 連続移動の要求 (vx, vy)、(0, 0)は停止
+        self._moving = False
+        self._closed = False
+        self.sent = 0
+        self.coalesced = 0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def step(self, direction, amount=STEP):
+        sx, sy = DIRECTIONS[direction]
+        with self._cond:
+            if self._dx or self._dy:
+                self.coalesced += 1
+            self._dx += sx * amount
+            self._dy += sy * amount
+            self._cond.notify()
+
+    def start(self, direction, speed=CONTINUOUS_SPEED):
+        # 押している間の連続移動（離したらstop）
+        sx, sy = DIRECTIONS[direction]
+        with self._cond:
+            self._velocity = (sx * speed, sy * speed)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._velocity = (0.0, 0.0)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or self._dx or self._dy or self._velocity is not None)
+            if self._closed:
+                return None
+            if self._velocity is not None:
+                cmd = ('velocity', self._velocity)
+                self._velocity = None
+            else:
+                cmd = ('move', (self._dx, self._dy))
+                self._dx = self._dy = 0.0
+            return cmd
+
+    def _run(self):
+        while True:
+            cmd = self._take()
+            if cmd is None:
+                return
+            kind, (x, y) = cmd
+            try:
+                if kind == 'move':
+                    self.session.move_by(x, y)
+                elif x == 0 and y == 0:
+                    # 移動していない時の停止は送らない（送信数にも数えない）
+                    if not self._moving:
+                        continue
+                    self.session.stop()
+                    self._moving = False
+                else:
+                    self.session.continuous_move(x, y)
+                    self._moving = True
+                self.sent += 1
+                self.last_error = None
+            except Exception as e:
+                print(f"PTZコマンド送信失敗: {e}")
+                self.last_error = e
+                self.session.invalidate()
+                # 連続失敗時に送信を詰め込まないよう少し待つ
+                time.sleep(0.5)
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+def get_ptz_controller(ip, port=DEFAULT_ONVIF_PORT, user='', password='', factory=None):
+    # (ip, port, user, password) 毎にセッションとキューを使い回す（パスワードを変えたら新しいセッションで接続し直す）
+    key = (ip, int(port), user, password)
+    with _controllers_lock:
+        ctrl = _controllers.get(key)
+        if ctrl is None:
+            ctrl = PTZController(PTZSession(ip, int(port), user, password, factory))
+            _controllers[key] = ctrl
+        return ctrl
+
+def close_all():
+    with _controllers_lock:
+        for ctrl in _controllers.values():
+            ctrl.close()
+        _controllers.clear()
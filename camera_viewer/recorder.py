@@ -0,0 +1,262 @@
+import collections
+import datetime
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import cv2
+from camera_viewer.utils import safe_filename
+
+# 録画方式
+MODE_AUTO = 'auto'      # ffmpegがあり事前バッファ不要ならcopy、それ以外はencode
+MODE_COPY = 'copy'      # ffmpegでストリームをそのまま保存（再エンコードなし・事前バッファなし）
+MODE_ENCODE = 'encode'  # 取得済みフレームをcv2.VideoWriterでエンコード
+
+# encode時、これ以上フレームの間隔が空いたら（再接続等）新しいセグメントにする（秒）
+MAX_GAP_SECONDS = 2.0
+
+def find_ffmpeg():
+    return shutil.which('ffmpeg')
+
+# 保存先フォルダのファイルを古い順に削除（合計サイズ上限・保存日数）
+def enforce_retention(directory, max_bytes=0, max_age_days=0, keep=None):
+    try:
+        entries = [os.path.join(directory, f) for f in os.listdir(directory)]
+    except FileNotFoundError:
+        return []
+    files = []
+    for path in entries:
+        if os.path.isfile(path) and path != keep:
+            st = os.stat(path)
+            files.append((st.st_mtime, st.st_size, path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    if keep and os.path.exists(keep):
+        total += os.path.getsize(keep)
+    removed = []
+    now = time.time()
+    for mtime, size, path in files:
+        too_old = max_age_days and now - mtime > max_age_days * 86400
+        too_big = max_bytes and total > max_bytes
+        if not (too_old or too_big):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed.append(path)
+    return removed
+
+# 1台分の録画エンジン
+# キャプチャスレッドは feed() でキューに積むだけ（満杯なら捨てる）。書き込みは専用スレッド。
+# 録画していない間も直近 pre_event_seconds 秒を事前バッファに保持し、録画開始時に先頭へ書き出す
+class Recorder:
+    def __init__(self, name, save_dir, fps=20.0, segment_seconds=300, pre_event_seconds=5.0,
+                 pre_event_max_bytes=64 * 1024 * 1024, queue_size=60, retention_bytes=0,
+                 retention_days=0, mode=MODE_AUTO, url=None, fourcc='mp4v', ext='.mp4'):
+        self.name = name
+        self.directory = os.path.join(save_dir, safe_filename(name))
+        self.fps = float(fps) or 20.0
+        self.segment_seconds = segment_seconds
+        self.pre_event_seconds = pre_event_seconds
+        self.pre_event_max_bytes = pre_event_max_bytes
+        self.retention_bytes = retention_bytes
+        self.retention_days = retention_days
+        self.url = url
+        self.fourcc = fourcc
+        self.ext = ext
+        if mode == MODE_AUTO:
+            mode = MODE_COPY if (url and find_ffmpeg() and not pre_event_seconds) else MODE_ENCODE
+        self.mode = mode
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pre = collections.deque()
+        self._pre_bytes = 0
+        self._lock = threading.Lock()
+        self.recording = False
+        self.fed = 0
+        self.written = 0
+        self.dropped = 0
+        # 固定fpsに合わせるため繰り返し書いた・捨てたフレーム数
+        self.repeated = 0
+        self.skipped = 0
+        self.segments = []
+        self._thread = None
+        self._proc = None
+
+    @classmethod
+    def from_settings(cls, settings, name, fps=None, url=None, mode=None):
+        general = settings.get_general()
+        def num(key, default):
+            try:
+                return float(general.get(key, default))
+            except ValueError:
+                return default
+        return cls(
+            name, general.get('save_dir', os.path.join(os.path.expanduser('~'), 'Pictures')),
+            fps=fps or settings.get_fps(),
+            segment_seconds=num('record_segment_seconds', 300),
+            pre_event_seconds=num('record_pre_event_seconds', 0),
+            pre_event_max_bytes=int(num('record_pre_event_mb', 64) * 1024 * 1024),
+            retention_bytes=int(num('record_retention_mb', 0) * 1024 * 1024),
+            retention_days=num('record_retention_days', 0),
+            mode=mode or general.get('record_mode', MODE_AUTO),
+            url=url,
+        )
+
+    # --- キャプチャスレッドから ---
+    def feed(self, frame, timestamp=None):
+        # frameはこの後パイプラインで書き換わり得るためコピーして保持する
+        if self.mode == MODE_COPY:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        self.fed += 1
+        if self.recording:
+            try:
+                self._queue.put_nowait((timestamp, frame.copy()))
+            except queue.Full:
+                # ディスクが遅くてもキャプチャ・表示を止めない
+                self.dropped += 1
+        elif self.pre_event_seconds > 0:
+            self._push_pre(timestamp, frame.copy())
+
+    def needs_frames(self):
+        # 録画中でフレームを書き込む方式か（copyはffmpegが直接受信する）
+        return self.recording and self.mode != MODE_COPY
+
+    def queue_depth(self):
+        # 書き込み待ちのフレーム数
+        return self._queue.qsize() if self.recording else 0
+
+    def _push_pre(self, timestamp, frame):
+        with self._lock:
+            self._pre.append((timestamp, frame))
+            self._pre_bytes += frame.nbytes
+            while self._pre and (timestamp - self._pre[0][0] > self.pre_event_seconds
+                                 or self._pre_bytes > self.pre_event_max_bytes):
+                _, old = self._pre.popleft()
+                self._pre_bytes -= old.nbytes
+
+    # --- GUIスレッドから ---
+    def start(self):
+        if self.recording:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self.mode == MODE_COPY:
+            self._start_copy()
+            self.recording = True
+            return
+        # 事前バッファの内容を先に書き出す（録画開始が過去にさかのぼる）
+        with self._lock:
+            pre = list(self._pre)
+            self._pre.clear()
+            self._pre_bytes = 0
+        self._queue = queue.Queue(maxsize=len(pre) + self.queue_size)
+        for item in pre:
+            self._queue.put_nowait(item)
+        self.recording = True
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.recording:
+            return
+        self.recording = False
+        if self.mode == MODE_COPY:
+            self._stop_copy()
+            return
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+            self._thread = None
+
+    def _segment_path(self, timestamp):
+        stamp = datetime.datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f"{stamp}{self.ext}")
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{stamp}_{n}{self.ext}")
+            n += 1
+        return path
+
+    def _writer(self):
+        # VideoWriterは固定fpsのため、フレームは受信時刻から決まる位置（segment_start + n/fps）に書く。
+        # 実際のレートが低い時（適応fps・fps予算・キューあふれ）は前のフレームを繰り返し、高い時は捨てる
+        writer = None
+        path = None
+        segment_start = None
+        last_time = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                timestamp, frame = item
+                h, w = frame.shape[:2]
+                if writer is not None and (timestamp - segment_start >= self.segment_seconds
+                                           or (w, h) != size or timestamp - last_time > MAX_GAP_SECONDS):
+                    writer.release()
+                    self._segment_closed(path)
+                    writer = None
+                if writer is None:
+                    path = self._segment_path(timestamp)
+                    size = (w, h)
+                    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, size)
+                    segment_start = timestamp
+                    count = 0
+                    last = None
+                    self.segments.append(path)
+                index = int(round((timestamp - segment_start) * self.fps))
+                if index < count:
+                    self.skipped += 1
+                    continue
+                while count < index:
+                    writer.write(last)
+                    count += 1
+                    self.repeated += 1
+                writer.write(frame)
+                count += 1
+                last = frame
+                last_time = timestamp
+                self.written += 1
+        finally:
+            if writer is not None:
+                writer.release()
+                self._segment_closed(path)
+
+    def _segment_closed(self, path):
+        enforce_retention(self.directory, self.retention_bytes, self.retention_days, keep=path)
+
+    # --- ストリームコピー（ffmpeg） ---
+    def _start_copy(self):
+        pattern = os.path.join(self.directory, f"%Y%m%d_%H%M%S{self.ext}")
+        cmd = [find_ffmpeg(), '-hide_banner', '-loglevel', 'error', '-rtsp_transport', 'tcp',
+               '-i', self.url, '-c', 'copy', '-map', '0', '-f', 'segment',
+               '-segment_time', str(int(self.segment_seconds)), '-reset_timestamps', '1',
+               '-strftime', '1', pattern]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.DEVNULL)
+        self._retention_thread = threading.Thread(target=self._copy_retention, daemon=True)
+        self._retention_thread.start()
+
+    def _copy_retention(self):
+        # ffmpegが書き出したセグメントに保存上限を適用（書き込み中の最新ファイルは残す）
+        while self.recording and self._proc is not None and self._proc.poll() is None:
+            time.sleep(min(30.0, max(1.0, self.segment_seconds / 2)))
+            files = sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []
+            latest = os.path.join(self.directory, files[-1]) if files else None
+            enforce_retention(self.directory, self.retention_bytes, self.retention_days, keep=latest)
+
+    def _stop_copy(self):
+        proc = self._proc
+        self._proc = None
+        if proc is None:
+            return
+        try:
+            # 'q'で正常終了させ、最後のセグメントを閉じる
+            proc.communicate(b'q', timeout=5.0)
+        except (subprocess.TimeoutExpired, OSError, ValueError):
+            proc.kill()
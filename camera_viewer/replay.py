@@ -0,0 +1,285 @@
+import bisect
+import collections
+import queue
+import threading
+import cv2
+from camera_viewer.pipeline import FLIP_CODES
+
+# 保存形式
+FORMAT_JPEG = 'jpeg'  # JPEG圧縮（既定、エンコードはプールのワーカースレッド）
+FORMAT_RAW = 'raw'    # 縮小した生フレーム（BGR）をそのまま保持
+
+# 1フレームあたりの管理コスト（タイムスタンプ・リスト要素等）の見積もり。メモリ上限の計算に含める
+ENTRY_OVERHEAD = 256
+
+# 全カメラ共通のリプレイ用メモリプール
+# 合計バイト数が max_bytes を超えたら、その時点で最も多く使っているカメラの古いフレームから捨てる。
+# 使用量の少ないカメラが他のカメラのために削られることはなく、合計は常に上限以下に保たれる。
+# 合計にはエンコード待ち・エンコード中の縮小フレーム（pending_bytes）も含める（キュー投入前に確保する）。
+# JPEGエンコードはワーカースレッドで行い、キャプチャスレッドは縮小とキュー投入のみ（満杯なら捨てる）
+# encoder: frame → 保存するデータ（nbytesを持つ配列、失敗時None）。既定はcv2.imencodeのJPEG
+class ReplayPool:
+    def __init__(self, max_bytes=256 * 1024 * 1024, seconds=60.0, fps=10.0, fmt=FORMAT_JPEG,
+                 quality=70, max_width=640, workers=2, queue_size=64, encoder=None):
+        self.max_bytes = int(max_bytes)
+        self.seconds = float(seconds)
+        self.fps = float(fps) or 10.0
+        self.fmt = FORMAT_RAW if fmt == FORMAT_RAW else FORMAT_JPEG
+        self.quality = int(quality)
+        self.max_width = int(max_width)
+        self.total_bytes = 0
+        self.pending_bytes = 0
+        self.peak_bytes = 0
+        self.evicted = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._buffers = []
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._encoder = encoder if encoder is not None else self._encode_jpeg
+        self._workers = []
+        if self.fmt == FORMAT_JPEG:
+            for i in range(max(1, workers)):
+                t = threading.Thread(target=self._encode_loop, name=f'replay-encode-{i}', daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    @classmethod
+    def from_settings(cls, settings):
+        # [General] replay_seconds が0（既定）ならNone（リプレイ無効）
+        general = settings.get_general()
+        def num(key, default):
+            try:
+                return float(general.get(key, default))
+            except ValueError:
+                return default
+        seconds = num('replay_seconds', 0)
+        if seconds <= 0:
+            return None
+        return cls(
+            max_bytes=int(num('replay_memory_mb', 256) * 1024 * 1024),
+            seconds=seconds,
+            fps=num('replay_fps', 10),
+            fmt=general.get('replay_format', FORMAT_JPEG),
+            quality=int(num('replay_jpeg_quality', 70)),
+            max_width=int(num('replay_max_width', 640)),
+        )
+
+    def config(self):
+        # 設定変更時に作り直しが必要かの比較用
+        return (self.max_bytes, self.seconds, self.fps, self.fmt, self.quality, self.max_width)
+
+    def buffer(self, key, pipeline=None):
+        buf = ReplayBuffer(self, key, pipeline)
+        with self._lock:
+            self._buffers.append(buf)
+        return buf
+
+    def remove(self, buf):
+        with self._lock:
+            if buf in self._buffers:
+                self._buffers.remove(buf)
+                self.total_bytes -= buf.bytes
+                buf._clear()
+
+    def close(self):
+        with self._lock:
+            for buf in self._buffers:
+                buf._clear()
+            self._buffers = []
+            self.total_bytes = 0
+        for _ in self._workers:
+            self._queue.put(None)
+        self._workers = []
+
+    def wait_idle(self):
+        # エンコード待ちが無くなるまで待つ（計測用）
+        self._queue.join()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    # --- キャプチャスレッドから ---
+    def submit(self, buf, frame, timestamp):
+        reserved = frame.nbytes + ENTRY_OVERHEAD
+        if not self._reserve(buf, reserved):
+            self.dropped += 1
+            return
+        if self.fmt == FORMAT_RAW:
+            self._store(buf, timestamp, frame, reserved)
+            return
+        try:
+            self._queue.put_nowait((buf, frame, timestamp, reserved))
+        except queue.Full:
+            # エンコードが追いつかなくてもキャプチャ・表示を止めない
+            self._store(buf, timestamp, None, reserved)
+            self.dropped += 1
+
+    def _encode_jpeg(self, frame):
+        ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return data if ok else None
+
+    def _encode_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                buf, frame, timestamp, reserved = item
+                data = None
+                try:
+                    data = self._encoder(frame)
+                finally:
+                    # 失敗時も確保した分は必ず戻す
+                    self._store(buf, timestamp, data, reserved)
+            finally:
+                self._queue.task_done()
+
+    def _reserve(self, buf, size):
+        # エンコード前の縮小フレーム分を確保する。入りきらなければ保存済みのフレームを捨て、
+        # それでも入らなければFalse（フレームは捨てる）
+        with self._lock:
+            if buf not in self._buffers:
+                return False
+            self.pending_bytes += size
+            buf.pending += size
+            self._evict()
+            if self.total_bytes + self.pending_bytes > self.max_bytes:
+                self.pending_bytes -= size
+                buf.pending -= size
+                return False
+            self.peak_bytes = max(self.peak_bytes, self.total_bytes + self.pending_bytes)
+            return True
+
+    def _store(self, buf, timestamp, data, reserved):
+        # 確保分を実際のサイズに置き換える（data=Noneは確保の取り消しのみ）
+        with self._lock:
+            self.pending_bytes -= reserved
+            buf.pending -= reserved
+            if data is None or buf not in self._buffers:
+                return
+            size = data.nbytes + ENTRY_OVERHEAD
+            buf._append(timestamp, data, size)
+            self.total_bytes += size
+            # 保持期間を過ぎたフレーム
+            self.total_bytes -= buf._expire(timestamp - self.seconds)
+            self._evict()
+            self.peak_bytes = max(self.peak_bytes, self.total_bytes + self.pending_bytes)
+
+    def _evict(self):
+        # メモリ上限: 最も多く使っている（保存済み+確保中）カメラの古いフレームから捨てる。ロック内で呼ぶ
+        while self.total_bytes + self.pending_bytes > self.max_bytes:
+            stored = [b for b in self._buffers if b.bytes]
+            if not stored:
+                break
+            largest = max(stored, key=lambda b: b.bytes + b.pending)
+            self.total_bytes -= largest._pop_oldest()
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cameras': len(self._buffers),
+                'frames': sum(len(b) for b in self._buffers),
+                'bytes': self.total_bytes,
+                'pending_bytes': self.pending_bytes,
+                'peak_bytes': self.peak_bytes,
+                'max_bytes': self.max_bytes,
+                'evicted': self.evicted,
+                'dropped': self.dropped,
+            }
+
+# 1台分のリプレイリング。CaptureLoop.taps に登録して直近 seconds 秒のフレームを保持する
+# 反転はパイプラインの設定に合わせる（名前描画はしない）
+class ReplayBuffer:
+    def __init__(self, pool, key, pipeline=None):
+        self.pool = pool
+        self.key = key
+        self.pipeline = pipeline
+        self.bytes = 0
+        # エンコード待ち・エンコード中のフレームとして確保しているバイト数
+        self.pending = 0
+        self._times = collections.deque()
+        self._items = collections.deque()
+        self._next_time = 0.0
+
+    def __len__(self):
+        return len(self._items)
+
+    # --- キャプチャスレッドから ---
+    def __call__(self, frame, timestamp):
+        # replay_fpsに間引き、縮小・反転した新しい配列をプールへ渡す（元のframeは参照しない）
+        if timestamp < self._next_time:
+            return
+        interval = 1.0 / self.pool.fps
+        # 間隔を保って次の取り込み時刻を進める（大きく遅れた場合は現在から数え直す）
+        if timestamp - self._next_time < interval:
+            self._next_time += interval
+        else:
+            self._next_time = timestamp + interval
+        code = None
+        if self.pipeline is not None:
+            code = FLIP_CODES[(bool(self.pipeline.flip_h), bool(self.pipeline.flip_v))]
+        h, w = frame.shape[:2]
+        if w > self.pool.max_width:
+            small = cv2.resize(frame, (self.pool.max_width, max(1, h * self.pool.max_width // w)),
+                               interpolation=cv2.INTER_AREA)
+            if code is not None:
+                small = cv2.flip(small, code)
+        else:
+            small = frame.copy() if code is None else cv2.flip(frame, code)
+        self.pool.submit(self, small, timestamp)
+
+    # --- プールのロック内で呼ばれる ---
+    def _append(self, timestamp, data, size):
+        if self._times and timestamp < self._times[-1]:
+            # 複数のエンコードスレッドで完了順が前後した場合も時刻順に保つ
+            i = bisect.bisect_right(self._times, timestamp)
+            self._times.insert(i, timestamp)
+            self._items.insert(i, (data, size))
+        else:
+            self._times.append(timestamp)
+            self._items.append((data, size))
+        self.bytes += size
+
+    def _pop_oldest(self):
+        if not self._items:
+            return 0
+        self._times.popleft()
+        _, size = self._items.popleft()
+        self.bytes -= size
+        return size
+
+    def _expire(self, before):
+        freed = 0
+        while self._times and self._times[0] < before:
+            freed += self._pop_oldest()
+        return freed
+
+    def _clear(self):
+        self._times.clear()
+        self._items.clear()
+        self.bytes = 0
+
+    # --- GUIスレッドから ---
+    def time_range(self):
+        # 保持しているフレームの (最古, 最新) の時刻。空ならNone
+        with self.pool._lock:
+            if not self._times:
+                return None
+            return self._times[0], self._times[-1]
+
+    def frame_at(self, timestamp):
+        # 指定時刻以前で最も新しいフレーム（RGB）と時刻。無ければ最古のフレーム
+        with self.pool._lock:
+            if not self._items:
+                return None, None
+            i = max(0, bisect.bisect_right(self._times, timestamp) - 1)
+            data, _ = self._items[i]
+            ts = self._times[i]
+        if self.pool.fmt == FORMAT_JPEG:
+            bgr = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        else:
+            bgr = data
+        if bgr is None:
+            return None, ts
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), ts
@@ -0,0 +1,65 @@
+import time
+from PyQt5 import QtWidgets, QtCore, QtGui
+
+# スクラブバーの分解能（1目盛り=0.1秒）
+STEPS_PER_SECOND = 10
+
+# 全画面表示用のリプレイ操作バー（スクラブバー・経過時間・ライブへ戻る）
+# バーを動かし始めた時点の最新フレームを基準に、何秒前のフレームかを選んでZoomViewに表示する。
+# 右端（またはライブボタン）でライブ表示に戻る
+class ReplayBar(QtWidgets.QWidget):
+    def __init__(self, buffer, view, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.view = view
+        self._anchor = None
+        self._frame = None
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(8, 4, 8, 4)
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.slider.setRange(0, int(buffer.pool.seconds * STEPS_PER_SECOND))
+        self.slider.setValue(self.slider.maximum())
+        self.slider.setToolTip('リプレイ（左へ動かすと過去のフレームを表示）')
+        self.slider.valueChanged.connect(self.seek)
+        self.label = QtWidgets.QLabel('ライブ')
+        self.label.setMinimumWidth(150)
+        self.live_btn = QtWidgets.QPushButton('ライブ')
+        self.live_btn.clicked.connect(self.go_live)
+        layout.addWidget(self.slider, 1)
+        layout.addWidget(self.label)
+        layout.addWidget(self.live_btn)
+
+    def is_live(self):
+        return self._anchor is None
+
+    def seek(self, value):
+        if value >= self.slider.maximum():
+            self.go_live()
+            return
+        if self._anchor is None:
+            span = self.buffer.time_range()
+            if span is None:
+                self._set_slider(self.slider.maximum())
+                return
+            self._anchor = span[1]
+        rgb, timestamp = self.buffer.frame_at(self._anchor - (self.slider.maximum() - value) / STEPS_PER_SECOND)
+        if rgb is None:
+            return
+        h, w, _ = rgb.shape
+        # QImageはrgbのバッファを参照するため、_frameで参照を保持しておく
+        self._frame = rgb
+        self.view.set_override_image(QtGui.QImage(rgb.data, w, h, rgb.strides[0], QtGui.QImage.Format_RGB888))
+        clock = time.strftime('%H:%M:%S', time.localtime(timestamp))
+        self.label.setText(f"-{self._anchor - timestamp:.1f}秒（{clock}）")
+
+    def go_live(self):
+        self._anchor = None
+        self._frame = None
+        self.view.set_override_image(None)
+        self._set_slider(self.slider.maximum())
+        self.label.setText('ライブ')
+
+    def _set_slider(self, value):
+        self.slider.blockSignals(True)
+        self.slider.setValue(value)
+        self.slider.blockSignals(False)
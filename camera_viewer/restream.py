@@ -0,0 +1,356 @@
+import html
+import http.server
+import json
+import math
+import threading
+import time
+import urllib.parse
+import cv2
+import numpy as np
+from camera_viewer.overlay import LabelOverlay
+from camera_viewer.utils import fit_size, parse_size
+
+# ローカル配信サーバ（main.py --serve）
+# 各カメラのRTSPを1セッションだけ受信・デコードし、任意の数のクライアントへMJPEG over HTTPで配信する。
+#   /camera/<IPまたは番号>.mjpg   カメラ毎のMJPEG（?quality=で品質指定）
+#   /camera/<IPまたは番号>.jpg    最新の1枚
+#   /mosaic.mjpg / /mosaic.jpg    全カメラをまとめたモザイク
+#   /cameras.json / /stats.json   カメラ一覧・配信状況
+# 配信するのはカメラから届いたままのフレーム（反転・切り出し・名前描画はビューア側で行う）
+
+BOUNDARY = 'frame'
+DEFAULT_PORT = 8090
+
+# 1台分（またはモザイク）の最新フレームの受け渡し
+# JPEGは品質毎に「最新フレーム1枚につき1回」だけエンコードし、同じ品質のクライアント全員で共有する。
+# クライアントは送信が終わるたびに最新のフレームを取るため、遅いクライアントは途中のフレームを飛ばす
+# （キャプチャ側は公開するだけで、クライアントの送信を待たない）
+class FrameHub:
+    def __init__(self, key, name=''):
+        self.key = key
+        self.name = name
+        self._cond = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._seq = 0
+        self._closed = False
+        self._jpeg = {}
+        self._encode_locks = {}
+        self.clients = 0
+        # このフレームを元に作られるハブ（モザイク）。その視聴者もこのカメラの視聴者とみなす
+        self.followers = []
+        self.published = 0
+        self.encoded = 0
+        self.sent = 0
+        self.skipped = 0
+
+    def publish(self, frame, timestamp=None):
+        # frameは公開後に書き換えないこと（エンコードはクライアント側のスレッドで後から行う）
+        with self._cond:
+            self._frame = frame
+            self._timestamp = time.time() if timestamp is None else timestamp
+            self._seq += 1
+            self.published += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond:
+            return self._frame, self._timestamp, self._seq
+
+    def wait(self, after_seq, timeout=5.0):
+        # after_seqより新しいフレームが公開されるまで待ち、最新のseqを返す（閉じられたらNone）
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != after_seq or self._closed, timeout)
+            return None if self._closed else self._seq
+
+    def jpeg(self, quality):
+        # 最新フレームのJPEG (seq, bytes, timestamp)。同じseq・品質はキャッシュを返す
+        with self._cond:
+            lock = self._encode_locks.setdefault(quality, threading.Lock())
+        with lock:
+            with self._cond:
+                frame, timestamp, seq = self._frame, self._timestamp, self._seq
+                cached = self._jpeg.get(quality)
+            if frame is None:
+                return None
+            if cached is not None and cached[0] == seq:
+                return cached
+            ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                return None
+            entry = (seq, data.tobytes(), timestamp)
+            with self._cond:
+                self._jpeg[quality] = entry
+                self.encoded += 1
+            return entry
+
+    def add_client(self, delta):
+        with self._cond:
+            self.clients += delta
+
+    def watched(self):
+        return self.clients > 0 or any(f.watched() for f in self.followers)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'key': self.key, 'name': self.name, 'clients': self.clients, 'published': self.published,
+                    'encoded': self.encoded, 'sent': self.sent, 'skipped': self.skipped}
+
+# 配信用カメラのCaptureLoopのcontrol
+# on_demand時は視聴者がいない間一時停止する（standby=warmならセッションを維持してgrab()のみ。
+# grab()もデコードは行うため、CPUを減らすにはstandby=release）
+class RestreamControl:
+    def __init__(self, hub, stream='stream2', on_demand=True):
+        self.hub = hub
+        self.stream = stream
+        self.on_demand = on_demand
+        self._stop = threading.Event()
+
+    def is_stopped(self):
+        return self._stop.is_set()
+
+    def is_paused(self):
+        return self.on_demand and not self.hub.watched()
+
+    def standby_mode(self):
+        return None
+
+    def needs_taps(self):
+        return False
+
+    def get_current_stream(self):
+        return self.stream
+
+    def target_size(self):
+        return None
+
+    def stop(self):
+        self._stop.set()
+
+# CaptureLoopのsink: デコードしたフレームをFrameHubへ公開する
+# copy: 映像源が出力バッファを使い回す時（synthetic:// や file://）はコピーして公開する
+#       （cv2.VideoCaptureのread()は毎回新しい配列を返すのでコピー不要）
+class HubSink:
+    def __init__(self, hub, copy=False):
+        self.hub = hub
+        self.copy = copy
+
+    def status(self, state, text):
+        pass
+
+    def frame(self, frame, pipeline, target):
+        self.hub.publish(frame.copy() if self.copy else frame)
+
+    def activity(self, active):
+        pass
+
+# 全カメラをまとめたモザイク。クライアントがいる間だけfpsで合成し、FrameHubへ公開する
+class MosaicComposer:
+    def __init__(self, hubs, size=(1920, 1080), fps=5.0):
+        self.hubs = hubs
+        self.size = size
+        self.fps = float(fps) or 5.0
+        self.hub = FrameHub('mosaic', 'mosaic')
+        for hub in hubs:
+            hub.followers.append(self.hub)
+        self.overlay = LabelOverlay()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='restream-mosaic', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        while not self._stop.wait(interval):
+            if self.hub.clients > 0 and self.hubs:
+                self.hub.publish(self.compose())
+
+    def compose(self):
+        n = len(self.hubs)
+        cols = math.ceil(math.sqrt(n))
+        rows = math.ceil(n / cols)
+        width, height = self.size
+        tile_w, tile_h = width // cols, height // rows
+        # 毎回新しいキャンバス（公開したフレームはクライアント側で後からエンコードされる）
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        for idx, hub in enumerate(self.hubs):
+            frame, _, _ = hub.latest()
+            if frame is None:
+                continue
+            h, w = frame.shape[:2]
+            size = fit_size(w, h, tile_w, tile_h) or (min(w, tile_w), min(h, tile_h))
+            tile = cv2.resize(frame, size, interpolation=cv2.INTER_AREA) if size != (w, h) else frame.copy()
+            if hub.name:
+                self.overlay.apply(tile, hub.name)
+            row, col = divmod(idx, cols)
+            x = col * tile_w + (tile_w - size[0]) // 2
+            y = row * tile_h + (tile_h - size[1]) // 2
+            canvas[y:y + size[1], x:x + size[0]] = tile
+        return canvas
+
+    def close(self):
+        self._stop.set()
+        self.hub.close()
+
+# HTTPサーバ本体。hubsは {キー(IP): FrameHub}（並び順が番号）
+class RestreamServer:
+    def __init__(self, hubs, port=DEFAULT_PORT, host='127.0.0.1', quality=80, mosaic_size=(1920, 1080),
+                 mosaic_fps=5.0, send_timeout=10.0):
+        self.hubs = dict(hubs)
+        self.quality = int(quality)
+        self.send_timeout = send_timeout
+        self.mosaic = MosaicComposer(list(self.hubs.values()), mosaic_size, mosaic_fps)
+        server = self
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+        self._httpd = http.server.ThreadingHTTPServer((host, int(port)), Handler)
+        self._httpd.daemon_threads = True
+        self.address = self._httpd.server_address
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='restream-http', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_settings(cls, settings, hubs, host=None, port=None):
+        # [General] restream_host / restream_port / restream_quality / restream_mosaic_size / restream_mosaic_fps
+        general = settings.get_general()
+        def num(key, default):
+            try:
+                return float(general.get(key, default))
+            except ValueError:
+                return default
+        return cls(hubs,
+                   port=port or int(num('restream_port', DEFAULT_PORT)),
+                   host=host or general.get('restream_host', '127.0.0.1'),
+                   quality=int(num('restream_quality', 80)),
+                   mosaic_size=parse_size(general.get('restream_mosaic_size'), (1920, 1080)),
+                   mosaic_fps=num('restream_mosaic_fps', 5))
+
+    def find_hub(self, ident):
+        if ident == 'mosaic':
+            return self.mosaic.hub
+        if ident in self.hubs:
+            return self.hubs[ident]
+        if ident.isdigit() and int(ident) < len(self.hubs):
+            return list(self.hubs.values())[int(ident)]
+        return None
+
+    def handle(self, req):
+        url = urllib.parse.urlsplit(req.path)
+        query = urllib.parse.parse_qs(url.query)
+        path = urllib.parse.unquote(url.path)
+        try:
+            quality = max(1, min(100, int(query.get('quality', [self.quality])[0])))
+        except ValueError:
+            quality = self.quality
+        if path in ('/', '/index.html'):
+            self._send(req, 'text/html; charset=utf-8', self.index_html().encode('utf-8'))
+            return
+        if path == '/cameras.json':
+            cameras = [{'index': i, 'key': key, 'name': hub.name,
+                        'mjpeg': f"/camera/{urllib.parse.quote(key, safe='')}.mjpg"}
+                       for i, (key, hub) in enumerate(self.hubs.items())]
+            self._send(req, 'application/json', json.dumps(cameras, ensure_ascii=False).encode('utf-8'))
+            return
+        if path == '/stats.json':
+            stats = [hub.stats() for hub in self.hubs.values()] + [self.mosaic.hub.stats()]
+            self._send(req, 'application/json', json.dumps(stats, ensure_ascii=False).encode('utf-8'))
+            return
+        if path.startswith('/camera/'):
+            ident, _, ext = path[len('/camera/'):].rpartition('.')
+        elif path.startswith('/mosaic.'):
+            ident, ext = 'mosaic', path[len('/mosaic.'):]
+        else:
+            req.send_error(404)
+            return
+        hub = self.find_hub(ident)
+        if hub is None or ext not in ('mjpg', 'jpg'):
+            req.send_error(404)
+            return
+        if ext == 'jpg':
+            self.send_snapshot(req, hub, quality)
+        else:
+            self.send_mjpeg(req, hub, quality)
+
+    def _send(self, req, content_type, body):
+        req.send_response(200)
+        req.send_header('Content-Type', content_type)
+        req.send_header('Content-Length', str(len(body)))
+        req.send_header('Cache-Control', 'no-cache')
+        req.end_headers()
+        req.wfile.write(body)
+
+    def send_snapshot(self, req, hub, quality):
+        hub.add_client(1)
+        try:
+            # 視聴者がいない間は一時停止しているため、次に公開されるフレームを待つ
+            hub.wait(hub.latest()[2])
+            entry = hub.jpeg(quality)
+        finally:
+            hub.add_client(-1)
+        if entry is None:
+            req.send_error(503, 'no frame yet')
+            return
+        self._send(req, 'image/jpeg', entry[1])
+
+    def send_mjpeg(self, req, hub, quality):
+        req.send_response(200)
+        req.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        req.send_header('Cache-Control', 'no-cache')
+        req.send_header('Connection', 'close')
+        req.end_headers()
+        # 受信しないクライアントはsend_timeoutで切断する
+        req.connection.settimeout(self.send_timeout)
+        hub.add_client(1)
+        sent_seq = 0
+        try:
+            while True:
+                seq = hub.wait(sent_seq)
+                if seq is None:
+                    return
+                if seq == sent_seq:
+                    continue
+                entry = hub.jpeg(quality)
+                if entry is None:
+                    continue
+                seq, data, timestamp = entry
+                if sent_seq:
+                    # 送信中に公開されて送らなかったフレーム
+                    hub.skipped += max(0, seq - sent_seq - 1)
+                req.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n"
+                                f"X-Timestamp: {timestamp:.3f}\r\n\r\n".encode('ascii'))
+                req.wfile.write(data)
+                req.wfile.write(b'\r\n')
+                req.wfile.flush()
+                hub.sent += 1
+                sent_seq = seq
+        except (OSError, ValueError):
+            # クライアントの切断・送信タイムアウト
+            return
+        finally:
+            hub.add_client(-1)
+
+    def index_html(self):
+        items = ''.join(
+            f'<li><a href="/camera/{urllib.parse.quote(key, safe="")}.mjpg">{html.escape(hub.name or key)}</a></li>'
+            for key, hub in self.hubs.items())
+        return ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>カメラ配信</title></head><body>'
+                f'<ul>{items}</ul><img src="/mosaic.mjpg" style="max-width:100%"></body></html>')
+
+    def close(self):
+        self.mosaic.close()
+        for hub in self.hubs.values():
+            hub.close()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def source_url(base, ip):
+    # ビューアから配信サーバ経由で開く時のURL（[General] restream_source）
+    return f"{base.rstrip('/')}/camera/{urllib.parse.quote(ip, safe='')}.mjpg"
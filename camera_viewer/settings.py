@@ -1,7 +1,16 @@
 import configparser
 import os
+from camera_viewer.capture_profile import (CaptureProfile, BUILTIN_PROFILES, DEFAULT_PROFILE,
+                                           PROFILE_SECTION_PREFIX)
+from camera_viewer.ptz import DEFAULT_ONVIF_PORT
+from camera_viewer.utils import DEFAULT_STREAM_SIZES, parse_size
 
 CONFIG_PATH = os.path.join(os.path.expanduser('~'), 'camera_viewer.ini')
+# カメラ毎の追加設定は [Camera:<ip>] セクションに保存（Camerasの旧形式は変更しない）
+CAMERA_SECTION_PREFIX = 'Camera:'
+# IP欄にURL（synthetic:// や file://）を書いたカメラのキー。ConfigParserはキーを小文字化し ':' '=' で区切るため、
+# URLは [Camera:source-N] source_url に保存し、Cameras側は source-N をキーにする
+SOURCE_KEY_PREFIX = 'source-'
 
 class Settings:
     def __init__(self, path=CONFIG_PATH):
@@ -14,16 +23,41 @@ class Settings:
             self.config.read(self.path, encoding='utf-8')
         else:
             self.config['Cameras'] = {}
-            self.config['General'] = {'fps': '20', 'save_dir': os.path.join(os.path.expanduser('~'), 'Pictures')}
+            self.config['General'] = {'fps': '20', 'fps_budget': '0', 'cpu_budget': '0', 'save_dir': os.path.join(os.path.expanduser('~'), 'Pictures')}
 
     def save(self):
         with open(self.path, 'w', encoding='utf-8') as f:
             self.config.write(f)
 
+    def _source_url(self, key):
+        section = CAMERA_SECTION_PREFIX + key
+        if not self.config.has_section(section):
+            return None
+        return self.config[section].get('source_url')
+
+    def _camera_key(self, ip, create=False):
+        # ip（またはURL）→ Cameras・[Camera:...] のキー。URLで未登録ならNone（create=Trueで割り当てる）
+        if '://' not in ip:
+            return ip
+        for section in self.config.sections():
+            if section.startswith(CAMERA_SECTION_PREFIX) and self.config[section].get('source_url') == ip:
+                return section[len(CAMERA_SECTION_PREFIX):]
+        if not create:
+            return None
+        n = 1
+        while (SOURCE_KEY_PREFIX + str(n) in self.config['Cameras']
+               or self.config.has_section(CAMERA_SECTION_PREFIX + SOURCE_KEY_PREFIX + str(n))):
+            n += 1
+        key = SOURCE_KEY_PREFIX + str(n)
+        # 値の '%' は補間の書式になるためエスケープする
+        self.config[CAMERA_SECTION_PREFIX + key] = {'source_url': ip.replace('%', '%%')}
+        return key
+
     def get_cameras(self):
         # 旧形式との互換性維持
         cams = {}
-        for ip, v in self.config['Cameras'].items():
+        for key, v in self.config['Cameras'].items():
+            ip = self._source_url(key) or key
             parts = v.split('|')
             if len(parts) == 7:
                 name, flip_h, flip_v, enable, user, password, port = parts
@@ -41,11 +75,134 @@ class Settings:
         return self.config['General']
 
     def set_camera(self, ip, name, flip_h=False, flip_v=False, enable=True, user='', password='', port='554'):
-        self.config['Cameras'][ip] = f"{name}|{int(flip_h)}|{int(flip_v)}|{int(enable)}|{user}|{password}|{port}"
+        key = self._camera_key(ip, create=True)
+        self.config['Cameras'][key] = f"{name}|{int(flip_h)}|{int(flip_v)}|{int(enable)}|{user}|{password}|{port}"
 
     def remove_camera(self, ip):
-        if ip in self.config['Cameras']:
-            del self.config['Cameras'][ip]
+        key = self._camera_key(ip)
+        if key is None:
+            return
+        if key in self.config['Cameras']:
+            del self.config['Cameras'][key]
+        self.config.remove_section(CAMERA_SECTION_PREFIX + key)
+
+    def get_camera_option(self, ip, key, default=None):
+        camera = self._camera_key(ip)
+        section = CAMERA_SECTION_PREFIX + camera if camera is not None else None
+        if section is None or not self.config.has_section(section):
+            return default
+        return self.config[section].get(key, default)
+
+    def set_camera_option(self, ip, key, value):
+        section = CAMERA_SECTION_PREFIX + self._camera_key(ip, create=True)
+        if not self.config.has_section(section):
+            self.config[section] = {}
+        self.config[section][key] = str(value)
+
+    def remove_stale_camera_options(self):
+        # Camerasに存在しないカメラの追加設定を削除
+        for section in self.config.sections():
+            if section.startswith(CAMERA_SECTION_PREFIX):
+                if section[len(CAMERA_SECTION_PREFIX):] not in self.config['Cameras']:
+                    self.config.remove_section(section)
+
+    def get_fps(self, ip=None):
+        # カメラ毎のfps上書き（[Camera:<ip>] fps）が無ければ [General] fps
+        value = self.get_camera_option(ip, 'fps') if ip else None
+        if not value:
+            value = self.get_general().get('fps', '20')
+        try:
+            return float(value)
+        except ValueError:
+            return 20.0
+
+    def get_stream_sizes(self, ip=None):
+        # ストリーム解像度（[General] stream1_size / stream2_size、[Camera:<ip>]で上書き可）
+        sizes = {}
+        for stream, default in DEFAULT_STREAM_SIZES.items():
+            key = f'{stream}_size'
+            value = self.get_camera_option(ip, key) if ip else None
+            if not value:
+                value = self.get_general().get(key)
+            sizes[stream] = parse_size(value, default)
+        return sizes
+
+    def get_crop(self, ip):
+        # [Camera:<ip>] crop = x,y,w,h（元フレームの画素単位）
+        value = self.get_camera_option(ip, 'crop')
+        if not value:
+            return None
+        try:
+            x, y, w, h = (int(v) for v in value.split(','))
+        except ValueError:
+            return None
+        return (x, y, w, h)
+
+    def get_auto_stream(self):
+        return self.get_general().get('auto_stream', '1') == '1'
+
+    def get_motion_options(self, ip):
+        # 動き検出による適応fps（[General] adaptive_fps=1 で有効）。無効ならNone
+        general = self.get_general()
+        if general.get('adaptive_fps', '0') != '1':
+            return None
+        def num(value, default):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return default
+        return dict(
+            sensitivity=num(self.get_camera_option(ip, 'motion_sensitivity', general.get('motion_sensitivity')), 0.5),
+            hold_seconds=num(general.get('motion_hold'), 3.0),
+            sample_seconds=num(general.get('idle_sample_seconds'), 5.0),
+        )
+
+    def get_capture_profiles(self):
+        # 組み込みプロファイル + [Profile:<名前>] セクション（同名は上書き）
+        profiles = dict(BUILTIN_PROFILES)
+        for section in self.config.sections():
+            if section.startswith(PROFILE_SECTION_PREFIX):
+                name = section[len(PROFILE_SECTION_PREFIX):]
+                profiles[name] = CaptureProfile.from_options(name, self.config[section])
+        return profiles
+
+    def set_capture_profile(self, profile):
+        self.config[PROFILE_SECTION_PREFIX + profile.name] = profile.to_options()
+
+    def remove_capture_profile(self, name):
+        self.config.remove_section(PROFILE_SECTION_PREFIX + name)
+
+    def backup_capture_profiles(self):
+        # [Profile:<名前>] セクションの写し（設定ダイアログのキャンセル時に戻す）
+        return {s: dict(self.config[s]) for s in self.config.sections() if s.startswith(PROFILE_SECTION_PREFIX)}
+
+    def restore_capture_profiles(self, backup):
+        for section in self.config.sections():
+            if section.startswith(PROFILE_SECTION_PREFIX):
+                self.config.remove_section(section)
+        for section, options in backup.items():
+            self.config[section] = options
+
+    def get_camera_profile_name(self, ip):
+        # [Camera:<ip>] capture_profile（無ければ [General] capture_profile）
+        return self.get_camera_option(ip, 'capture_profile') or self.get_general().get('capture_profile', DEFAULT_PROFILE)
+
+    def get_camera_profile(self, ip):
+        profiles = self.get_capture_profiles()
+        return profiles.get(self.get_camera_profile_name(ip), profiles[DEFAULT_PROFILE])
+
+    def get_onvif_port(self, ip):
+        # PTZ用のONVIFポート（[Camera:<ip>] onvif_port）。数値でなければ既定
+        try:
+            return int(self.get_camera_option(ip, 'onvif_port', DEFAULT_ONVIF_PORT))
+        except ValueError:
+            return DEFAULT_ONVIF_PORT
+
+    def get_low_latency(self, ip):
+        return self.get_camera_option(ip, 'low_latency', '0') == '1'
+
+    def set_low_latency(self, ip, enable):
+        self.set_camera_option(ip, 'low_latency', int(enable))
 
     def set_general(self, key, value):
         self.config['General'][key] = str(value)
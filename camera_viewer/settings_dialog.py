@@ -2,21 +2,28 @@ from PyQt5 import QtWidgets, QtCore, QtGui
 import sys
 import os
 from camera_viewer.settings import Settings
+from camera_viewer.profile_dialog import ProfileDialog
+from camera_viewer.utils import build_rtsp_url
 
 class SettingsDialog(QtWidgets.QDialog):
     def __init__(self, settings, parent=None):
         super().__init__(parent)
         self.setWindowTitle('カメラ設定')
         self.settings = settings
+        # キャプチャプロファイルを編集した時の元の内容（保存せずに閉じたら戻す）
+        self._profile_backup = None
         self.layout = QtWidgets.QVBoxLayout(self)
-        self.table = QtWidgets.QTableWidget(0, 9)
-        self.table.setHorizontalHeaderLabels(['IP', '名前', 'ユーザー', 'パスワード', 'ポート', '左右反転', '上下反転', '表示', '削除'])
+        self.table = QtWidgets.QTableWidget(0, 11)
+        self.table.setHorizontalHeaderLabels(['IP', '名前', 'ユーザー', 'パスワード', 'ポート', '左右反転', '上下反転', '表示', '低遅延', 'プロファイル', '削除'])
         self.layout.addWidget(self.table)
         self.add_btn = QtWidgets.QPushButton('追加')
+        self.profile_btn = QtWidgets.QPushButton('キャプチャプロファイル...')
         self.save_btn = QtWidgets.QPushButton('保存')
         self.layout.addWidget(self.add_btn)
+        self.layout.addWidget(self.profile_btn)
         self.layout.addWidget(self.save_btn)
         self.add_btn.clicked.connect(self.add_row)
+        self.profile_btn.clicked.connect(self.edit_profiles)
         self.save_btn.clicked.connect(self.save)
         self.load_table()
 
@@ -24,9 +31,11 @@ class SettingsDialog(QtWidgets.QDialog):
         self.table.setRowCount(0)
         for ip, v in self.settings.get_cameras().items():
             name, flip_h, flip_v, enable, user, password, port = v
-            self.add_row(ip, name, user, password, port, flip_h == '1', flip_v == '1', enable == '1')
+            low_latency = self.settings.get_low_latency(ip)
+            profile = self.settings.get_camera_profile_name(ip)
+            self.add_row(ip, name, user, password, port, flip_h == '1', flip_v == '1', enable == '1', low_latency, profile)
 
-    def add_row(self, ip='', name='', user='', password='', port='554', flip_h=False, flip_v=False, enable=True):
+    def add_row(self, ip='', name='', user='', password='', port='554', flip_h=False, flip_v=False, enable=True, low_latency=False, profile=None):
         row = self.table.rowCount()
         self.table.insertRow(row)
         self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(ip))
@@ -43,9 +52,41 @@ class SettingsDialog(QtWidgets.QDialog):
         enable_cb = QtWidgets.QCheckBox()
         enable_cb.setChecked(enable)
         self.table.setCellWidget(row, 7, enable_cb)
+        low_latency_cb = QtWidgets.QCheckBox()
+        low_latency_cb.setChecked(low_latency)
+        low_latency_cb.setToolTip('grab()で受信バッファを読み捨て、常に最新フレームのみデコード')
+        self.table.setCellWidget(row, 8, low_latency_cb)
+        profile_cb = QtWidgets.QComboBox()
+        profile_cb.setToolTip('接続時のFFmpegオプション（転送方式・バッファリング等）')
+        self._fill_profiles(profile_cb, profile or self.settings.get_camera_profile_name(ip))
+        self.table.setCellWidget(row, 9, profile_cb)
         del_btn = QtWidgets.QPushButton('削除')
         del_btn.clicked.connect(lambda: self.table.removeRow(row))
-        self.table.setCellWidget(row, 8, del_btn)
+        self.table.setCellWidget(row, 10, del_btn)
+
+    def _fill_profiles(self, combo, selected):
+        combo.clear()
+        combo.addItems(sorted(self.settings.get_capture_profiles()))
+        index = combo.findText(selected)
+        combo.setCurrentIndex(index if index >= 0 else max(0, combo.findText('default')))
+
+    def edit_profiles(self):
+        # 計測対象は表の内容（未保存の行も含む）
+        cameras = []
+        for row in range(self.table.rowCount()):
+            ip = self.table.item(row, 0).text()
+            if not ip:
+                continue
+            url = build_rtsp_url(ip, self.table.item(row, 2).text(), self.table.item(row, 3).text(),
+                                 self.table.item(row, 4).text() or '554', 'stream2')
+            cameras.append((f"{self.table.item(row, 1).text() or ip} ({ip})", url))
+        if self._profile_backup is None:
+            self._profile_backup = self.settings.backup_capture_profiles()
+        dlg = ProfileDialog(self.settings, cameras, self)
+        if dlg.exec_():
+            for row in range(self.table.rowCount()):
+                combo = self.table.cellWidget(row, 9)
+                self._fill_profiles(combo, combo.currentText())
 
     def save(self):
         self.settings.config['Cameras'] = {}
@@ -58,10 +99,22 @@ class SettingsDialog(QtWidgets.QDialog):
             flip_h = self.table.cellWidget(row, 5).isChecked()
             flip_v = self.table.cellWidget(row, 6).isChecked()
             enable = self.table.cellWidget(row, 7).isChecked()
+            low_latency = self.table.cellWidget(row, 8).isChecked()
+            profile = self.table.cellWidget(row, 9).currentText()
             self.settings.set_camera(ip, name, flip_h, flip_v, enable, user, password, port)
+            self.settings.set_low_latency(ip, low_latency)
+            self.settings.set_camera_option(ip, 'capture_profile', profile)
+        self.settings.remove_stale_camera_options()
         self.settings.save()
+        self._profile_backup = None
         self.accept()
 
+    def reject(self):
+        if self._profile_backup is not None:
+            self.settings.restore_capture_profiles(self._profile_backup)
+            self._profile_backup = None
+        super().reject()
+
 if __name__ == '__main__':
     app = QtWidgets.QApplication(sys.argv)
     settings = Settings()
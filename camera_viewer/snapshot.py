@@ -0,0 +1,156 @@
+import concurrent.futures
+import datetime
+import json
+import os
+import threading
+import time
+import cv2
+from camera_viewer.pipeline import FLIP_CODES
+from camera_viewer.utils import safe_filename
+
+# 各カメラの次のフレーム（生フレーム・BGR）を1枚だけ受け取るタップ
+# CaptureLoop.taps に登録しておき、要求がある時だけコピーする（通常時のコストはほぼ0）
+# 反転はパイプラインの設定に合わせる（名前描画・縮小はしない）
+class SnapshotTap:
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline
+        self._lock = threading.Lock()
+        self._requests = []
+
+    def __call__(self, frame, timestamp):
+        if not self._requests:
+            return
+        with self._lock:
+            requests = self._requests
+            self._requests = []
+        code = None
+        if self.pipeline is not None:
+            code = FLIP_CODES[(bool(self.pipeline.flip_h), bool(self.pipeline.flip_v))]
+        copy = frame.copy() if code is None else cv2.flip(frame, code)
+        for req in requests:
+            req.fulfil(copy, timestamp)
+
+    def request(self, req):
+        with self._lock:
+            self._requests.append(req)
+
+    def cancel(self, req):
+        with self._lock:
+            if req in self._requests:
+                self._requests.remove(req)
+
+class _FrameRequest:
+    def __init__(self):
+        self.event = threading.Event()
+        self.frame = None
+        self.timestamp = None
+
+    def fulfil(self, frame, timestamp):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.event.set()
+
+# 全カメラ同時スナップショット
+# 撮影要求を全カメラへ同時に出し、各カメラの次のフレーム（と取得時刻）を集める。
+# PNG/JPEGのエンコードと保存はスレッドプールで行い、GUIスレッドを止めない
+class SnapshotService:
+    def __init__(self, save_dir, fmt='png', jpeg_quality=95, workers=4, window=1.0):
+        self.save_dir = save_dir
+        self.fmt = 'jpg' if fmt.lower() in ('jpg', 'jpeg') else 'png'
+        self.jpeg_quality = jpeg_quality
+        self.window = window  # 各カメラのフレームを待つ最大秒数
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='snapshot')
+        self._runner = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot-burst')
+
+    @classmethod
+    def from_settings(cls, settings):
+        general = settings.get_general()
+        try:
+            quality = int(general.get('snapshot_jpeg_quality', '95'))
+        except ValueError:
+            quality = 95
+        return cls(general.get('save_dir', os.path.join(os.path.expanduser('~'), 'Pictures')),
+                   fmt=general.get('snapshot_format', 'png'), jpeg_quality=quality)
+
+    def capture(self, sources, burst=1, interval=0.5, on_done=None):
+        # sources: [(名前, SnapshotTap または peek()を持つフレーム源)]。結果(メタデータのリスト)のFutureを返す
+        future = self._runner.submit(self._capture_burst, list(sources), max(1, int(burst)), interval)
+        if on_done is not None:
+            future.add_done_callback(on_done)
+        return future
+
+    def _capture_burst(self, sources, burst, interval):
+        results = []
+        start = time.monotonic()
+        for i in range(burst):
+            # 一定間隔で撮影（処理時間で間隔がずれないよう締切基準）
+            deadline = start + i * interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            results.append(self._capture_round(sources, i if burst > 1 else None))
+        return results
+
+    def _capture_round(self, sources, index):
+        requested = time.time()
+        stamp = datetime.datetime.fromtimestamp(requested).strftime('%Y%m%d_%H%M%S_%f')[:-3]
+        directory = os.path.join(self.save_dir, 'snapshots', stamp if index is None else f"{stamp}_{index:03d}")
+        pending = []
+        for name, source in sources:
+            if isinstance(source, SnapshotTap):
+                req = _FrameRequest()
+                source.request(req)
+                pending.append((name, source, req))
+            else:
+                # プロセス方式など生フレームが無い場合は表示用の最新フレーム（RGB）を使う
+                frame, ts, seq = source.peek()
+                req = _FrameRequest()
+                if frame is not None:
+                    req.fulfil(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), ts)
+                pending.append((name, None, req))
+        deadline = time.monotonic() + self.window
+        frames = []
+        for name, tap, req in pending:
+            if not req.event.wait(max(0.0, deadline - time.monotonic())):
+                if tap is not None:
+                    tap.cancel(req)
+                frames.append({'camera': name, 'timestamp': None, 'file': None})
+                continue
+            frames.append({'camera': name, 'timestamp': req.timestamp, 'frame': req.frame})
+        os.makedirs(directory, exist_ok=True)
+        futures = []
+        for number, item in enumerate(frames):
+            frame = item.pop('frame', None)
+            if frame is None:
+                continue
+            # 同じ名前・名前の無いカメラで上書きしないよう、並び順の番号を付ける
+            path = os.path.join(directory, f"{number:02d}_{safe_filename(item['camera'])}.{self.fmt}")
+            item['file'] = os.path.basename(path)
+            item['width'] = frame.shape[1]
+            item['height'] = frame.shape[0]
+            futures.append(self._pool.submit(self._write, path, frame))
+        concurrent.futures.wait(futures)
+        stamps = [f['timestamp'] for f in frames if f['timestamp'] is not None]
+        meta = {
+            'requested': requested,
+            # 全カメラの取得時刻の幅（同時性の目安）
+            'spread_ms': (max(stamps) - min(stamps)) * 1000 if stamps else None,
+            'frames': frames,
+        }
+        with open(os.path.join(directory, 'snapshot.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        meta['directory'] = directory
+        return meta
+
+    def _write(self, path, frame):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality] if self.fmt == 'jpg' else []
+        # cv2.imwriteは日本語パスを扱えないためimencodeしてから書き込む
+        ok, buf = cv2.imencode('.' + self.fmt, frame, params)
+        if ok:
+            with open(path, 'wb') as f:
+                f.write(buf.tobytes())
+        return ok
+
+    def shutdown(self):
+        self._runner.shutdown(wait=False)
+        self._pool.shutdown(wait=False)
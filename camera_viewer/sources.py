@@ -0,0 +1,167 @@
+import os
+import time
+import urllib.parse
+import cv2
+import numpy as np
+from camera_viewer.utils import parse_size
+
+# カメラの代わりに使えるフレーム源（ベンチマーク・動作確認用）
+#   synthetic://640x360@20        … 横に流れるランダム画像（?static=1 で静止画、?open_ms=800 で接続の所要時間を再現）
+#   file:///path/to/video.mp4     … 動画ファイルをループ再生（?fps=15 で再生レート上書き）
+# どちらもcv2.VideoCaptureと同じ isOpened/read/grab/retrieve/get/set/release を持ち、
+# 実カメラと同じく一定レートでフレームが「届く」。読み取りが遅れた分のフレームは捨ててsource_droppedに数える
+SYNTHETIC_SCHEME = 'synthetic://'
+FILE_SCHEME = 'file://'
+
+def synthetic_url(width, height, fps, static=False, open_ms=0):
+    query = urllib.parse.urlencode([(k, v) for k, v in (('static', 1 if static else 0), ('open_ms', int(open_ms))) if v])
+    return f"{SYNTHETIC_SCHEME}{width}x{height}@{fps:g}" + (f"?{query}" if query else '')
+
+def is_source_url(url):
+    return url.startswith(SYNTHETIC_SCHEME) or url.startswith(FILE_SCHEME)
+
+def open_source(url):
+    # 対応していないURL（rtsp://等）はNone
+    if url.startswith(SYNTHETIC_SCHEME):
+        parsed = urllib.parse.urlsplit(url)
+        query = urllib.parse.parse_qs(parsed.query)
+        size, _, fps = parsed.netloc.partition('@')
+        width, height = parse_size(size, (640, 360))
+        # RTSPのネゴシエーション・最初のキーフレーム待ちの代わり
+        open_ms = _float(query.get('open_ms', [None])[0], 0.0)
+        if open_ms > 0:
+            time.sleep(open_ms / 1000.0)
+        return SyntheticCapture(width, height, _float(fps, 20.0), static=query.get('static') == ['1'])
+    if url.startswith(FILE_SCHEME):
+        parsed = urllib.parse.urlsplit(url)
+        query = urllib.parse.parse_qs(parsed.query)
+        path = urllib.parse.unquote(parsed.netloc + parsed.path)
+        return FileCapture(path, fps=_float(query.get('fps', [None])[0], None))
+    return None
+
+class _PacedSource:
+    # 一定レートでフレームが届くカメラの振る舞い（grabは次のフレームが届くまで待つ）
+    def __init__(self, fps):
+        self.fps = fps if fps and fps > 0 else 20.0
+        self.index = -1
+        self.source_dropped = 0
+        self._start = None
+        self._released = False
+
+    def isOpened(self):
+        return not self._released
+
+    def _advance(self):
+        if self._released:
+            return False
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        latest = int((now - self._start) * self.fps)
+        wanted = self.index + 1
+        if latest > wanted:
+            self.source_dropped += latest - wanted
+            wanted = latest
+        due = self._start + wanted / self.fps
+        if due > now:
+            time.sleep(due - now)
+        self.index = wanted
+        return True
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return max(0, self.index) * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._released = True
+
+# 元画像は同じサイズの仮想カメラ間で共有する（多台数でもメモリは出力バッファ分だけ）
+_base_images = {}
+
+def _base_image(width, height, seed):
+    key = (width, height, seed)
+    if key not in _base_images:
+        rng = np.random.default_rng(seed)
+        _base_images[key] = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return _base_images[key]
+
+class SyntheticCapture(_PacedSource):
+    def __init__(self, width=640, height=360, fps=20.0, static=False, seed=0, buffers=3):
+        super().__init__(fps)
+        self.width = width
+        self.height = height
+        self.static = static
+        self._base = _base_image(width, height, seed)
+        # 呼び出し側が次の数フレームの間は参照・書き換えできるよう、出力先をローテーションする
+        self._outputs = [np.empty_like(self._base) for _ in range(buffers)]
+        self._out_index = 0
+
+    def grab(self):
+        return self._advance()
+
+    def retrieve(self):
+        if self._released:
+            return False, None
+        out = self._outputs[self._out_index]
+        self._out_index = (self._out_index + 1) % len(self._outputs)
+        shift = 0 if self.static else (self.index * 4) % self.width
+        out[:, :self.width - shift] = self._base[:, shift:]
+        out[:, self.width - shift:] = self._base[:, :shift]
+        return True, out
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        return super().get(prop)
+
+class FileCapture(_PacedSource):
+    def __init__(self, path, fps=None):
+        self.path = path
+        self._cap = cv2.VideoCapture(path) if os.path.isfile(path) else None
+        opened = self._cap is not None and self._cap.isOpened()
+        super().__init__(fps or (self._cap.get(cv2.CAP_PROP_FPS) if opened else 0))
+        if not opened:
+            self._released = True
+
+    def grab(self):
+        if not self._advance():
+            return False
+        if self._cap.grab():
+            return True
+        # 末尾まで読んだら先頭に戻ってループ
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self._cap.grab()
+
+    def retrieve(self):
+        if self._released:
+            return False, None
+        return self._cap.retrieve()
+
+    def get(self, prop):
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT) and self._cap is not None:
+            return self._cap.get(prop)
+        return super().get(prop)
+
+    def release(self):
+        super().release()
+        if self._cap is not None:
+            self._cap.release()
+
+def _float(value, default):
+    try:
+        return float(value) if value not in (None, '') else default
+    except ValueError:
+        return default
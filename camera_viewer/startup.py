@@ -0,0 +1,29 @@
+import importlib
+import threading
+
+# 初回使用時に止まる重い処理を、起動後にバックグラウンドで一度だけ済ませておく
+# - PILのimportと日本語フォントの探索・読み込み（各キャプチャスレッドの最初のフレームの名前描画で待たないように）
+# - onvif（zeep/lxml）のimport（最初のPTZ操作で待たないように）
+OPTIONAL_MODULES = ('onvif',)
+
+_lock = threading.Lock()
+_started = False
+done = threading.Event()
+
+def preload_optional(modules=OPTIONAL_MODULES, font_size=28):
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    def run():
+        from camera_viewer.overlay import get_font
+        get_font(font_size)
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                # 未インストール等。使う時に改めてエラーになる
+                pass
+        done.set()
+    threading.Thread(target=run, name='preload', daemon=True).start()
@@ -14,3 +14,43 @@ def get_camera_stream(ip, flip_h=False, flip_v=False):
             frame = cv2.flip(frame, 0)
         return frame
     return get_frame
+
+def safe_filename(name, default='camera'):
+    # Windowsでファイル名に使えない文字を置き換える
+    return ''.join('_' if c in '\\/:*?"<>|' else c for c in name) or default
+
+def build_rtsp_url(ip, user='', password='', port='554', stream='stream2'):
+    # IP欄にURL（synthetic:// や file:// 等）が書かれている場合はそのまま使う
+    if '://' in ip:
+        return ip
+    auth = f"{user}:{password}@" if user and password else ''
+    return f"rtsp://{auth}{ip}:{port}/{stream}"
+
+# Tapoのデフォルト解像度（stream1: メイン / stream2: サブ）
+DEFAULT_STREAM_SIZES = {'stream1': (1920, 1080), 'stream2': (640, 360)}
+
+def parse_size(text, default=None):
+    # '1920x1080' → (1920, 1080)
+    try:
+        w, h = str(text).lower().split('x')
+        return int(w), int(h)
+    except (ValueError, AttributeError):
+        return default
+
+def choose_stream(tile_w, tile_h, stream_sizes=None, tolerance=1.25):
+    # タイルの物理ピクセルサイズを満たす最小のストリームを選ぶ（多少の拡大はtoleranceまで許容）
+    sizes = stream_sizes or DEFAULT_STREAM_SIZES
+    ordered = sorted(sizes.items(), key=lambda kv: kv[1][0] * kv[1][1])
+    for stream, (w, h) in ordered:
+        if tile_w <= w * tolerance and tile_h <= h * tolerance:
+            return stream
+    return ordered[-1][0]
+
+def fit_size(src_w, src_h, dst_w, dst_h):
+    # アスペクト比を保ったまま縮小した時のサイズ。縮小不要ならNone
+    if dst_w <= 0 or dst_h <= 0:
+        return None
+    scale = min(dst_w / src_w, dst_h / src_h)
+    if scale >= 1.0:
+        return None
+    return max(1, int(src_w * scale)), max(1, int(src_h * scale))
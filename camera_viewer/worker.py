@@ -0,0 +1,295 @@
+import threading
+import time
+import cv2
+from camera_viewer import connection as conn_state
+from camera_viewer.capture import open_capture, LagEstimator
+from camera_viewer.connection import ConnectionSupervisor, capture_params
+from camera_viewer.pacing import PacingScheduler
+from camera_viewer.utils import build_rtsp_url
+
+# 一時停止中の扱い
+STANDBY_WARM = 'warm'        # セッションを維持し、grab()のみで受信バッファを読み捨てる
+STANDBY_RELEASE = 'release'  # 切断する（従来動作）
+STANDBY_PREWARM = 'prewarm'  # 未接続なら接続し、以降はwarmと同じ（ページ巡回で次のページを事前に動かす）
+# 注: OpenCV(FFmpeg)のgrab()はデコードまで行うため、warmでもCPUは使う（retrieve・変換・描画が無くなるだけ）
+
+# ストリーム切替の新セッション確立に失敗した時、次に試すまでの秒数
+SWITCH_RETRY_INTERVAL = 5.0
+
+# 新しいストリームを別スレッドで開き、最初のフレームが届くまで待つ（make-before-break用）
+class PendingCapture:
+    def __init__(self, stream, open_fn):
+        self.stream = stream
+        self.cap = None
+        self.frame = None
+        self.ok = False
+        self._done = threading.Event()
+        self._abandoned = False
+        self._thread = threading.Thread(target=self._open, args=(open_fn,), daemon=True)
+        self._thread.start()
+
+    def _open(self, open_fn):
+        cap = open_fn(self.stream)
+        ok = False
+        frame = None
+        if cap.isOpened():
+            ok, frame = cap.read()
+        self.cap = cap
+        self.frame = frame
+        self.ok = bool(ok)
+        self._done.set()
+        if self._abandoned:
+            cap.release()
+
+    def done(self):
+        return self._done.is_set()
+
+    def release(self):
+        # 不要になった新セッションを破棄（オープン中なら完了後に解放）
+        self._abandoned = True
+        if self._done.is_set() and self.cap is not None:
+            self.cap.release()
+
+# 1台分のキャプチャループ（スレッド方式・プロセス方式で共通）
+# control: is_stopped() / is_paused() / standby_mode() / needs_taps() / get_current_stream() / target_size()
+# needs_taps()がTrueの間は一時停止中も読み取りを続け、tapsにだけフレームを渡す（録画中のカメラ）
+# sink: status(state, text) / frame(frame, pipeline, target) / activity(active)
+class CaptureLoop:
+    def __init__(self, ip, user, password, port, control, sink, pipeline, pacing=None, connection=None,
+                 low_latency=False, standby=STANDBY_WARM, motion=None, opener=open_capture, metrics=None,
+                 profile=None, url=None):
+        self.ip = ip
+        self.user = user
+        self.password = password
+        self.port = port
+        self.control = control
+        self.sink = sink
+        self.pipeline = pipeline
+        self.pacing = pacing if pacing is not None else PacingScheduler()
+        self.connection = connection if connection is not None else ConnectionSupervisor()
+        self.low_latency = low_latency
+        self.standby = standby
+        self.latency_drift_ms = None
+        self.stream = None
+        # 生フレーム(BGR)の分岐先（録画など）。tap(frame, timestamp) はパイプライン処理前に呼ばれる
+        self.taps = []
+        # 動き検出（MotionDetector）。静止中はfpsを下げ、動きがあればフルレートに戻す
+        self.motion = motion
+        self.motion_active = None
+        # 静止中に切断したカメラの次の確認時刻（motion.sample_seconds）
+        self._sample_at = None
+        # open_capture(url, low_latency, params, profile, should_stop) と同じ引数でキャプチャを開く関数（計測用に差し替え可能）
+        self.opener = opener
+        # キャプチャプロファイル（CaptureProfile。Noneで既定）
+        self.profile = profile
+        # 接続先URLの上書き（ローカル配信サーバ経由など。ストリーム指定は無視される）
+        self.url = url
+        # CameraMetrics（読み取り時間・デコード数・遅延変動・再接続数。パイプラインの各ステージも記録）
+        self.metrics = metrics
+        if metrics is not None:
+            pipeline.metrics = metrics
+
+    def _idle(self):
+        # 一時停止中で、録画等のtapもフレームを必要としていない
+        return self.control.is_paused() and not self.control.needs_taps()
+
+    def _should_stop(self):
+        # 接続・待機を中断するか（事前起動中のカメラは一時停止中でも接続する）
+        return self.control.is_stopped() or (self._idle() and self._standby() != STANDBY_PREWARM)
+
+    def _standby(self):
+        # 一時停止中の扱い。control側の指定（ページ外のカメラ等）が無ければカメラの既定
+        return self.control.standby_mode() or self.standby
+
+    def _params(self):
+        return capture_params(self.connection.open_timeout_ms, self.connection.read_timeout_ms)
+
+    def _url(self, stream):
+        if self.url:
+            return self.url
+        return build_rtsp_url(self.ip, self.user, self.password, self.port, stream)
+
+    def _open(self, stream):
+        return self.opener(self._url(stream), self.low_latency, self._params(), self.profile, self._should_stop)
+
+    def _status(self):
+        self.sink.status(self.connection.state, self.connection.status_text())
+
+    def run(self):
+        conn = self.connection
+        while not self.control.is_stopped():
+            if self._should_stop():
+                conn.reset()
+                self._sample_at = None
+                time.sleep(0.1)
+                continue
+            # 静止中に切断したカメラは次の確認時刻まで待つ（録画が始まれば即再接続）
+            if self._sample_at is not None and time.monotonic() < self._sample_at and not self.control.needs_taps():
+                time.sleep(0.1)
+                continue
+            resume = self._sample_at is not None
+            self._sample_at = None
+            # バックオフ中は待つだけ（停止中のカメラはCPUを使わない）
+            if not conn.wait_backoff(self._should_stop):
+                continue
+            if not conn.begin_open(self._should_stop, resume):
+                continue
+            # 確認のための再接続では「接続中」を出さず、最後のフレームを表示したままにする
+            if not resume:
+                self._status()
+            stream = self.control.get_current_stream()
+            # 低遅延モードはgrab()専用スレッドで受信バッファを読み捨てる
+            cap = None
+            opened = False
+            try:
+                cap = self._open(stream)
+                opened = cap.isOpened()
+            except Exception as e:
+                # オープナー・プロファイルの例外も接続失敗として扱い、バックオフ後に再試行する
+                print(f"{self.ip}: 接続に失敗しました: {e}")
+            finally:
+                # 同時接続数の枠は必ず返す
+                conn.end_open(opened)
+            if not opened:
+                if cap is not None:
+                    cap.release()
+                self._status()
+                continue
+            self.stream = stream
+            self._run_session(cap)
+
+    def _run_session(self, cap):
+        conn = self.connection
+        lag = cap.lag if self.low_latency else LagEstimator()
+        pacer = self.pacing.pacer(self.ip)
+        pacer.start()
+        # pacer.stop()で静止状態が解除されるため、セッション開始時は次のフレームで判定し直す
+        self.motion_active = None
+        standby = False
+        pending = None
+        switch_retry_at = 0.0
+        try:
+            while not self.control.is_stopped():
+                if self._idle():
+                    if self._standby() not in (STANDBY_WARM, STANDBY_PREWARM):
+                        conn.reset()
+                        break
+                    # ウォームスタンバイ: セッションを維持しgrab()のみ（retrieve・変換・描画はしない）
+                    if not standby:
+                        standby = True
+                        pacer.stop()
+                    if self.low_latency:
+                        ok = cap.isOpened()
+                        time.sleep(0.1)
+                    else:
+                        ok = cap.grab()
+                    if ok:
+                        conn.on_frame()
+                    elif conn.on_read_failure(fatal=not cap.isOpened()):
+                        self._status()
+                        break
+                    continue
+                if standby:
+                    standby = False
+                    pacer.start()
+                    self.motion_active = None
+                # stream切替要求（全画面のトグル・タイルサイズ変更）: 新ストリームを先に開き、
+                # フレームが届いてから旧セッションを閉じる（make-before-break）
+                wanted = self.control.get_current_stream()
+                if wanted != self.stream and pending is None and time.monotonic() >= switch_retry_at:
+                    pending = PendingCapture(wanted, self._open)
+                frame = None
+                if pending is not None and pending.done():
+                    if pending.ok and pending.stream == self.control.get_current_stream():
+                        cap.release()
+                        cap = pending.cap
+                        frame = pending.frame
+                        self.stream = pending.stream
+                        lag = cap.lag if self.low_latency else LagEstimator()
+                    else:
+                        pending.release()
+                        if not pending.ok:
+                            switch_retry_at = time.monotonic() + SWITCH_RETRY_INTERVAL
+                    pending = None
+                pacer.begin_frame()
+                read_start = time.perf_counter()
+                if frame is None:
+                    ret, frame = cap.read()
+                    if ret and self.metrics is not None:
+                        self.metrics.record('read', time.perf_counter() - read_start)
+                else:
+                    ret = True
+                # 一時停止中の録画: tapsへ渡すだけで、動き検出・表示用の処理はしない
+                taps_only = self.control.is_paused()
+                if ret:
+                    conn.on_frame()
+                    if not self.low_latency:
+                        lag.update(cap.get(cv2.CAP_PROP_POS_MSEC))
+                    self.latency_drift_ms = lag.drift_ms
+                    if self.metrics is not None:
+                        self.metrics.frame_decoded()
+                        self.metrics.latency_drift_ms = self.latency_drift_ms
+                        self.metrics.reconnects = conn.reconnects
+                    if self.motion is not None and not taps_only:
+                        self._update_motion(frame)
+                    if self.taps:
+                        now = time.time()
+                        for tap in tuple(self.taps):
+                            tap(frame, now)
+                    # 切り出し→表示サイズへ縮小→反転→カメラ名描画→RGB変換
+                    if not taps_only:
+                        self.sink.frame(frame, self.pipeline, self.control.target_size())
+                    if self._release_idle():
+                        conn.reset()
+                        break
+                elif conn.on_read_failure(fatal=not cap.isOpened()):
+                    # 一定時間フレームが来ない → 切断してバックオフ後に再接続
+                    self._status()
+                    break
+                # 固定sleepではなく次の締切まで待つ。カメラの送出fpsより遅いペース（fps・予算・静止中）の間は
+                # 待つ間grab()で受信バッファを読み捨て、古いフレームを溜めない（低遅延モードは専用スレッドが読み捨てる）
+                throttled = not self.low_latency and pacer.is_throttled(cap.get(cv2.CAP_PROP_FPS))
+                idle_work = cap.grab if throttled else None
+                pacer.wait(self._should_stop, idle_work)
+        finally:
+            if pending is not None:
+                pending.release()
+            pacer.stop()
+            cap.release()
+
+    def _release_idle(self):
+        # 静止中は切断し、sample_seconds秒後に再接続して動きを確認する（grab()もデコードするため、セッションごと止める）
+        # 再接続後の最初のフレームは切断前の最後のフレームと比較される
+        sample = self.motion.sample_seconds if self.motion is not None else 0
+        if self.motion_active is not False or sample <= 0 or self.low_latency:
+            return False
+        if self.control.is_paused() or self.control.needs_taps():
+            return False
+        self._sample_at = time.monotonic() + sample
+        return True
+
+    def _update_motion(self, frame):
+        active = self.motion.update(frame)
+        if active != self.motion_active:
+            self.motion_active = active
+            self.pacing.set_idle(self.ip, not active)
+            self.sink.activity(active)
+
+# スレッド方式: LatestFrameSlotへ公開する（GUIが参照中の出力バッファは避ける）
+class SlotSink:
+    def __init__(self, slot, label=''):
+        self.slot = slot
+        self.label = label
+
+    def status(self, state, text):
+        if state == conn_state.LIVE:
+            return
+        self.slot.set_status(f"{self.label}\n{text}" if self.label else text)
+
+    def frame(self, frame, pipeline, target):
+        rgb = pipeline.run(frame, target, exclude=self.slot.in_use())
+        self.slot.set_status(None)
+        self.slot.publish(rgb)
+
+    def activity(self, active):
+        self.slot.motion_active = active
@@ -0,0 +1,113 @@
+from PyQt5 import QtWidgets, QtCore, QtGui
+
+MIN_ZOOM = 0.2
+MAX_ZOOM = 8.0
+
+# 全画面表示用のズーム/パン描画ウィジェット
+# 元フレーム（フル解像度のQImage）から表示範囲だけを切り出してビューポートに拡大縮小する。
+# 拡大画像を作らないため、ズーム倍率によらずメモリ使用量は一定。
+# 再描画は新しいフレームが届いた時とズーム/パンが変わった時のみ
+class ZoomView(QtWidgets.QWidget):
+    def __init__(self, cam_widget, parent=None):
+        super().__init__(parent)
+        self.cam_widget = cam_widget
+        self.zoom = 1.0
+        # 表示中心（元フレーム上の正規化座標 0～1）
+        self.center = QtCore.QPointF(0.5, 0.5)
+        self._drag_start = None
+        self._drag_center = None
+        # リプレイ中に表示する過去のフレーム（Noneでライブ）
+        self._override = None
+        self.setMinimumSize(320, 240)
+        self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
+        self.setCursor(QtGui.QCursor(QtCore.Qt.OpenHandCursor))
+        cam_widget.frame_changed.connect(self.update)
+
+    def set_override_image(self, image):
+        self._override = image
+        self.update()
+
+    def image(self):
+        return self._override if self._override is not None else self.cam_widget.current_image()
+
+    def set_zoom(self, zoom):
+        zoom = max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+        if zoom != self.zoom:
+            self.zoom = zoom
+            self.update()
+
+    def reset(self):
+        self.zoom = 1.0
+        self.center = QtCore.QPointF(0.5, 0.5)
+        self.update()
+
+    def _display_scale(self, image):
+        # zoom=1.0で全体がビューポートに収まる倍率
+        fit = min(self.width() / image.width(), self.height() / image.height())
+        return fit * self.zoom
+
+    def _source_rect(self, image):
+        # ビューポートに表示される元フレーム上の範囲（フレーム外に出ないよう中心を制限）
+        scale = self._display_scale(image)
+        src_w = min(image.width(), self.width() / scale)
+        src_h = min(image.height(), self.height() / scale)
+        cx = self.center.x() * image.width()
+        cy = self.center.y() * image.height()
+        cx = max(src_w / 2, min(image.width() - src_w / 2, cx))
+        cy = max(src_h / 2, min(image.height() - src_h / 2, cy))
+        self.center = QtCore.QPointF(cx / image.width(), cy / image.height())
+        return QtCore.QRectF(cx - src_w / 2, cy - src_h / 2, src_w, src_h), scale
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtCore.Qt.black)
+        image = self.image()
+        if image is None or image.isNull():
+            painter.setPen(QtCore.Qt.white)
+            painter.drawText(self.rect(), QtCore.Qt.AlignCenter, self.cam_widget.text())
+            painter.end()
+            return
+        src, scale = self._source_rect(image)
+        dst_w = src.width() * scale
+        dst_h = src.height() * scale
+        dst = QtCore.QRectF((self.width() - dst_w) / 2, (self.height() - dst_h) / 2, dst_w, dst_h)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        painter.drawImage(dst, image, src)
+        painter.end()
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            self._drag_start = event.pos()
+            self._drag_center = QtCore.QPointF(self.center)
+            self.setCursor(QtGui.QCursor(QtCore.Qt.ClosedHandCursor))
+            event.accept()
+        else:
+            super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        image = self.image()
+        if self._drag_start is not None and image is not None and event.buttons() & QtCore.Qt.LeftButton:
+            scale = self._display_scale(image)
+            # ドラッグ方向に画像が動く（表示中心は逆方向へ）
+            dx = (event.pos().x() - self._drag_start.x()) / scale / image.width()
+            dy = (event.pos().y() - self._drag_start.y()) / scale / image.height()
+            self.center = QtCore.QPointF(self._drag_center.x() - dx, self._drag_center.y() - dy)
+            self.update()
+            event.accept()
+        else:
+            super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            self._drag_start = None
+            self.setCursor(QtGui.QCursor(QtCore.Qt.OpenHandCursor))
+            event.accept()
+        else:
+            super().mouseReleaseEvent(event)
+
+    def wheelEvent(self, event):
+        if event.angleDelta().y() > 0:
+            self.set_zoom(self.zoom * 1.2)
+        elif event.angleDelta().y() < 0:
+            self.set_zoom(self.zoom / 1.2)
+        event.accept()
@@ -3,14 +3,36 @@ from PyQt5 import QtWidgets, QtCore, QtGui
 import sys
 from camera_viewer.settings import Settings
 from camera_viewer.settings_dialog import SettingsDialog
-from camera_viewer.utils import get_camera_stream
+from camera_viewer.utils import get_camera_stream, choose_stream, build_rtsp_url
+from camera_viewer.pipeline import FramePipeline
+from camera_viewer.frame_buffer import LatestFrameSlot
+from camera_viewer.connection import ConnectionSupervisor, ReconnectGate
+from camera_viewer.worker import CaptureLoop, SlotSink, STANDBY_WARM, STANDBY_PREWARM
+from camera_viewer.zoom_view import ZoomView
+from camera_viewer.recorder import Recorder, MODE_ENCODE
+from camera_viewer.snapshot import SnapshotService, SnapshotTap
+from camera_viewer.motion import MotionDetector
+from camera_viewer.ptz import get_ptz_controller, close_all as close_ptz_controllers, DEFAULT_ONVIF_PORT
+from camera_viewer.pacing import PacingScheduler
+from camera_viewer.mp_backend import ProcessDecodeBackend
+from camera_viewer.compositor import GridCompositor
+from camera_viewer.paging import WallPager
+from camera_viewer.replay import ReplayPool
+from camera_viewer.replay_bar import ReplayBar
+from camera_viewer.startup import preload_optional
+from camera_viewer.sources import is_source_url
+from camera_viewer.restream import (FrameHub, HubSink, RestreamControl, RestreamServer,
+                                    source_url as restream_source_url)
+from camera_viewer.metrics import CameraMetrics, MetricsRegistry, start_exporters as start_metrics_exporters
 import threading
 import time
-import cv2
 import sip
 
 class CameraWidget(QtWidgets.QLabel):
-    def __init__(self, ip, user='', password='', port='554', flip_h=False, flip_v=False, name='', parent=None, stream='stream2'):
+    # 新しいフレームを表示用に取り込んだ時（GUIスレッド）
+    frame_changed = QtCore.pyqtSignal()
+
+    def __init__(self, ip, user='', password='', port='554', flip_h=False, flip_v=False, name='', parent=None, stream='stream2', low_latency=False, pacing=None, frame_source=None, stream_sizes=None, auto_stream=False, crop=None, connection=None, standby=STANDBY_WARM, onvif_port=DEFAULT_ONVIF_PORT, motion=None, motion_highlight=False, profile=None, offpage=False, source_url=None, autostart=True):
         super().__init__(parent)
         self.ip = ip
         self.user = user
@@ -20,127 +42,427 @@ class CameraWidget(QtWidgets.QLabel):
         self.flip_v = flip_v
         self.name = name
         self.stream = stream  # 'stream1' or 'stream2'
+        self.low_latency = low_latency
+        self.onvif_port = onvif_port
+        # 動きのあるタイルを枠で強調表示
+        self.motion_highlight = motion_highlight
+        self._motion_shown = False
+        # 実行時メトリクス（fps・ステージ毎の処理時間・欠落等）。show_metricsでタイル上に表示
+        self.metrics = CameraMetrics(ip, name)
+        self.metrics.collect = self._collect_metrics
+        self.show_metrics = False
+        # タイルの物理ピクセルサイズに合わせてストリームを自動選択し、ワーカー内で縮小する
+        self.stream_sizes = stream_sizes
+        self.auto_stream = auto_stream
+        self._target_size = None
+        self._full_resolution = False
+        self._stream_timer = QtCore.QTimer(self)
+        self._stream_timer.setSingleShot(True)
+        self._stream_timer.timeout.connect(self._apply_auto_stream)
+        # fps制御（MainWindowで共有のスケジューラを渡す）
+        self.pacing = pacing if pacing is not None else PacingScheduler()
+        # 接続状態（バックオフ・タイムアウト・停止検知・同時再接続数の制限）
+        self.connection = connection if connection is not None else ConnectionSupervisor()
         self.setAlignment(QtCore.Qt.AlignCenter)
-        self.setText(f"{self.name}\n接続中...")
+        # autostart=Falseの場合はstart()まで接続しない（起動時はウィンドウ表示後に並び順で接続する）
+        self.setText(f"{self.name}\n接続中..." if autostart else f"{self.name}\n接続待ち...")
         self._stop = False
         self._paused = False
+        # ページ外（ページ切替で非表示）のカメラは一時停止し、_offpage_standbyに従う
+        self._offpage = offpage
+        self._offpage_standby = None
         self._force_stream = None
-        self.thread = threading.Thread(target=self.update_frame, daemon=True)
-        self.thread.start()
+        # 反転・切り出し・縮小・名前描画・色変換をまとめた使い回しバッファのパイプライン
+        self.pipeline = FramePipeline(flip_h, flip_v, name, crop)
+        # キャプチャスレッドは最新フレームをslotへ置くだけ、描画はGUIスレッドのrefresh_displayで行う
+        # frame_source指定時（プロセスバックエンド）は共有メモリリングから受け取り、自前のスレッドは持たない
+        self.frame_source = frame_source
+        self.frame_slot = frame_source if frame_source is not None else LatestFrameSlot()
+        if frame_source is not None and offpage:
+            frame_source.set_paused(True)
+        self._frame = None
+        self._image = None
+        self._frame_time = 0.0
+        # 最初のフレームを表示した時刻（time.perf_counter、起動時間の計測用）
+        self.first_frame_at = None
+        self.capture = None
+        self.snapshot_tap = None
+        self.recorder = None
+        # 直近のフレームを保持するリプレイリング（ReplayBuffer、全画面表示でスクラブ）
+        self.replay = None
+        self.thread = None
+        if frame_source is None:
+            # 一時停止中はstandby（warm: セッション維持 / release: 切断）に従う
+            self.capture = CaptureLoop(ip, user, password, port, self, SlotSink(self.frame_slot, self.ip),
+                                       self.pipeline, self.pacing, self.connection, low_latency, standby, motion,
+                                       metrics=self.metrics, profile=profile, url=source_url)
+            # スクショ用: 要求があった時だけ次の生フレームをコピー
+            self.snapshot_tap = SnapshotTap(self.pipeline)
+            self.capture.taps.append(self.snapshot_tap)
+            self.thread = threading.Thread(target=self.capture.run, daemon=True)
+            if autostart:
+                self.thread.start()
+
+    def start(self):
+        if self.thread is not None and self.thread.ident is None:
+            self.thread.start()
 
     def set_paused(self, paused: bool):
         self._paused = paused
+        self._update_source_paused()
+
+    def set_offpage(self, offpage, standby=None):
+        # ページ切替: ページ外のカメラは表示用の処理をせず、standby（release/warm/prewarm）に従う
+        self._offpage = offpage
+        self._offpage_standby = standby
+        self._update_source_paused()
+
+    def _update_source_paused(self):
+        if self.frame_source is not None:
+            self.frame_source.set_paused(self.is_paused(), self.standby_mode())
 
     def set_force_stream(self, stream):
         self._force_stream = stream
+        if self.frame_source is not None:
+            self.frame_source.set_stream(self.get_current_stream())
 
     def get_current_stream(self):
         return self._force_stream if self._force_stream else self.stream
 
-    def update_frame(self):
-        import weakref
-        self_ref = weakref.ref(self)
-        while not self._stop:
-            if getattr(self, '_paused', False):
-                time.sleep(0.1)
-                continue
-            stream = self.get_current_stream()
-            auth = f"{self.user}:{self.password}@" if self.user and self.password else ''
-            url = f"rtsp://{auth}{self.ip}:{self.port}/{stream}"
-            cap = cv2.VideoCapture(url)
-            while not self._stop and not getattr(self, '_paused', False):
-                # stream切替要求があればbreak
-                if self._force_stream and self._force_stream != stream:
-                    break
-                ret, frame = cap.read()
-                if ret:
-                    if self.flip_h:
-                        frame = cv2.flip(frame, 1)
-                    if self.flip_v:
-                        frame = cv2.flip(frame, 0)
-                    # カメラ名を左上に白文字＋黒背景で描画（日本語対応）
-                    if self.name:
-                        try:
-                            from PIL import ImageFont, ImageDraw, Image
-                            import numpy as np
-                            pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                            font_path = "C:/Windows/Fonts/msgothic.ttc"
-                            font = ImageFont.truetype(font_path, 28)
-                            draw = ImageDraw.Draw(pil_img)
-                            text_size = draw.textbbox((0,0), self.name, font=font)
-                            x0, y0, x1, y1 = text_size
-                            draw.rectangle([8, 3, 8 + (x1-x0) + 8, 3 + (y1-y0) + 8], fill=(0,0,0,200))
-                            draw.text((12, 7), self.name, font=font, fill=(255,255,255))
-                            frame = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-                        except Exception as e:
-                            cv2.putText(frame, self.name, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255,255,255), 2, cv2.LINE_AA)
-                    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    h, w, ch = rgb.shape
-                    img = QtGui.QImage(rgb.data, w, h, ch * w, QtGui.QImage.Format_RGB888)
-                    pix = QtGui.QPixmap.fromImage(img)
-                    widget = self_ref()
-                    if widget is not None:
-                        widget.setPixmap(pix.scaled(widget.width(), widget.height(), QtCore.Qt.KeepAspectRatio))
-                else:
-                    widget = self_ref()
-                    if widget is not None:
-                        widget.setText(f"{self.ip}\n取得失敗")
-                time.sleep(1/20)
-            cap.release()
+    def set_full_resolution(self, enable):
+        # 全画面表示中などはワーカー内での縮小を止める
+        self._full_resolution = enable
+        self._update_source_target()
+
+    def target_size(self):
+        return None if self._full_resolution else self._target_size
+
+    def _update_source_target(self):
+        if self.frame_source is not None:
+            self.frame_source.set_target_size(self.target_size())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        ratio = self.devicePixelRatioF()
+        self.set_tile_size(int(self.width() * ratio), int(self.height() * ratio))
+
+    def tile_size(self):
+        return self._target_size
+
+    def set_tile_size(self, width, height):
+        # タイルの物理ピクセルサイズ（コンポジタ表示時はGridCompositorから渡される）
+        if self._target_size == (width, height):
+            return
+        self._target_size = (width, height)
+        self._update_source_target()
+        if self.auto_stream:
+            # レイアウト確定前の連続リサイズで再接続しないよう遅延させる
+            self._stream_timer.start(500)
+
+    def _apply_auto_stream(self):
+        if self._target_size is None:
+            return
+        stream = choose_stream(self._target_size[0], self._target_size[1], self.stream_sizes)
+        if stream != self.stream:
+            self.stream = stream
+            if self.frame_source is not None:
+                self.frame_source.set_stream(self.get_current_stream())
+
+    @property
+    def dropped_frames(self):
+        return self.frame_slot.dropped
+
+    def refresh_display(self):
+        # GUIスレッドから表示レートで呼ばれる。最新フレームのみQImage化（コピーなし）
+        # 表示内容が変わったらTrue（コンポジタはそのタイルだけ再描画する）
+        dirty = False
+        if self.motion_highlight and self.frame_slot.motion_active != self._motion_shown:
+            self._motion_shown = self.frame_slot.motion_active
+            self.update()
+            dirty = True
+        changed, status = self.frame_slot.take_status()
+        if changed and status:
+            self._frame = None
+            self._image = None
+            self.setText(status)
+            dirty = True
+        item = self.frame_slot.take()
+        if item is None:
+            return dirty
+        rgb, self._frame_time, _ = item
+        if self.first_frame_at is None:
+            self.first_frame_at = time.perf_counter()
+        self.metrics.frame_displayed()
+        h, w, ch = rgb.shape
+        # QImageはrgbのバッファを参照するため、_frameで参照を保持しておく
+        self._frame = rgb
+        self._image = QtGui.QImage(rgb.data, w, h, rgb.strides[0], QtGui.QImage.Format_RGB888)
+        self.update()
+        self.frame_changed.emit()
+        return True
+
+    def current_image(self):
+        return self._image
+
+    def current_pixmap(self):
+        # 全画面表示など、QPixmapが必要な箇所向け
+        if self._image is None:
+            return None
+        return QtGui.QPixmap.fromImage(self._image)
+
+    def paintEvent(self, event):
+        if self._image is None:
+            super().paintEvent(event)
+            return
+        painter = QtGui.QPainter(self)
+        self.paint_tile(painter, self.rect())
+        painter.end()
+
+    def paint_tile(self, painter, rect):
+        # rect内にアスペクト比を保って描画（自身のpaintEventとGridCompositorの両方から使う）
+        size = self._image.size().scaled(rect.size(), QtCore.Qt.KeepAspectRatio)
+        x = rect.x() + (rect.width() - size.width()) // 2
+        y = rect.y() + (rect.height() - size.height()) // 2
+        start = time.perf_counter()
+        painter.drawImage(QtCore.QRect(x, y, size.width(), size.height()), self._image)
+        self.metrics.record('paint', time.perf_counter() - start)
+        if self.motion_highlight and self._motion_shown:
+            pen = QtGui.QPen(QtGui.QColor(255, 140, 0))
+            pen.setWidth(3)
+            painter.setPen(pen)
+            painter.drawRect(QtCore.QRect(x + 1, y + 1, size.width() - 3, size.height() - 3))
+        if self.low_latency and self.latency_drift_ms is not None:
+            # 遅延の変動（受信時刻とPTSの差の、最小値からの増加分）を右下に表示
+            text = f"遅延変動 +{self.latency_drift_ms:.0f}ms"
+            text_rect = QtCore.QRect(x, y, size.width() - 6, size.height() - 4)
+            painter.setPen(QtGui.QColor(0, 0, 0))
+            painter.drawText(text_rect.translated(1, 1), QtCore.Qt.AlignRight | QtCore.Qt.AlignBottom, text)
+            painter.setPen(QtGui.QColor(255, 255, 0))
+            painter.drawText(text_rect, QtCore.Qt.AlignRight | QtCore.Qt.AlignBottom, text)
+        if self.show_metrics:
+            self._paint_metrics(painter, x, y)
+
+    def _paint_metrics(self, painter, x, y):
+        # デバッグ表示: 左上に半透明の背景でメトリクスを描く
+        lines = self.metrics.overlay_lines()
+        font = painter.font()
+        font.setPointSize(9)
+        painter.setFont(font)
+        fm = painter.fontMetrics()
+        box = QtCore.QRect(x + 4, y + 4, max(fm.horizontalAdvance(line) for line in lines) + 8,
+                           fm.height() * len(lines) + 6)
+        painter.fillRect(box, QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtGui.QColor(0, 255, 128))
+        for i, line in enumerate(lines):
+            painter.drawText(box.x() + 4, box.y() + 3 + fm.ascent() + i * fm.height(), line)
+
+    def set_show_metrics(self, show):
+        self.show_metrics = show
+        self.update()
+
+    def _collect_metrics(self, metrics):
+        # エクスポータ・デバッグ表示の直前に呼ばれ、キュー深さ・欠落数などを反映する
+        if self.frame_source is not None:
+            self.frame_source.read_metrics(metrics)
+        depth = self.frame_slot.pending()
+        dropped = self.frame_slot.dropped
+        recorder = self.recorder
+        if recorder is not None:
+            depth += recorder.queue_depth()
+            dropped += recorder.dropped
+        metrics.queue_depth = depth
+        metrics.dropped = dropped
+
+    def is_stopped(self):
+        return self._stop
+
+    def is_paused(self):
+        return self._paused or self._offpage
+
+    def needs_taps(self):
+        # 録画中は一時停止中（全画面表示中の他カメラ・ページ外）も録画へフレームを渡し続ける
+        recorder = self.recorder
+        return recorder is not None and recorder.needs_frames()
+
+    def standby_mode(self):
+        # ページ外のカメラは一時停止の扱いを上書き（表示中のカメラの全画面表示中の一時停止はカメラの既定）
+        return self._offpage_standby if self._offpage else None
+
+    @property
+    def latency_drift_ms(self):
+        return self.capture.latency_drift_ms if self.capture is not None else None
 
     def close(self):
         self._stop = True
+        self.detach_recorder()
+        self.detach_replay()
+
+    def join_timeout(self):
+        # 停止要求からキャプチャスレッドが終了するまでの最大時間（オープン中・読み取り中の長い方+1秒）
+        return max(self.connection.open_timeout_ms, self.connection.read_timeout_ms) / 1000.0 + 1.0
+
+    def join(self, timeout=None):
+        # キャプチャスレッドの終了を待つ（既定はjoin_timeout()まで、0で待たずに確認）。終了したらTrue
+        if self.thread is None or self.thread.ident is None:
+            return True
+        self.thread.join(self.join_timeout() if timeout is None else timeout)
+        return not self.thread.is_alive()
+
+    def reconfigure(self, name, flip_h, flip_v, crop, stream_sizes, auto_stream, onvif_port):
+        # 接続を維持したまま反映できる設定（パイプラインは次のフレームで組み立て直される）
+        self.name = name
+        self.flip_h = flip_h
+        self.flip_v = flip_v
+        self.pipeline.configure(flip_h, flip_v, name, crop)
+        self.metrics.name = name or self.ip
+        self.stream_sizes = stream_sizes
+        self.auto_stream = auto_stream
+        if auto_stream:
+            self._stream_timer.start(0)
+        self.onvif_port = onvif_port
+        if self._image is None:
+            self.setText(f"{self.name}\n接続中...")
+        self.update()
 
     def mouseDoubleClickEvent(self, event):
         if event.button() == QtCore.Qt.LeftButton:
             self.parent().parent().show_camera_fullscreen(self)
         super().mouseDoubleClickEvent(event)
 
+    def attach_recorder(self, recorder):
+        # 録画はスレッド方式のみ（プロセス方式ではフレームがワーカープロセス内にあるため）
+        if self.capture is None:
+            return False
+        self.detach_recorder()
+        self.recorder = recorder
+        self.capture.taps.append(recorder.feed)
+        return True
+
+    def detach_recorder(self):
+        if self.recorder is None:
+            return
+        self.recorder.stop()
+        if self.capture is not None and self.recorder.feed in self.capture.taps:
+            self.capture.taps.remove(self.recorder.feed)
+        self.recorder = None
+
+    def attach_replay(self, replay):
+        # リプレイもスレッド方式のみ（録画と同じく生フレームがワーカープロセス内にあるため）
+        if self.capture is None:
+            replay.pool.remove(replay)
+            return False
+        self.detach_replay()
+        self.replay = replay
+        self.capture.taps.append(replay)
+        return True
+
+    def detach_replay(self):
+        if self.replay is None:
+            return
+        if self.capture is not None and self.replay in self.capture.taps:
+            self.capture.taps.remove(self.replay)
+        self.replay.pool.remove(self.replay)
+        self.replay = None
+
+    def snapshot_source(self):
+        # スクショ元: スレッド方式は生フレーム、プロセス方式は表示用の最新フレーム
+        return self.snapshot_tap if self.snapshot_tap is not None else self.frame_slot
+
+    def is_recording(self):
+        return self.recorder is not None and self.recorder.recording
+
+    def ptz(self):
+        # Tapo C200 PTZ制御（ONVIF利用）。セッションとコマンドキューはカメラ毎に使い回す
+        return get_ptz_controller(self.ip, self.onvif_port, self.user, self.password)
+
     def send_ptz_command(self, direction):
-    # Tapo C200 PTZ制御（ONVIF利用）
+        # 送信はバックグラウンドで行い、連続クリックは1回の移動にまとめる
+        try:
+            self.ptz().step(direction)
+            return True
+        except Exception as e:
+            print(f"PTZコマンド送信失敗: {e}")
+            return False
+
+    def start_ptz_move(self, direction):
+        try:
+            self.ptz().start(direction)
+            return True
+        except Exception as e:
+            print(f"PTZコマンド送信失敗: {e}")
+            return False
+
+    def stop_ptz_move(self):
         try:
-            from onvif import ONVIFCamera
-            ip = self.ip
-            user = self.user
-            password = self.password
-            onvif_port = 2020  # Tapo C200のONVIFデフォルトポート
-            camera = ONVIFCamera(ip, onvif_port, user, password)
-            media = camera.create_media_service()
-            ptz = camera.create_ptz_service()
-            media_profile = media.GetProfiles()[0]
-            token = media_profile.token
-            # 現在位置取得
-            status = ptz.GetStatus({'ProfileToken': token})
-            pos = status.Position
-            x = pos.PanTilt.x if pos and pos.PanTilt else 0
-            y = pos.PanTilt.y if pos and pos.PanTilt else 0
-            # 移動量
-            step = 0.1
-            if direction == 'up':
-                y += step
-            elif direction == 'down':
-                y -= step
-            elif direction == 'left':
-                x += step  # ←左右を反転
-            elif direction == 'right':
-                x -= step  # ←左右を反転
-            # 範囲制限（-1.0～1.0）
-            x = max(-1.0, min(1.0, x))
-            y = max(-1.0, min(1.0, y))
-            req = ptz.create_type('AbsoluteMove')
-            req.ProfileToken = token
-            req.Position = {'PanTilt': {'x': x, 'y': y}}
-            ptz.AbsoluteMove(req)
+            self.ptz().stop()
             return True
         except Exception as e:
             print(f"PTZコマンド送信失敗: {e}")
             return False
 
+def camera_specs(settings, use_restream=True):
+    # 有効なカメラの設定（ip → dict、設定の並び順）。差分反映の比較・配信サーバでも使う
+    # use_restream: [General] restream_source（配信サーバ経由で受信）を使うか（配信サーバ自身はFalse）
+    general = settings.get_general()
+    restream = general.get('restream_source', '').strip() if use_restream else ''
+    specs = {}
+    for ip, v in settings.get_cameras().items():
+        name, flip_h, flip_v, enable, user, password, port = v
+        if enable != '1':
+            continue
+        motion = settings.get_motion_options(ip)
+        specs[ip] = dict(
+            ip=ip, user=user, password=password, port=port, flip_h=flip_h == '1', flip_v=flip_v == '1',
+            name=name, low_latency=settings.get_low_latency(ip),
+            crop=settings.get_crop(ip),
+            stream_sizes=settings.get_stream_sizes(ip),
+            auto_stream=settings.get_auto_stream(),
+            onvif_port=settings.get_onvif_port(ip),
+            standby=general.get('standby', STANDBY_WARM),
+            profile=settings.get_camera_profile(ip),
+            motion=motion,
+            motion_highlight=motion is not None and general.get('motion_highlight', '1') == '1',
+            connection=ConnectionSupervisor.options_from_settings(settings),
+            source_url=restream_source_url(restream, ip) if restream else None,
+        )
+        if restream:
+            # 配信サーバは1ストリームのみ配信するため、ストリームの自動切替はしない
+            specs[ip]['auto_stream'] = False
+    return specs
+
+# 設定変更時にカメラを作り直す項目（それ以外は実行中のカメラへそのまま反映）
+RESTART_KEYS = ('user', 'password', 'port', 'low_latency', 'standby', 'profile', 'motion', 'motion_highlight', 'connection',
+                'source_url')
+HOT_KEYS = ('name', 'flip_h', 'flip_v', 'crop', 'stream_sizes', 'auto_stream', 'onvif_port')
+
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    # スクショ保存完了（ワーカースレッドから通知）
+    snapshot_saved = QtCore.pyqtSignal(object)
+
+    def __init__(self, settings=None):
         super().__init__()
         self.setWindowTitle('イーサネットIPカメラマルチビューア')
-        self.settings = Settings()
+        self.settings = settings if settings is not None else Settings()
+        # 起動処理: ウィンドウを先に表示し（各タイルは「接続待ち」）、表示後に並び順で接続を始める
+        self.shown_at = None
+        self.pacing = PacingScheduler.from_settings(self.settings)
+        self.decode_backend = None
+        self.reconnect_gate = ReconnectGate.from_settings(self.settings)
+        # 停止要求を出したがキャプチャスレッドがまだ終了していないカメラ。終了するまで同じカメラの後継は接続しない
+        self.retiring = []
+        self._reload_pending = False
+        self.retire_timer = QtCore.QTimer(self)
+        self.retire_timer.timeout.connect(self.poll_retiring)
+        self.snapshots = SnapshotService.from_settings(self.settings)
+        self.snapshot_saved.connect(self.on_snapshot_saved)
+        # カメラ毎の実行時メトリクス（タイル上のデバッグ表示・CSV/JSONログ・Prometheus形式のHTTPエンドポイント）
+        self.metrics = MetricsRegistry()
+        self.metrics_exporters = start_metrics_exporters(self.metrics, self.settings)
+        self.show_metrics = self.settings.get_general().get('metrics_overlay', '0') == '1'
+        # ページ切替（[General] page_size）。表示中のページのカメラだけデコードする
+        self.pager = WallPager.from_settings(self.settings)
+        # インスタントリプレイ（[General] replay_seconds）。全カメラでメモリ上限を共有する
+        self.replay = ReplayPool.from_settings(self.settings)
         self.init_ui()
         QtCore.QTimer.singleShot(100, self.showFullScreen)
 
@@ -178,56 +500,421 @@ class MainWindow(QtWidgets.QMainWindow):
         self.close_btn.setStatusTip('アプリを終了')
         self.close_btn.clicked.connect(self.close)
 
+    # スクショボタン（全カメラ同時）
+        self.snapshot_btn = QtWidgets.QToolButton(self)
+        self.snapshot_btn.setText('スクショ')
+        self.snapshot_btn.setFixedHeight(btn_size.height())
+        self.snapshot_btn.setToolTip('表示中の全カメラを同時に撮影（保存先は設定のsave_dir）')
+        self.snapshot_btn.setStatusTip('表示中の全カメラを同時に撮影')
+        self.snapshot_btn.clicked.connect(self.take_snapshot)
+
+    # 統計表示ボタン（タイル上のデバッグ表示の切替、F3でも切替）
+        self.metrics_btn = QtWidgets.QToolButton(self)
+        self.metrics_btn.setText('統計')
+        self.metrics_btn.setCheckable(True)
+        self.metrics_btn.setChecked(self.show_metrics)
+        self.metrics_btn.setFixedHeight(btn_size.height())
+        self.metrics_btn.setToolTip('各カメラのfps・処理時間・欠落数などを表示（F3）')
+        self.metrics_btn.setStatusTip('各カメラのfps・処理時間・欠落数などを表示')
+        self.metrics_btn.toggled.connect(self.set_show_metrics)
+        QtWidgets.QShortcut(QtGui.QKeySequence('F3'), self, activated=self.metrics_btn.toggle)
+
+    # ページ切替（前/次ページ・ページ番号・自動巡回、PageUp/PageDownでも切替）。1ページのみの時は非表示
+        self.prev_page_btn = QtWidgets.QToolButton(self)
+        self.prev_page_btn.setText('◀')
+        self.prev_page_btn.setFixedHeight(btn_size.height())
+        self.prev_page_btn.setToolTip('前のページ（PageUp）')
+        self.prev_page_btn.clicked.connect(lambda: self.show_page(self.pager.next_page(-1)))
+        self.page_label = QtWidgets.QLabel()
+        self.page_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.page_label.setMinimumWidth(48)
+        self.next_page_btn = QtWidgets.QToolButton(self)
+        self.next_page_btn.setText('▶')
+        self.next_page_btn.setFixedHeight(btn_size.height())
+        self.next_page_btn.setToolTip('次のページ（PageDown）')
+        self.next_page_btn.clicked.connect(lambda: self.show_page(self.pager.next_page()))
+        self.tour_btn = QtWidgets.QToolButton(self)
+        self.tour_btn.setText('巡回')
+        self.tour_btn.setCheckable(True)
+        self.tour_btn.setChecked(self.pager.tour_seconds > 0)
+        self.tour_btn.setFixedHeight(btn_size.height())
+        self.tour_btn.setToolTip('ページを自動で切り替える（間隔は設定のpage_tour_seconds）')
+        self.tour_btn.toggled.connect(self.schedule_tour)
+        QtWidgets.QShortcut(QtGui.QKeySequence('PgUp'), self, activated=self.prev_page_btn.click)
+        QtWidgets.QShortcut(QtGui.QKeySequence('PgDown'), self, activated=self.next_page_btn.click)
+        # 巡回: 切替の少し前に次のページを動かし始める（prewarm_timer）
+        self.tour_timer = QtCore.QTimer(self)
+        self.tour_timer.setSingleShot(True)
+        self.tour_timer.timeout.connect(lambda: self.show_page(self.pager.next_page()))
+        self.prewarm_timer = QtCore.QTimer(self)
+        self.prewarm_timer.setSingleShot(True)
+        self.prewarm_timer.timeout.connect(self.prewarm_next_page)
+
         # 蜿ｳ荳翫↓繧ｦ繧｣繝ｳ繝峨え繝｢繝ｼ繝峨�ｻ髢峨§繧九�懊ち繝ｳ繧呈ｨｪ荳ｦ縺ｳ縺ｧ驟咲ｽｮ
         right_widget = QtWidgets.QWidget()
         right_layout = QtWidgets.QHBoxLayout(right_widget)
         right_layout.setContentsMargins(0,0,0,0)
         right_layout.setSpacing(0)
+        right_layout.addWidget(self.prev_page_btn)
+        right_layout.addWidget(self.page_label)
+        right_layout.addWidget(self.next_page_btn)
+        right_layout.addWidget(self.tour_btn)
+        right_layout.addWidget(self.metrics_btn)
+        right_layout.addWidget(self.snapshot_btn)
         right_layout.addWidget(self.window_btn)
         right_layout.addWidget(self.close_btn)
         menubar.setCornerWidget(right_widget, QtCore.Qt.TopRightCorner)
 
         self.cam_widgets = []
+        self.visible_widgets = []
         self.cam_area = QtWidgets.QWidget()
         self.grid_layout = QtWidgets.QGridLayout(self.cam_area)
         self.grid_layout.setSpacing(4)
+        # 全タイルを1つのウィジェットでまとめて描画（[General] compositor=0 でカメラ毎のウィジェット表示）
+        self.compositor = GridCompositor(spacing=4)
+        self.compositor.tile_double_clicked.connect(self.show_camera_fullscreen)
+        self.compositor.hide()
+        self.use_compositor = False
         self.setCentralWidget(self.cam_area)
         self.load_cameras()
+        # 表示更新タイマー（画面のリフレッシュレートで最新フレームのみ描画）
+        self.display_timer = QtCore.QTimer(self)
+        self.display_timer.timeout.connect(self.refresh_cameras)
+        self.display_timer.start(self.display_interval_ms())
 
-    def load_cameras(self):
-    # 既存ウィジェット削除
-        for w in self.cam_widgets:
+    def display_interval_ms(self):
+        screen = QtWidgets.QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 60.0
+        if not rate or rate <= 0:
+            rate = 60.0
+        return max(1, int(1000 / rate))
+
+    def refresh_cameras(self):
+        if self.use_compositor:
+            self.compositor.refresh()
+            return
+        for w in self.visible_widgets:
+            w.refresh_display()
+
+    @staticmethod
+    def needs_restart(old, new):
+        # 接続に関わる設定（ユーザー・パスワード・ポート・プロファイル等）が変わったか
+        for key in RESTART_KEYS:
+            a, b = old.get(key), new.get(key)
+            if key == 'profile':
+                a = a.to_options() if a is not None else None
+                b = b.to_options() if b is not None else None
+            if a != b:
+                return True
+        return False
+
+    def create_camera_widget(self, spec, offpage=False):
+        ip = spec['ip']
+        widget = CameraWidget(ip, spec['user'], spec['password'], spec['port'], spec['flip_h'], spec['flip_v'], spec['name'],
+                              stream='stream2', low_latency=spec['low_latency'], pacing=self.pacing,
+                              frame_source=self.decode_backend.ring(ip) if self.decode_backend else None,
+                              stream_sizes=spec['stream_sizes'], auto_stream=spec['auto_stream'],
+                              crop=spec['crop'],
+                              connection=ConnectionSupervisor(gate=self.reconnect_gate, **spec['connection']),
+                              standby=spec['standby'],
+                              onvif_port=spec['onvif_port'],
+                              motion=MotionDetector(**spec['motion']) if spec['motion'] else None,
+                              motion_highlight=spec['motion_highlight'],
+                              profile=spec['profile'], offpage=offpage, source_url=spec['source_url'],
+                              autostart=False)
+        widget.spec = spec
+        self.metrics.add(widget.metrics)
+        widget.set_show_metrics(self.show_metrics)
+        # 事前バッファ付き録画の場合は常時フレームを受け取る
+        if float(self.settings.get_general().get('record_pre_event_seconds', '0') or 0) > 0:
+            widget.attach_recorder(self.create_recorder(widget))
+        if self.replay is not None:
+            widget.attach_replay(self.replay.buffer(ip, widget.pipeline))
+        return widget
+
+    def shutdown_cameras(self, widgets, wait=False):
+        # 停止要求を全台に出す。GUIスレッドでは待たず、終了はpoll_retiringで確認して破棄する
+        # （wait=Trueは終了時用で、各スレッドの終了をjoin_timeout()まで待つ）
+        for w in widgets:
             w.close()
             self.grid_layout.removeWidget(w)
-            w.deleteLater()
-        self.cam_widgets.clear()
-    # ONのカメラのみリスト化
-        cam_data = []
-        for ip, v in self.settings.get_cameras().items():
-            name, flip_h, flip_v, enable, user, password, port = v
-            if enable != '1':
+            w.hide()
+            self.metrics.remove(w.ip)
+            w.retire_deadline = time.monotonic() + w.join_timeout()
+        self.retiring.extend(widgets)
+        if wait:
+            for w in self.retiring:
+                if not w.join(max(0.0, (w.retire_deadline or 0.0) - time.monotonic())):
+                    print(f"{w.name or w.ip}: キャプチャスレッドが時間内に終了しませんでした")
+                    w.retire_deadline = None
+        if self.reap_retiring() and not self.retire_timer.isActive():
+            self.retire_timer.start(100)
+
+    def poll_retiring(self):
+        # 旧スレッドが全て終了したら、待っていた後継のカメラを接続する（または全体を作り直す）
+        if self.reap_retiring():
+            return
+        self.retire_timer.stop()
+        if self._reload_pending:
+            self._reload_pending = False
+            self.load_cameras()
+        else:
+            self.start_cameras()
+
+    def reap_retiring(self):
+        # 終了したキャプチャスレッドのカメラを破棄する。まだ終了していないカメラがあればTrue
+        alive = []
+        for w in self.retiring:
+            if w.join(0):
+                w.deleteLater()
                 continue
-            cam_data.append((ip, user, password, port, flip_h == '1', flip_v == '1', name))
-        n = len(cam_data)
+            if w.retire_deadline is not None and time.monotonic() > w.retire_deadline:
+                print(f"{w.name or w.ip}: キャプチャスレッドが時間内に終了しませんでした（終了を待って後継を接続します）")
+                w.retire_deadline = None
+            alive.append(w)
+        self.retiring = alive
+        return bool(alive)
+
+    def layout_cameras(self):
+        # 分割数計算（例: 2→1x2, 4→2x2, 5→2x3, 9→3x3）。ページ切替時は1ページのタイル数で計算
+        import math
+        general = self.settings.get_general()
+        self.use_compositor = general.get('compositor', '1') == '1'
+        self.compositor.clear()
+        for w in self.cam_widgets:
+            self.grid_layout.removeWidget(w)
+            w.hide()
+        if self.use_compositor:
+            self.grid_layout.addWidget(self.compositor, 0, 0)
+            self.compositor.show()
+        else:
+            self.grid_layout.removeWidget(self.compositor)
+            self.compositor.hide()
+        self.pager.set_count(len(self.cam_widgets))
+        self.visible_widgets = [self.cam_widgets[i] for i in self.pager.indices()]
+        self.apply_page_state()
+        self.update_page_controls()
+        self.schedule_tour()
+        n = self.pager.tiles_per_page()
         if n == 0:
             return
-    # 分割数計算（例: 2→1x2, 4→2x2, 5→2x3, 9→3x3）
-        import math
         cols = math.ceil(math.sqrt(n))
         rows = math.ceil(n / cols)
-    # グリッドに追加
-        for idx, (ip, user, password, port, flip_h, flip_v, name) in enumerate(cam_data):
-            widget = CameraWidget(ip, user, password, port, flip_h, flip_v, name, stream='stream2')
-            row = idx // cols
-            col = idx % cols
-            self.grid_layout.addWidget(widget, row, col)
-            self.cam_widgets.append(widget)
+        if self.use_compositor:
+            self.compositor.set_cameras(self.visible_widgets, cols, rows)
+            return
+        for idx, w in enumerate(self.visible_widgets):
+            w.setParent(self.cam_area)
+            self.grid_layout.addWidget(w, idx // cols, idx % cols)
+            w.show()
+
+    def apply_page_state(self):
+        # ページ外のカメラは一時停止（[General] page_standby に従う）。巡回の事前起動もここで戻る
+        # 接続の順番は表示中のページの左上から
+        visible = set(self.visible_widgets)
+        order = self.visible_widgets + [w for w in self.cam_widgets if w not in visible]
+        for rank, w in enumerate(order):
+            w.connection.priority = rank
+            w.set_offpage(w not in visible, self.pager.standby)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.shown_at is None:
+            self.shown_at = time.perf_counter()
+            # 最初の描画を先に済ませてから接続・事前読み込みを始める
+            QtCore.QTimer.singleShot(0, self.start_cameras)
+            QtCore.QTimer.singleShot(0, preload_optional)
+
+    def start_cameras(self):
+        # 未接続のカメラのキャプチャスレッドを並び順に開始（同時接続数はReconnectGateで制限）
+        # 同じカメラの旧スレッドが終了していなければ、終了後（poll_retiring）に開始する
+        if self.shown_at is None:
+            return
+        busy = {w.ip for w in self.retiring}
+        for w in sorted(self.cam_widgets, key=lambda w: w.connection.priority):
+            if w.ip not in busy:
+                w.start()
+
+    def update_page_controls(self):
+        paged = self.pager.page_count > 1
+        for w in (self.prev_page_btn, self.page_label, self.next_page_btn, self.tour_btn):
+            w.setVisible(paged)
+        self.page_label.setText(f"{self.pager.page + 1}/{self.pager.page_count}")
+        self.tour_btn.setEnabled(self.pager.tour_seconds > 0)
+
+    def show_page(self, page):
+        if self.pager.page_count <= 1:
+            return
+        self.pager.set_page(page)
+        self.layout_cameras()
+
+    def schedule_tour(self):
+        self.tour_timer.stop()
+        self.prewarm_timer.stop()
+        if not self.tour_btn.isChecked() or self.pager.page_count <= 1 or self.pager.tour_seconds <= 0:
+            return
+        self.tour_timer.start(int(self.pager.tour_seconds * 1000))
+        delay = self.pager.prewarm_delay()
+        if delay is not None:
+            self.prewarm_timer.start(int(delay * 1000))
+
+    def prewarm_next_page(self):
+        # 次に表示するページのカメラを切替前に接続し（切替まではgrab()のみ）、切替直後から映像を表示できるようにする
+        # （分割数はページによらず同じなので、表示中のタイルと同じサイズで縮小させる）
+        size = self.visible_widgets[0].tile_size() if self.visible_widgets else None
+        for idx in self.pager.indices(self.pager.next_page()):
+            w = self.cam_widgets[idx]
+            if size is not None:
+                w.set_tile_size(*size)
+            w.set_offpage(True, STANDBY_PREWARM)
+
+    def load_cameras(self):
+        # 全カメラを作り直す（起動時・プロセス方式の設定変更時）
+        self.compositor.clear()
+        self.shutdown_cameras(self.cam_widgets)
+        self.cam_widgets = []
+        self.metrics.clear()
+        if self.decode_backend is not None:
+            self.decode_backend.close()
+            self.decode_backend = None
+        if self.retiring:
+            # 旧キャプチャスレッドが全て終了してから作り直す（プロセス方式のワーカーは作成時に接続を始めるため）
+            self._reload_pending = True
+            self.layout_cameras()
+            return
+        specs = camera_specs(self.settings)
+        self.pager.set_count(len(specs))
+        visible = set(self.pager.indices())
+        general = self.settings.get_general()
+        # [General] backend=process の場合はワーカープロセスでデコード（多台数向け）
+        if specs and general.get('backend', 'thread') == 'process':
+            backend_specs = [dict(ip=ip, user=s['user'], password=s['password'], port=s['port'],
+                                  priority=idx if idx in visible else len(specs) + idx,
+                                  flip_h=s['flip_h'], flip_v=s['flip_v'], name=s['name'],
+                                  fps=self.settings.get_fps(ip), crop=s['crop'], connection=s['connection'],
+                                  standby=s['standby'], motion=s['motion'], idle_fps=self.pacing.idle_fps,
+                                  profile=s['profile'], source_url=s['source_url'])
+                             for idx, (ip, s) in enumerate(specs.items())]
+            workers = int(general.get('workers', '0') or 0)
+            self.decode_backend = ProcessDecodeBackend(backend_specs, workers=workers, max_reconnects=self.reconnect_gate.limit)
+        self.cam_widgets = [self.create_camera_widget(spec, offpage=idx not in visible)
+                            for idx, spec in enumerate(specs.values())]
+        self.layout_cameras()
+        self.start_cameras()
+
+    def apply_camera_settings(self):
+        # 設定の差分だけを反映する。変更の無いカメラは接続を維持し、名前・反転・切り出し等は
+        # 実行中のパイプラインへ反映、接続に関わる設定が変わったカメラだけ作り直す
+        general = self.settings.get_general()
+        if self.decode_backend is not None or general.get('backend', 'thread') == 'process':
+            # プロセス方式はワーカー内のパイプラインを変更できないため全体を作り直す
+            self.load_cameras()
+            return
+        specs = camera_specs(self.settings)
+        self.pager.set_count(len(specs))
+        visible = set(self.pager.indices())
+        current = {w.ip: w for w in self.cam_widgets}
+        replaced = [w for ip, w in current.items() if ip not in specs or self.needs_restart(w.spec, specs[ip])]
+        self.shutdown_cameras(replaced)
+        widgets = []
+        for idx, (ip, spec) in enumerate(specs.items()):
+            w = current.get(ip)
+            if w is None or w in replaced:
+                w = self.create_camera_widget(spec, offpage=idx not in visible)
+            else:
+                w.reconfigure(**{key: spec[key] for key in HOT_KEYS})
+                w.spec = spec
+            widgets.append(w)
+        self.cam_widgets = widgets
+        self.layout_cameras()
+        self.start_cameras()
+
+    def set_show_metrics(self, show):
+        self.show_metrics = show
+        for w in self.cam_widgets:
+            w.set_show_metrics(show)
+        self.compositor.update()
+
+    def restart_metrics_exporters(self):
+        for exporter in self.metrics_exporters:
+            exporter.close()
+        self.metrics_exporters = start_metrics_exporters(self.metrics, self.settings)
+
+    def restart_replay(self):
+        # リプレイの設定が変わった時だけ作り直す（変わらなければ保持中の履歴を残す）
+        replay = ReplayPool.from_settings(self.settings)
+        current = self.replay.config() if self.replay is not None else None
+        if (replay.config() if replay is not None else None) == current:
+            if replay is not None:
+                replay.close()
+            return
+        for w in self.cam_widgets:
+            w.detach_replay()
+        if self.replay is not None:
+            self.replay.close()
+        self.replay = replay
+        if replay is not None:
+            for w in self.cam_widgets:
+                w.attach_replay(replay.buffer(w.ip, w.pipeline))
+
+    def create_recorder(self, cam_widget):
+        name = cam_widget.name or cam_widget.ip
+        fps = self.settings.get_fps(cam_widget.ip)
+        if cam_widget.spec.get('source_url'):
+            # 配信サーバ経由で受信している場合はカメラへ別セッションを開かず（セッション数の上限）、受信したフレームをエンコードする
+            return Recorder.from_settings(self.settings, name, fps=fps, mode=MODE_ENCODE)
+        url = build_rtsp_url(cam_widget.ip, cam_widget.user, cam_widget.password, cam_widget.port, 'stream1')
+        return Recorder.from_settings(self.settings, name, fps=fps, url=url)
+
+    def toggle_recording(self, cam_widget):
+        if cam_widget.is_recording():
+            cam_widget.recorder.stop()
+            return False
+        if cam_widget.recorder is None and not cam_widget.attach_recorder(self.create_recorder(cam_widget)):
+            QtWidgets.QMessageBox.warning(self, '録画', 'プロセス方式（backend=process）では録画できません')
+            return False
+        cam_widget.recorder.start()
+        return True
+
+    def take_snapshot(self, burst=None, interval=None):
+        # 一時停止中でない全カメラの次のフレームを同時に取得し、エンコード・保存はバックグラウンド
+        general = self.settings.get_general()
+        if burst is None:
+            burst = int(general.get('snapshot_burst', '1') or 1)
+        if interval is None:
+            interval = float(general.get('snapshot_burst_interval', '0.5') or 0.5)
+        sources = [(w.name or w.ip, w.snapshot_source()) for w in self.visible_widgets if not w.is_paused()]
+        if not sources:
+            return
+        self.statusBar().showMessage('スクショ撮影中...')
+        self.snapshots.capture(sources, burst, interval, on_done=lambda f: self.snapshot_saved.emit(f))
+
+    def on_snapshot_saved(self, future):
+        try:
+            results = future.result()
+        except Exception as e:
+            self.statusBar().showMessage(f'スクショ保存失敗: {e}', 5000)
+            return
+        last = results[-1]
+        spread = last['spread_ms']
+        spread_text = f"（時刻差 {spread:.0f}ms）" if spread is not None else ''
+        self.statusBar().showMessage(f"スクショ保存: {last['directory']} {len(results)}枚{spread_text}", 5000)
 
     def open_settings(self):
         dlg = SettingsDialog(self.settings, self)
         if dlg.exec_():
             self.settings.load()
-            self.load_cameras()
+            # 実行中のカメラが参照しているスケジューラをそのまま更新する
+            self.pacing.update_from_settings(self.settings)
+            page = self.pager.page
+            self.pager = WallPager.from_settings(self.settings)
+            self.pager.page = page
+            self.tour_btn.setChecked(self.pager.tour_seconds > 0)
+            self.snapshots.shutdown()
+            self.snapshots = SnapshotService.from_settings(self.settings)
+            self.restart_metrics_exporters()
+            self.restart_replay()
+            self.apply_camera_settings()
     # 設定変更後の再描画等
 
     def toggle_window_mode(self):
@@ -241,48 +928,36 @@ class MainWindow(QtWidgets.QMainWindow):
             self.window_btn.setStatusTip('フルスクリーンに切替')
 
     def show_camera_fullscreen(self, cam_widget):
-        # スクロール位置制御
-        dragging = {'active': False, 'start': None, 'scroll_x': 0, 'scroll_y': 0}
-        def label_mousePressEvent(event):
-            if event.button() == QtCore.Qt.LeftButton:
-                dragging['active'] = True
-                dragging['start'] = event.globalPos()
-                dragging['scroll_x'] = scroll_area.horizontalScrollBar().value()
-                dragging['scroll_y'] = scroll_area.verticalScrollBar().value()
-                label.setCursor(QtGui.QCursor(QtCore.Qt.ClosedHandCursor))
-                event.accept()
-            else:
-                label.setCursor(QtGui.QCursor(QtCore.Qt.ArrowCursor))
-                QtWidgets.QLabel.mousePressEvent(label, event)
+        # 全画面表示中は巡回しない
+        self.tour_timer.stop()
+        self.prewarm_timer.stop()
         for w in self.cam_widgets:
             if w is not cam_widget:
                 w.set_paused(True)
         cam_widget.set_paused(False)
+        cam_widget.set_full_resolution(True)
         cam_widget.set_force_stream('stream2')
         dlg = QtWidgets.QDialog(self)
         dlg.setWindowTitle(cam_widget.name or cam_widget.ip)
         dlg.setWindowFlags(dlg.windowFlags() | QtCore.Qt.Window)
         dlg.showFullScreen()
         main_layout = QtWidgets.QHBoxLayout(dlg)
-    # スクロール対応画像表示
-        scroll_area = QtWidgets.QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
-        scroll_area.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
-        image_container = QtWidgets.QWidget()
-        image_layout = QtWidgets.QVBoxLayout(image_container)
-        image_layout.setContentsMargins(0,0,0,0)
-        image_layout.setSpacing(0)
-        label = QtWidgets.QLabel()
-        label.setAlignment(QtCore.Qt.AlignCenter)
-        label.setMinimumSize(320, 240)
-        image_layout.addWidget(label)
-        scroll_area.setWidget(image_container)
-        # サイドバーを縦長に表示するため、スクロールエリアとサイドバーをQSplitterで分割
+    # ズーム/パン対応の画像表示（表示範囲だけを元フレームから切り出して描画）
+        view = ZoomView(cam_widget)
+        # サイドバーを縦長に表示するため、画像表示とサイドバーをQSplitterで分割
         btn_size = QtCore.QSize(56, 56)
         splitter = QtWidgets.QSplitter()
         splitter.setOrientation(QtCore.Qt.Horizontal)
-        splitter.addWidget(scroll_area)
+        if cam_widget.replay is not None:
+            # 画像表示の下にリプレイのスクラブバー
+            viewer = QtWidgets.QWidget()
+            viewer_layout = QtWidgets.QVBoxLayout(viewer)
+            viewer_layout.setContentsMargins(0, 0, 0, 0)
+            viewer_layout.addWidget(view, 1)
+            viewer_layout.addWidget(ReplayBar(cam_widget.replay, view))
+            splitter.addWidget(viewer)
+        else:
+            splitter.addWidget(view)
         sidebar = QtWidgets.QWidget()
         sidebar_layout = QtWidgets.QVBoxLayout(sidebar)
         sidebar_layout.setContentsMargins(10, 40, 10, 40)
@@ -290,17 +965,6 @@ class MainWindow(QtWidgets.QMainWindow):
         splitter.addWidget(sidebar)
         splitter.setSizes([dlg.width() - 120, 120])
         main_layout.addWidget(splitter)
-        # ズーム制御
-        zoom = {'scale': 1.0}
-        def update_image():
-            pix = cam_widget.pixmap()
-            if pix and not pix.isNull():
-                orig_w = pix.width()
-                orig_h = pix.height()
-                w = int(orig_w * zoom['scale'])
-                h = int(orig_h * zoom['scale'])
-                label.setPixmap(pix.scaled(w, h, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
-                label.setFixedSize(w, h)
         # ズームイン
         zoom_in_btn = QtWidgets.QPushButton()
         zoom_in_btn.setIcon(QtGui.QIcon('icons/zoom_in.png'))
@@ -308,8 +972,7 @@ class MainWindow(QtWidgets.QMainWindow):
         zoom_in_btn.setFixedSize(btn_size)
         zoom_in_btn.setToolTip('ズームイン')
         def zoom_in():
-            zoom['scale'] = min(zoom['scale'] * 1.2, 8.0)
-            update_image()
+            view.set_zoom(view.zoom * 1.2)
         zoom_in_btn.clicked.connect(zoom_in)
         sidebar_layout.addWidget(zoom_in_btn, alignment=QtCore.Qt.AlignTop)
         # ズームアウト
@@ -319,8 +982,7 @@ class MainWindow(QtWidgets.QMainWindow):
         zoom_out_btn.setFixedSize(btn_size)
         zoom_out_btn.setToolTip('ズームアウト')
         def zoom_out():
-            zoom['scale'] = max(zoom['scale'] / 1.2, 0.2)
-            update_image()
+            view.set_zoom(view.zoom / 1.2)
         zoom_out_btn.clicked.connect(zoom_out)
         sidebar_layout.addWidget(zoom_out_btn, alignment=QtCore.Qt.AlignTop)
         # --- デフォルト（元に戻す）ボタン生成は一度だけ ---
@@ -329,8 +991,7 @@ class MainWindow(QtWidgets.QMainWindow):
         default_btn.setFixedSize(btn_size)
         default_btn.setToolTip('拡大縮小を元に戻す')
         def zoom_default():
-            zoom['scale'] = 1.0
-            update_image()
+            view.reset()
         default_btn.clicked.connect(zoom_default)
         sidebar_layout.addWidget(default_btn, alignment=QtCore.Qt.AlignTop)
         # --- サイドバー用ボタン生成（ローカル変数化） ---
@@ -355,33 +1016,56 @@ class MainWindow(QtWidgets.QMainWindow):
                 toggle_btn.setText('画質優先\n(高画質)')
                 cam_widget.set_force_stream('stream1')
         toggle_btn.clicked.connect(toggle_stream)
+        # PTZボタン: step（クリック毎に一定量移動）/ continuous（押している間移動）
+        ptz_continuous = self.settings.get_general().get('ptz_mode', 'step') == 'continuous'
+        def connect_ptz(btn, direction):
+            if ptz_continuous:
+                btn.pressed.connect(lambda: cam_widget.start_ptz_move(direction))
+                btn.released.connect(cam_widget.stop_ptz_move)
+            else:
+                btn.clicked.connect(lambda: cam_widget.send_ptz_command(direction))
         # PTZ ↑
         up_btn = QtWidgets.QPushButton()
         up_btn.setIcon(QtGui.QIcon('icons/arrow_up.png'))
         up_btn.setIconSize(btn_size)
         up_btn.setFixedSize(btn_size)
-        up_btn.clicked.connect(lambda: cam_widget.send_ptz_command('up'))
+        connect_ptz(up_btn, 'up')
         # PTZ ←
         left_btn = QtWidgets.QPushButton()
         left_btn.setIcon(QtGui.QIcon('icons/arrow_left.png'))
         left_btn.setIconSize(btn_size)
         left_btn.setFixedSize(btn_size)
-        left_btn.clicked.connect(lambda: cam_widget.send_ptz_command('left'))
+        connect_ptz(left_btn, 'left')
         # PTZ →
         right_btn = QtWidgets.QPushButton()
         right_btn.setIcon(QtGui.QIcon('icons/arrow_right.png'))
         right_btn.setIconSize(btn_size)
         right_btn.setFixedSize(btn_size)
-        right_btn.clicked.connect(lambda: cam_widget.send_ptz_command('right'))
+        connect_ptz(right_btn, 'right')
         # PTZ ↓
         down_btn = QtWidgets.QPushButton()
         down_btn.setIcon(QtGui.QIcon('icons/arrow_down.png'))
         down_btn.setIconSize(btn_size)
         down_btn.setFixedSize(btn_size)
-        down_btn.clicked.connect(lambda: cam_widget.send_ptz_command('down'))
+        connect_ptz(down_btn, 'down')
+        # 録画ボタン
+        record_btn = QtWidgets.QPushButton()
+        record_btn.setCheckable(True)
+        record_btn.setFixedSize(btn_size)
+        record_btn.setToolTip('録画の開始/停止（保存先は設定のsave_dir）')
+        def update_record_btn():
+            recording = cam_widget.is_recording()
+            record_btn.setChecked(recording)
+            record_btn.setText('録画停止' if recording else '録画')
+        def toggle_record():
+            self.toggle_recording(cam_widget)
+            update_record_btn()
+        record_btn.clicked.connect(toggle_record)
+        update_record_btn()
         # --- 並び順にサイドバーへ追加 ---
         sidebar_layout.addWidget(close_btn, alignment=QtCore.Qt.AlignTop)
         sidebar_layout.addWidget(toggle_btn, alignment=QtCore.Qt.AlignTop)
+        sidebar_layout.addWidget(record_btn, alignment=QtCore.Qt.AlignTop)
         sidebar_layout.addWidget(up_btn, alignment=QtCore.Qt.AlignTop)
         sidebar_layout.addWidget(left_btn, alignment=QtCore.Qt.AlignTop)
         sidebar_layout.addWidget(right_btn, alignment=QtCore.Qt.AlignTop)
@@ -389,63 +1073,87 @@ class MainWindow(QtWidgets.QMainWindow):
         sidebar_layout.addWidget(default_btn, alignment=QtCore.Qt.AlignTop)
         sidebar_layout.addWidget(zoom_in_btn, alignment=QtCore.Qt.AlignTop)
         sidebar_layout.addWidget(zoom_out_btn, alignment=QtCore.Qt.AlignTop)
-        # 手のひらツール関連のボタン生成・追加・分岐はすべて削除
-        # mouseイベントは常時ドラッグ移動有効化
-        def label_mousePressEvent(event):
-            if event.button() == QtCore.Qt.LeftButton:
-                dragging['active'] = True
-                dragging['start'] = event.globalPos()
-                dragging['scroll_x'] = scroll_area.horizontalScrollBar().value()
-                dragging['scroll_y'] = scroll_area.verticalScrollBar().value()
-                label.setCursor(QtGui.QCursor(QtCore.Qt.ClosedHandCursor))
-                event.accept()
-            else:
-                label.setCursor(QtGui.QCursor(QtCore.Qt.ArrowCursor))
-                QtWidgets.QLabel.mousePressEvent(label, event)
-        def label_mouseMoveEvent(event):
-            if dragging['active'] and event.buttons() & QtCore.Qt.LeftButton:
-                dx = -(event.globalPos().x() - dragging['start'].x())  # 反転
-                dy = -(event.globalPos().y() - dragging['start'].y())  # 反転
-                scroll_area.horizontalScrollBar().setValue(dragging['scroll_x'] + dx)
-                scroll_area.verticalScrollBar().setValue(dragging['scroll_y'] + dy)
-                event.accept()
-            else:
-                QtWidgets.QLabel.mouseMoveEvent(label, event)
-        def label_mouseReleaseEvent(event):
-            if event.button() == QtCore.Qt.LeftButton:
-                dragging['active'] = False
-                label.setCursor(QtGui.QCursor(QtCore.Qt.OpenHandCursor))
-                event.accept()
-            else:
-                label.setCursor(QtGui.QCursor(QtCore.Qt.ArrowCursor))
-                QtWidgets.QLabel.mouseReleaseEvent(label, event)
-        label.mousePressEvent = label_mousePressEvent
-        label.mouseMoveEvent = label_mouseMoveEvent
-        label.mouseReleaseEvent = label_mouseReleaseEvent
-        # ダイアログ表示時は常に手のひらカーソル
-        label.setCursor(QtGui.QCursor(QtCore.Qt.OpenHandCursor))
-    # 画像更新タイマー
-        def update():
-            pix = cam_widget.pixmap()
-            if pix and not pix.isNull():
-                w = int(label.width() * zoom['scale'])
-                h = int(label.height() * zoom['scale'])
-                label.setPixmap(pix.scaled(w, h, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
-        timer = QtCore.QTimer(dlg)
-        timer.timeout.connect(update)
-        timer.start(50)
+        # ドラッグ移動・ホイールでのズームはZoomView側で処理
         dlg.exec_()
+        cam_widget.frame_changed.disconnect(view.update)
+        dlg.deleteLater()
+        cam_widget.set_full_resolution(False)
         for w in self.cam_widgets:
             w.set_paused(False)
             w.set_force_stream(None)
+        self.apply_page_state()
+        self.schedule_tour()
 
     def closeEvent(self, event):
-        for w in self.cam_widgets:
-            w.close()
+        self.tour_timer.stop()
+        self.prewarm_timer.stop()
+        self.compositor.clear()
+        self.retire_timer.stop()
+        self._reload_pending = False
+        self.shutdown_cameras(self.cam_widgets, wait=True)
+        self.cam_widgets = []
+        if self.decode_backend is not None:
+            self.decode_backend.close()
+            self.decode_backend = None
+        if self.replay is not None:
+            self.replay.close()
+        close_ptz_controllers()
+        self.snapshots.shutdown()
+        for exporter in self.metrics_exporters:
+            exporter.close()
         event.accept()
 
+def run_server(host=None, port=None):
+    # ヘッドレス配信モード（python main.py --serve）: 各カメラを1回だけ開き、ローカルのクライアントへMJPEGで配信する
+    settings = Settings()
+    general = settings.get_general()
+    pacing = PacingScheduler.from_settings(settings)
+    gate = ReconnectGate.from_settings(settings)
+    stream = general.get('restream_stream', 'stream2')
+    on_demand = general.get('restream_on_demand', '1') == '1'
+    registry = MetricsRegistry()
+    hubs = {}
+    controls = []
+    for ip, spec in camera_specs(settings, use_restream=False).items():
+        hub = FrameHub(ip, spec['name'])
+        control = RestreamControl(hub, stream, on_demand)
+        metrics = CameraMetrics(ip, spec['name'])
+        registry.add(metrics)
+        loop = CaptureLoop(ip, spec['user'], spec['password'], spec['port'], control, HubSink(hub, copy=is_source_url(ip)), FramePipeline(),
+                           pacing, ConnectionSupervisor(gate=gate, **spec['connection']), spec['low_latency'],
+                           spec['standby'], metrics=metrics, profile=spec['profile'])
+        threading.Thread(target=loop.run, name=f'restream-{ip}', daemon=True).start()
+        hubs[ip] = hub
+        controls.append(control)
+    server = RestreamServer.from_settings(settings, hubs, host, port)
+    exporters = start_metrics_exporters(registry, settings)
+    host, port = server.address[:2]
+    print(f"配信中: http://{host}:{port}/ （{len(hubs)}台、Ctrl+Cで終了）")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for control in controls:
+            control.stop()
+        server.close()
+        for exporter in exporters:
+            exporter.close()
+
 if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
+    import argparse
+    import multiprocessing
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description='イーサネットIPカメラマルチビューア')
+    parser.add_argument('--serve', action='store_true', help='ウィンドウを出さずにローカル配信サーバとして動かす')
+    parser.add_argument('--host', help='配信サーバの待ち受けアドレス（既定は [General] restream_host）')
+    parser.add_argument('--port', type=int, help='配信サーバのポート（既定は [General] restream_port）')
+    args, qt_args = parser.parse_known_args()
+    if args.serve:
+        run_server(args.host, args.port)
+        sys.exit(0)
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
     win = MainWindow()
     win.show()
     sys.exit(app.exec_())
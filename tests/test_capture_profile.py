@@ -0,0 +1,68 @@
+import threading
+import time
+import pytest
+from camera_viewer import capture_profile
+from camera_viewer.capture_profile import BUILTIN_PROFILES, probe_profiles
+
+def test_probe_failure_is_reported_and_the_rest_continue(monkeypatch):
+    profiles = list(BUILTIN_PROFILES.values())[:2]
+    broken = profiles[0].name
+    def fake_probe(url, profile, params=None, timeout=10.0):
+        if profile.name == broken:
+            raise ValueError('bad option')
+        return {'profile': profile.name, 'ok': True, 'open_ms': 5.0, 'first_frame_ms': 20.0,
+                'width': 64, 'height': 36}
+    monkeypatch.setattr(capture_profile, 'probe', fake_probe)
+    results = []
+    summary = probe_profiles('rtsp://example', profiles, repeat=2, on_result=results.append)
+    assert len(results) == 4
+    assert [r.get('error') for r in results[:2]] == ['bad option', 'bad option']
+    # 成功したプロファイルが先、失敗したプロファイルはエラー付きで後ろ
+    assert [row['profile'] for row in summary] == [profiles[1].name, broken]
+    assert summary[1]['ok'] == 0 and summary[1]['error'] == 'bad option'
+    assert summary[0]['first_frame_ms'] == 20.0
+
+def hold(env, options, entered, release):
+    with env.use(options):
+        entered.set()
+        release.wait(5.0)
+
+def test_options_wait_times_out_and_stops():
+    env = capture_profile._OptionsEnv()
+    entered, release = threading.Event(), threading.Event()
+    threading.Thread(target=hold, args=(env, 'a', entered, release), daemon=True).start()
+    assert entered.wait(2.0)
+    # 別のオプションのオープンが終わらない → タイムアウトは接続失敗として例外
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        with env.use('b', timeout=0.3):
+            pass
+    assert time.monotonic() - start < 2.0
+    with env.use('b', timeout=5.0, should_stop=lambda: True) as ready:
+        assert ready is False
+    # 同じオプションは同時に入れる
+    with env.use('a', timeout=0.3) as ready:
+        assert ready is True
+    release.set()
+    with env.use('b', timeout=2.0) as ready:
+        assert ready is True
+
+def test_waiting_options_are_not_starved():
+    env = capture_profile._OptionsEnv()
+    entered, release = threading.Event(), threading.Event()
+    threading.Thread(target=hold, args=(env, 'a', entered, release), daemon=True).start()
+    assert entered.wait(2.0)
+    order = []
+    def other():
+        with env.use('b', timeout=5.0):
+            order.append('b')
+    thread = threading.Thread(target=other, daemon=True)
+    thread.start()
+    time.sleep(0.3)
+    # 'b'が待っている間は、'a'の新しいオープンは加わらずに順番を待つ
+    with pytest.raises(TimeoutError):
+        with env.use('a', timeout=0.3):
+            pass
+    release.set()
+    thread.join(2.0)
+    assert order == ['b']
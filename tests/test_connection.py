@@ -0,0 +1,17 @@
+from camera_viewer.connection import ReconnectGate
+from camera_viewer.settings import Settings
+
+def test_gate_limit_from_settings(tmp_path):
+    settings = Settings(str(tmp_path / 'camera_viewer.ini'))
+    general = settings.get_general()
+    for value, limit in (('6', 6), ('2.0', 2), ('0', 1), ('abc', 4), ('', 4), ('inf', 4)):
+        general['max_reconnects'] = value
+        assert ReconnectGate.from_settings(settings).limit == limit
+
+def test_gate_skips_stopped_waiters():
+    gate = ReconnectGate(1)
+    assert gate.acquire()
+    # 枠が空いていなくても、停止したカメラはすぐに諦める
+    assert not gate.acquire(should_stop=lambda: True)
+    gate.release()
+    assert gate.acquire(should_stop=lambda: False)
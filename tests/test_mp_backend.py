@@ -0,0 +1,39 @@
+import time
+from camera_viewer import mp_backend
+from camera_viewer.sources import synthetic_url
+
+def camera(open_ms):
+    return dict(ip=synthetic_url(64, 36, 10, open_ms=open_ms), user='', password='', port='',
+                flip_h=False, flip_v=False, name='cam', fps=10,
+                connection=dict(open_timeout_ms=100, read_timeout_ms=100))
+
+def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+def test_worker_with_a_stuck_capture_thread_is_restarted(monkeypatch):
+    monkeypatch.setattr(mp_backend, 'HEARTBEAT_MARGIN', 3.0)
+    # 接続に60秒かかる（タイムアウトを無視して固まる）カメラ
+    backend = mp_backend.ProcessDecodeBackend([camera(60000)], workers=1, max_width=64, max_height=36)
+    try:
+        first = backend._procs[0]
+        assert wait_for(lambda: backend._procs[0] is not first, 15.0)
+        assert backend.restarts[0] == 1
+    finally:
+        backend.close()
+
+def test_healthy_worker_is_not_restarted(monkeypatch):
+    monkeypatch.setattr(mp_backend, 'HEARTBEAT_MARGIN', 3.0)
+    backend = mp_backend.ProcessDecodeBackend([camera(0)], workers=1, max_width=64, max_height=36)
+    try:
+        ring = backend.ring(camera(0)['ip'])
+        assert wait_for(lambda: int(ring.ctrl[mp_backend.CTRL_LATEST]) > 0, 10.0)
+        time.sleep(4.0)
+        assert backend.restarts[0] == 0
+        assert backend._procs[0].is_alive()
+    finally:
+        backend.close()
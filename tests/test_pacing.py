@@ -0,0 +1,34 @@
+import time
+from camera_viewer.pacing import PacingScheduler
+
+def test_throttled_when_slower_than_the_camera():
+    sched = PacingScheduler(fps=20)
+    sched.set_active('a', True)
+    assert not sched.is_throttled('a', 20.0)
+    assert sched.is_throttled('a', 30.0)
+    # 送出fpsが不明なら設定のfpsと比べる
+    assert not sched.is_throttled('a', 0.0)
+    sched.set_camera_fps('a', 5)
+    assert sched.is_throttled('a', 20.0)
+
+def test_budgets_and_idle_throttle():
+    sched = PacingScheduler(fps=20, frame_budget=20)
+    for key in 'abcd':
+        sched.set_active(key, True)
+    # 4台で20フレーム/秒 → 1台5fps
+    assert sched.is_throttled('a')
+    sched = PacingScheduler(fps=20, idle_fps=2)
+    sched.set_active('a', True)
+    sched.set_idle('a', True)
+    assert sched.is_throttled('a', 20.0)
+
+def test_cpu_budget_cost_includes_the_read():
+    sched = PacingScheduler(fps=100, cpu_budget=1)
+    pacer = sched.pacer('a')
+    pacer.start()
+    pacer.begin_frame()
+    # 読み取り（デコード）に20ms → 1コアなら50fpsが上限
+    time.sleep(0.02)
+    pacer.wait()
+    assert sched.interval_for('a') >= 0.018
+    assert sched.is_throttled('a', 100.0)
@@ -0,0 +1,20 @@
+import numpy as np
+from camera_viewer.pipeline import FramePipeline
+
+def test_overlay_does_not_draw_into_the_input_frame():
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    # 縮小・反転なし（切り出しのみ・そのまま）でもカメラ名は入力フレームに書き込まない
+    for crop in (None, (0, 0, 80, 60)):
+        pipeline = FramePipeline(name='Door', crop=crop)
+        out = pipeline.run(frame)
+        assert not frame.any()
+        assert out.any()
+
+def test_pil_is_not_imported_with_the_pipeline():
+    import os
+    import subprocess
+    import sys
+    # PILは最初の名前描画（または起動後の事前読み込み）までimportしない
+    code = ("import sys; import camera_viewer.pipeline as p, camera_viewer.overlay as o; "
+            "assert 'PIL' not in sys.modules and o._pil_modules is None")
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
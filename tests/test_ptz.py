@@ -0,0 +1,110 @@
+import threading
+import time
+from types import SimpleNamespace
+from camera_viewer.ptz import PTZController, PTZSession, STEP
+
+# ONVIFCamera互換の代替（AbsoluteMove等の呼び出しを記録する）
+class FakePTZService:
+    def __init__(self, camera):
+        self.camera = camera
+
+    def GetStatus(self, req):
+        return SimpleNamespace(Position=SimpleNamespace(PanTilt=SimpleNamespace(x=0.0, y=0.0)))
+
+    def create_type(self, name):
+        return SimpleNamespace()
+
+    def _call(self, name, value):
+        camera = self.camera
+        camera.gate.wait(5.0)
+        if camera.fail:
+            camera.fail -= 1
+            raise ConnectionError('no response')
+        camera.calls.append((name, value))
+
+    def AbsoluteMove(self, req):
+        self._call('AbsoluteMove', (req.Position['PanTilt']['x'], req.Position['PanTilt']['y']))
+
+    def ContinuousMove(self, req):
+        self._call('ContinuousMove', (req.Velocity['PanTilt']['x'], req.Velocity['PanTilt']['y']))
+
+    def Stop(self, req):
+        self._call('Stop', None)
+
+class FakeCamera:
+    def __init__(self):
+        self.calls = []
+        self.connects = 0
+        self.fail = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, ip, port, user, password):
+        self.connects += 1
+        return self
+
+    def create_media_service(self):
+        return SimpleNamespace(GetProfiles=lambda: [SimpleNamespace(token='profile')])
+
+    def create_ptz_service(self):
+        return FakePTZService(self)
+
+def controller(camera):
+    return PTZController(PTZSession('192.168.0.10', 2020, 'admin', 'pw', factory=camera))
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_clicks_during_a_send_are_coalesced():
+    camera = FakeCamera()
+    camera.gate.clear()
+    ctrl = controller(camera)
+    ctrl.step('up')
+    time.sleep(0.1)
+    # 1回目の送信中のクリックは合算して1回のAbsoluteMoveにする
+    for _ in range(3):
+        ctrl.step('left')
+    camera.gate.set()
+    assert wait_for(lambda: ctrl.sent == 2)
+    ctrl.close()
+    assert [name for name, _ in camera.calls] == ['AbsoluteMove', 'AbsoluteMove']
+    x, y = camera.calls[1][1]
+    assert abs(x - 3 * STEP) < 1e-9 and abs(y - STEP) < 1e-9
+    assert ctrl.coalesced == 2
+
+def test_stop_ends_a_continuous_move_and_reconnects():
+    camera = FakeCamera()
+    ctrl = controller(camera)
+    ctrl.start('right')
+    assert wait_for(lambda: ctrl.sent == 1)
+    ctrl.stop()
+    assert wait_for(lambda: ctrl.sent == 2)
+    # 停止していない時のstopは送らない
+    ctrl.stop()
+    ctrl.step('down')
+    assert wait_for(lambda: ctrl.sent == 3)
+    ctrl.close()
+    assert [name for name, _ in camera.calls] == ['ContinuousMove', 'Stop', 'AbsoluteMove']
+    assert camera.calls[0][1][0] < 0
+    # 連続移動後の位置は不明なので、次のコマンドで接続し直す
+    assert camera.connects == 2
+
+def test_send_error_is_recorded_and_the_next_command_reconnects():
+    camera = FakeCamera()
+    camera.fail = 1
+    ctrl = controller(camera)
+    ctrl.step('up')
+    assert wait_for(lambda: ctrl.last_error is not None)
+    assert isinstance(ctrl.last_error, ConnectionError)
+    assert ctrl.sent == 0
+    ctrl.step('up')
+    assert wait_for(lambda: ctrl.sent == 1)
+    ctrl.close()
+    assert ctrl.last_error is None
+    assert camera.calls == [('AbsoluteMove', (0.0, STEP))]
+    assert camera.connects == 2
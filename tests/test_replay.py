@@ -0,0 +1,96 @@
+import threading
+import numpy as np
+from camera_viewer.replay import ReplayPool, FORMAT_JPEG, FORMAT_RAW, ENTRY_OVERHEAD
+
+FPS = 10.0
+# ReplayBufferの間引き（1/FPS間隔）で落ちないよう、わずかに広い間隔で流す
+STEP = 1.01 / FPS
+FRAME = np.zeros((36, 64, 3), dtype=np.uint8)
+FRAME_BYTES = FRAME.nbytes + ENTRY_OVERHEAD
+
+# エンコードの代わり: gateが開くまで待ち、決まったサイズのデータを返す
+class StubEncoder:
+    def __init__(self, size=1000):
+        self.size = size
+        self.gate = threading.Event()
+        self.calls = 0
+
+    def __call__(self, frame):
+        self.gate.wait(5.0)
+        self.calls += 1
+        return np.zeros(self.size, dtype=np.uint8)
+
+def feed(buf, count, start=1000.0):
+    for i in range(count):
+        buf(FRAME, start + i * STEP)
+
+def test_pending_frames_count_toward_the_cap():
+    encoder = StubEncoder()
+    max_bytes = FRAME_BYTES * 5
+    pool = ReplayPool(max_bytes=max_bytes, seconds=60, fps=FPS, fmt=FORMAT_JPEG, max_width=640,
+                      workers=1, queue_size=64, encoder=encoder)
+    bufs = [pool.buffer('a'), pool.buffer('b')]
+    for i in range(20):
+        for buf in bufs:
+            buf(FRAME, 1000.0 + i * STEP)
+        assert pool.total_bytes + pool.pending_bytes <= max_bytes
+    # エンコードが止まっている間は確保できない分を捨てる
+    assert pool.dropped > 0
+    assert pool.peak_bytes <= max_bytes
+    encoder.gate.set()
+    pool.wait_idle()
+    assert pool.pending_bytes == 0
+    assert all(b.pending == 0 for b in bufs)
+    assert 0 < pool.total_bytes <= max_bytes
+    assert pool.stats()['frames'] == encoder.calls
+    pool.close()
+
+def test_failed_encode_releases_reservation():
+    pool = ReplayPool(max_bytes=FRAME_BYTES * 4, seconds=60, fps=FPS, workers=1, encoder=lambda frame: None)
+    buf = pool.buffer('a')
+    feed(buf, 10)
+    pool.wait_idle()
+    assert pool.pending_bytes == 0
+    assert pool.total_bytes == 0
+    assert len(buf) == 0
+    pool.close()
+
+def test_evicts_from_the_largest_camera():
+    pool = ReplayPool(max_bytes=FRAME_BYTES * 10, seconds=60, fps=FPS, fmt=FORMAT_RAW)
+    big = pool.buffer('big')
+    small = pool.buffer('small')
+    feed(small, 2)
+    feed(big, 8)
+    assert pool.evicted == 0
+    feed(big, 5, start=1001.0)
+    # 上限を超えた分は使用量の多いカメラの古いフレームから捨て、少ないカメラは削らない
+    assert pool.evicted == 5
+    assert len(small) == 2
+    assert len(big) == 8
+    assert big.time_range() == (1000.0 + 5 * STEP, 1001.0 + 4 * STEP)
+    assert pool.total_bytes == FRAME_BYTES * 10
+    pool.close()
+
+def test_frames_older_than_seconds_expire():
+    pool = ReplayPool(max_bytes=FRAME_BYTES * 1000, seconds=1.0, fps=FPS, fmt=FORMAT_RAW)
+    buf = pool.buffer('a')
+    feed(buf, 30)
+    oldest, newest = buf.time_range()
+    assert newest == 1000.0 + 29 * STEP
+    assert newest - oldest <= 1.0
+    assert newest - oldest > 1.0 - STEP
+    assert len(buf) < 30
+    assert pool.total_bytes == len(buf) * FRAME_BYTES
+    pool.close()
+
+def test_removed_camera_releases_its_bytes():
+    pool = ReplayPool(max_bytes=FRAME_BYTES * 10, seconds=60, fps=FPS, fmt=FORMAT_RAW)
+    a = pool.buffer('a')
+    b = pool.buffer('b')
+    feed(a, 3)
+    feed(b, 3)
+    pool.remove(a)
+    assert pool.total_bytes == 3 * FRAME_BYTES
+    feed(a, 3, start=2000.0)
+    assert pool.total_bytes == 3 * FRAME_BYTES
+    pool.close()
@@ -0,0 +1,71 @@
+from camera_viewer.settings import Settings
+
+URLS = [
+    'synthetic://640x360@20',
+    'synthetic://1280x720@20?open_ms=800&cam=1',
+    'file:///data/Clip%20A.MP4?fps=15',
+]
+
+def test_source_url_cameras_survive_save_and_load(tmp_path):
+    path = str(tmp_path / 'camera_viewer.ini')
+    settings = Settings(path)
+    settings.set_camera('192.168.0.10', 'Door', user='admin', password='pw')
+    for i, url in enumerate(URLS):
+        settings.set_camera(url, f'cam{i}', flip_h=True)
+        settings.set_camera_option(url, 'fps', 5)
+    settings.save()
+
+    loaded = Settings(path)
+    cameras = loaded.get_cameras()
+    assert list(cameras) == ['192.168.0.10'] + URLS
+    assert cameras['192.168.0.10'][0] == 'Door'
+    for i, url in enumerate(URLS):
+        assert cameras[url][:2] == (f'cam{i}', '1')
+        assert loaded.get_fps(url) == 5.0
+
+def test_resaving_source_url_keeps_options(tmp_path):
+    # 設定ダイアログと同じ手順（Camerasを作り直してから不要な追加設定を削除）
+    path = str(tmp_path / 'camera_viewer.ini')
+    settings = Settings(path)
+    settings.set_camera(URLS[1], 'cam')
+    settings.set_camera_option(URLS[1], 'crop', '0,0,320,180')
+    settings.save()
+
+    loaded = Settings(path)
+    loaded.config['Cameras'] = {}
+    loaded.set_camera(URLS[1], 'renamed')
+    loaded.remove_stale_camera_options()
+    loaded.save()
+
+    again = Settings(path)
+    assert again.get_cameras()[URLS[1]][0] == 'renamed'
+    assert again.get_crop(URLS[1]) == (0, 0, 320, 180)
+
+def test_remove_source_url_camera(tmp_path):
+    settings = Settings(str(tmp_path / 'camera_viewer.ini'))
+    settings.set_camera(URLS[0], 'cam')
+    settings.remove_camera(URLS[0])
+    assert settings.get_cameras() == {}
+    assert settings.get_camera_option(URLS[0], 'source_url') is None
+
+def test_invalid_onvif_port_falls_back_to_default(tmp_path):
+    from camera_viewer.ptz import DEFAULT_ONVIF_PORT
+    settings = Settings(str(tmp_path / 'camera_viewer.ini'))
+    settings.set_camera('192.168.0.10', 'Door')
+    assert settings.get_onvif_port('192.168.0.10') == DEFAULT_ONVIF_PORT
+    settings.set_camera_option('192.168.0.10', 'onvif_port', '8000')
+    assert settings.get_onvif_port('192.168.0.10') == 8000
+    settings.set_camera_option('192.168.0.10', 'onvif_port', 'abc')
+    assert settings.get_onvif_port('192.168.0.10') == DEFAULT_ONVIF_PORT
+
+def test_capture_profile_edits_can_be_rolled_back(tmp_path):
+    from camera_viewer.capture_profile import CaptureProfile
+    settings = Settings(str(tmp_path / 'camera_viewer.ini'))
+    settings.set_capture_profile(CaptureProfile('mine', transport='tcp'))
+    backup = settings.backup_capture_profiles()
+    settings.set_capture_profile(CaptureProfile('mine', transport='udp'))
+    settings.set_capture_profile(CaptureProfile('extra'))
+    settings.restore_capture_profiles(backup)
+    profiles = settings.get_capture_profiles()
+    assert profiles['mine'].transport == 'tcp'
+    assert 'extra' not in profiles
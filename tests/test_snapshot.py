@@ -0,0 +1,22 @@
+import os
+import numpy as np
+from camera_viewer.snapshot import SnapshotService
+
+# 表示用の最新フレーム（RGB）を返すフレーム源
+class PeekSource:
+    def __init__(self, value):
+        self.frame = np.full((36, 64, 3), value, dtype=np.uint8)
+
+    def peek(self):
+        return self.frame, 1000.0, 1
+
+def test_cameras_with_the_same_name_get_separate_files(tmp_path):
+    service = SnapshotService(str(tmp_path), window=0.1)
+    sources = [('Door', PeekSource(10)), ('Door', PeekSource(20)), ('', PeekSource(30))]
+    meta = service.capture(sources).result(5.0)[0]
+    service.shutdown()
+    files = [f['file'] for f in meta['frames']]
+    assert len(set(files)) == 3
+    assert files[0] == '00_Door.png'
+    for name in files:
+        assert os.path.exists(os.path.join(meta['directory'], name))
@@ -0,0 +1,101 @@
+import threading
+import time
+import numpy as np
+from camera_viewer.connection import ConnectionSupervisor, ReconnectGate
+from camera_viewer.motion import MotionDetector
+from camera_viewer.pacing import PacingScheduler
+from camera_viewer.worker import CaptureLoop
+
+FRAME = np.zeros((36, 64, 3), dtype=np.uint8)
+
+# 静止画を返し続けるキャプチャ（grab/readの回数を数える）
+class StaticCapture:
+    def __init__(self, counts):
+        self.counts = counts
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        self.counts['read'] += 1
+        return True, FRAME
+
+    def grab(self):
+        self.counts['grab'] += 1
+        return True
+
+    def get(self, prop):
+        return 0.0
+
+    def release(self):
+        self.opened = False
+
+class Control:
+    def __init__(self):
+        self.stopped = False
+
+    def is_stopped(self):
+        return self.stopped
+
+    def is_paused(self):
+        return False
+
+    def standby_mode(self):
+        return None
+
+    def needs_taps(self):
+        return False
+
+    def get_current_stream(self):
+        return 'stream2'
+
+    def target_size(self):
+        return (64, 36)
+
+class Sink:
+    def __init__(self):
+        self.frames = 0
+        self.statuses = []
+
+    def status(self, state, text):
+        self.statuses.append(text)
+
+    def frame(self, frame, pipeline, target):
+        self.frames += 1
+
+    def activity(self, active):
+        pass
+
+def run_loop(sample_seconds, duration=0.6):
+    counts = {'open': 0, 'read': 0, 'grab': 0}
+    def opener(url, low_latency, params, profile, should_stop=None):
+        counts['open'] += 1
+        return StaticCapture(counts)
+    control = Control()
+    sink = Sink()
+    connection = ConnectionSupervisor(gate=ReconnectGate(1))
+    loop = CaptureLoop('cam', '', '', '554', control, sink, None, PacingScheduler(50, idle_fps=10),
+                       connection, motion=MotionDetector(hold_seconds=0.05, sample_seconds=sample_seconds),
+                       opener=opener)
+    thread = threading.Thread(target=loop.run, daemon=True)
+    thread.start()
+    time.sleep(duration)
+    control.stopped = True
+    thread.join(2.0)
+    return counts, sink, connection
+
+def test_idle_camera_releases_the_session_and_samples():
+    counts, sink, connection = run_loop(0.1)
+    # 静止後は切断し、確認のたびに1フレームだけ読む（grab()での読み捨ては無い）
+    assert counts['open'] >= 3
+    assert counts['grab'] == 0
+    assert counts['read'] < 20
+    # 確認のための再接続は再接続数に数えず、「接続中」も出さない
+    assert connection.reconnects == 0
+    assert len(sink.statuses) == 1
+
+def test_idle_camera_keeps_the_session_without_sampling():
+    counts, sink, connection = run_loop(0.0)
+    assert counts['open'] == 1
+    assert counts['grab'] > 0